@@ -1,3 +1,4 @@
+from __future__ import annotations
 from pathlib import Path
 import openai
 from src.ports.tts import TTSPort
@@ -15,3 +16,13 @@ class OpenAITTSAdapter(TTSPort):
         )
         response.stream_to_file(output_path)
         return output_path
+
+    def synthesize_pcm(self, text: str, voice: str | None = None) -> bytes:
+        """Ruwe PCM16 mono 24kHz (response_format=pcm), voor voorgerenderde telefoonaudio."""
+        response = openai.audio.speech.create(
+            model=settings.TTS_MODEL,
+            voice=voice or settings.TTS_VOICE,
+            input=text,
+            response_format="pcm",
+        )
+        return response.read()
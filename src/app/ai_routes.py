@@ -51,7 +51,7 @@ class PlanIn(BaseModel):
 
 
 @router.post("/plan")
-def plan_callflow(payload: PlanIn):
+async def plan_callflow(payload: PlanIn):
     # 1) Tijd-check eerst
     ts = time_status(now_ams())
     if ts:
@@ -67,7 +67,7 @@ def plan_callflow(payload: PlanIn):
     open_line = greeting(now_ams())
 
     # 3) Categorie-beschikbaarheid
-    settings = live_settings.get_all()
+    settings = await live_settings.aget_all()
     cats = {i.category for i in payload.items}
     blocked = category_blocked(list(cats), settings)
     if blocked:
@@ -1,22 +1,69 @@
+import asyncio
 from fastapi import FastAPI, UploadFile, File, HTTPException
 from fastapi.responses import StreamingResponse, FileResponse
 from src.workflows.transcribe_and_return import transcribe_bytes
 from src.workflows.speak_text import speak_text
 from src.app.twilio_routes import router as twilio_router
 from src.app.dashboard.base import router as admin_router
-from src.infra.logs import setup_logging
-from src.infra.live_settings import ensure_table
+from src.infra.logs import setup_logging, shutdown_logging
+from src.infra import call_events, partitions
+from src.infra.db import engine
+from src.infra.live_settings import ensure_table, run_listener, run_refresher
+from src.infra.call_registry import run_heartbeat
 from src.app.ai_routes import router as ai_router
 from src.app.dashboard import settings_adapter
-from src.app.stream_bridge import router as stream_router
+from src.app.stream_bridge import router as stream_router, spawn, start_pool, stop_pool, warm_prompt_audio
 
 setup_logging()
 app = FastAPI()
 
+# achtergrondtaken van deze worker: referentie houden, bij shutdown stoppen
+_background: list = []
+
+def _start(coro) -> None:
+    _background.append(spawn(coro))
+
 @app.on_event("startup")
 def _init_live_settings():
     ensure_table()
 
+@app.on_event("startup")
+async def _start_settings_refresher():
+    await run_listener()
+    _start(run_refresher())
+
+@app.on_event("startup")
+async def _start_partition_maintenance():
+    _start(partitions.run_maintenance(engine))
+
+@app.on_event("startup")
+async def _start_call_registry():
+    _start(run_heartbeat())
+
+@app.on_event("startup")
+async def _start_realtime_pool():
+    await start_pool()
+
+@app.on_event("startup")
+async def _warm_prompt_audio():
+    _start(warm_prompt_audio())
+
+@app.on_event("shutdown")
+async def _stop_background():
+    for t in _background:
+        t.cancel()
+    await asyncio.gather(*_background, return_exceptions=True)
+    _background.clear()
+
+@app.on_event("shutdown")
+async def _stop_realtime_pool():
+    await stop_pool()
+
+@app.on_event("shutdown")
+def _flush_db_logs():
+    call_events.close()
+    shutdown_logging()
+
 @app.get("/")
 def read_root():
     return {"status": "ok", "message": "SARA backend actief"}
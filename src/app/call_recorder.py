@@ -0,0 +1,168 @@
+"""
+Opname per call: inkomende + uitgaande μ-law in voor-gealloceerde ringbuffers.
+
+- geen allocaties per frame: frames worden in een vaste bytearray (of een
+  memory-mapped bestand) gekopieerd; bij overloop blijven de laatste
+  `max_s` seconden bewaard
+- bij call-einde `flush()` (in een thread) → <dir>/<call>.in.wav,
+  <call>.out.wav (μ-law WAV) en <call>.json (start-payload + events)
+- kosten per call zijn meetbaar via `stats()` (geheugen, bytes, schrijftijd)
+"""
+from __future__ import annotations
+import json, mmap, os, re, struct, tempfile, time, uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+RATE = 8000  # μ-law 8kHz mono: 1 byte per sample
+# callSid komt uit het (niet-geauthenticeerde) start-event: alleen veilige bestandsnamen
+_SAFE_ID = re.compile(r"[A-Za-z0-9]+")
+
+
+def file_stem(call_id: str) -> str:
+    """Bestandsnaam voor een call; iets anders dan [A-Za-z0-9]+ (bv. '../x') → uuid."""
+    return call_id if _SAFE_ID.fullmatch(call_id) else f"call{uuid.uuid4().hex}"
+
+
+class RingBuffer:
+    def __init__(self, capacity: int, use_mmap: bool = False):
+        self.capacity = max(1, capacity)
+        self._file = None
+        if use_mmap:
+            # bestand-backed: de OS mag pagina's wegschrijven i.p.v. RSS vast te houden
+            self._file = tempfile.TemporaryFile(prefix="sara-rec-")
+            self._file.truncate(self.capacity)
+            self.buf = mmap.mmap(self._file.fileno(), self.capacity)
+        else:
+            self.buf = bytearray(self.capacity)
+        self._mv = memoryview(self.buf)
+        self.pos = 0
+        self.written = 0  # totaal ooit geschreven (ook overschreven)
+
+    def write(self, data: bytes) -> None:
+        n = len(data)
+        if n >= self.capacity:
+            data = data[n - self.capacity:]
+            n = self.capacity
+        end = self.pos + n
+        if end <= self.capacity:
+            self._mv[self.pos:end] = data
+        else:
+            k = self.capacity - self.pos
+            self._mv[self.pos:] = data[:k]
+            self._mv[:n - k] = data[k:]
+        self.pos = end % self.capacity
+        self.written += len(data)
+
+    @property
+    def wrapped(self) -> bool:
+        return self.written > self.capacity
+
+    def contents(self) -> bytes:
+        if not self.wrapped:
+            return bytes(self._mv[:self.written])
+        return bytes(self._mv[self.pos:]) + bytes(self._mv[:self.pos])
+
+    def close(self) -> None:
+        self._mv.release()
+        if self._file is not None:
+            self.buf.close()
+            self._file.close()
+
+
+def write_ulaw_wav(path: Path, data: bytes) -> None:
+    """WAV met format-tag 7 (μ-law); `wave` uit de stdlib kan alleen PCM."""
+    fmt = struct.pack("<HHIIHHH", 7, 1, RATE, RATE, 1, 8, 0)
+    fact = struct.pack("<I", len(data))
+    pad = b"\x00" if len(data) % 2 else b""
+    size = 4 + (8 + len(fmt)) + (8 + len(fact)) + (8 + len(data) + len(pad))
+    with open(path, "wb") as f:
+        f.write(b"RIFF" + struct.pack("<I", size) + b"WAVE")
+        f.write(b"fmt " + struct.pack("<I", len(fmt)) + fmt)
+        f.write(b"fact" + struct.pack("<I", len(fact)) + fact)
+        f.write(b"data" + struct.pack("<I", len(data)) + data + pad)
+
+
+def read_ulaw_wav(path: Path) -> bytes:
+    """Leest de data-chunk terug (voor replay); accepteert ook ruwe .ulaw."""
+    raw = Path(path).read_bytes()
+    if raw[:4] != b"RIFF":
+        return raw
+    i = 12
+    while i + 8 <= len(raw):
+        cid, size = raw[i:i + 4], struct.unpack("<I", raw[i + 4:i + 8])[0]
+        if cid == b"data":
+            return raw[i + 8:i + 8 + size]
+        i += 8 + size + (size & 1)
+    return b""
+
+
+class CallRecorder:
+    def __init__(self, directory: Path, max_s: int = 300, use_mmap: bool = False):
+        self.dir = Path(directory)
+        cap = max(1, max_s) * RATE
+        self.inbound = RingBuffer(cap, use_mmap)
+        self.outbound = RingBuffer(cap, use_mmap)
+        self.call_id: Optional[str] = None
+        self.meta: Dict[str, Any] = {}
+        self.events: List[Dict[str, Any]] = []
+        self.write_ns = 0
+        self.t0 = time.time()
+
+    def write_in(self, frame: bytes) -> None:
+        t = time.perf_counter_ns()
+        self.inbound.write(frame)
+        self.write_ns += time.perf_counter_ns() - t
+
+    def write_out(self, frame: bytes) -> None:
+        t = time.perf_counter_ns()
+        self.outbound.write(frame)
+        self.write_ns += time.perf_counter_ns() - t
+
+    def event(self, name: str, **data: Any) -> None:
+        """Zeldzame events (start/mark/clear/stop, transcripts), met positie in de audio."""
+        self.events.append({
+            "event": name,
+            "t": round(time.time() - self.t0, 3),
+            "in_byte": self.inbound.written,
+            "out_byte": self.outbound.written,
+            **data,
+        })
+
+    def stats(self) -> Dict[str, Any]:
+        frames = (self.inbound.written + self.outbound.written) // 160 or 1
+        return {
+            "mem_bytes": self.inbound.capacity + self.outbound.capacity,
+            "in_bytes": self.inbound.written,
+            "out_bytes": self.outbound.written,
+            "wrapped": self.inbound.wrapped or self.outbound.wrapped,
+            "write_ns_per_frame": self.write_ns // frames,
+        }
+
+    def flush(self) -> Optional[Path]:
+        """Schrijft alles weg (blokkerend: via asyncio.to_thread aanroepen)."""
+        if not self.call_id:
+            self.close()
+            return None
+        self.dir.mkdir(parents=True, exist_ok=True)
+        cid = file_stem(self.call_id)
+        write_ulaw_wav(self.dir / f"{cid}.in.wav", self.inbound.contents())
+        write_ulaw_wav(self.dir / f"{cid}.out.wav", self.outbound.contents())
+        doc = {
+            "call_id": self.call_id,
+            "started_at": self.t0,
+            "audio_in": f"{cid}.in.wav",
+            "audio_out": f"{cid}.out.wav",
+            "stats": self.stats(),
+            **self.meta,
+            "events": self.events,
+        }
+        path = self.dir / f"{cid}.json"
+        tmp = self.dir / f"{cid}.json.tmp"
+        tmp.write_text(json.dumps(doc, ensure_ascii=False, indent=1), encoding="utf-8")
+        os.replace(tmp, path)
+        self.close()
+        return path
+
+    def close(self) -> None:
+        self.inbound.close()
+        self.outbound.close()
@@ -6,6 +6,7 @@ from src.app.dashboard.settings_api import router as settings_api_router
 from src.app.dashboard.settings_live_page import router as settings_live_page_router
 from src.app.dashboard.reports_page import router as reports_router
 from src.app.dashboard.monitoring_page import router as monitoring_router
+from src.app.dashboard.live_calls_page import router as live_calls_router
 
 router = APIRouter()
 
@@ -27,13 +28,15 @@ def dashboard_root():
         <a class="btn" href="/dashboard/live-settings">Live instellingen</a>
         <a class="btn" href="/dashboard/reports">Rapportage</a>
         <a class="btn" href="/dashboard/monitoring">Monitoring</a>
+        <a class="btn" href="/dashboard/live-calls">Live calls</a>
       </div>
-      <p class="muted">Monitoring vraagt een wachtwoord.</p>
+      <p class="muted">Monitoring en live calls vragen een wachtwoord.</p>
     </body></html>
     """)
 
 # Subrouters koppelen
 router.include_router(reports_router)
 router.include_router(monitoring_router)
+router.include_router(live_calls_router)
 router.include_router(settings_api_router, prefix="")
 router.include_router(settings_live_page_router, prefix="")
@@ -0,0 +1,78 @@
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import HTMLResponse, StreamingResponse
+import asyncio, json, os
+
+from src.app.dashboard.auth import require_admin
+from src.infra import call_registry
+
+router = APIRouter()
+
+SSE_INTERVAL_S = float(os.getenv("SARA_LIVE_SSE_INTERVAL_S", "1"))
+SSE_KEEPALIVE_S = 15
+
+
+@router.get("/dashboard/live-calls/stream", dependencies=[Depends(require_admin)])
+async def live_calls_stream(request: Request):
+    """SSE: stuurt alleen een nieuw overzicht als er iets veranderd is (+ keepalive)."""
+    async def events():
+        last = None
+        quiet = 0.0
+        while not await request.is_disconnected():
+            calls = await call_registry.snapshot()
+            doc = json.dumps({"workers": call_registry.per_worker(calls), "calls": calls}, ensure_ascii=False)
+            if doc != last:
+                last = doc
+                quiet = 0.0
+                yield f"data: {doc}\n\n"
+            else:
+                quiet += SSE_INTERVAL_S
+                if quiet >= SSE_KEEPALIVE_S:
+                    quiet = 0.0
+                    yield ": keepalive\n\n"
+            await asyncio.sleep(SSE_INTERVAL_S)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@router.get("/dashboard/live-calls", response_class=HTMLResponse, dependencies=[Depends(require_admin)])
+def live_calls_page():
+    return HTMLResponse("""
+    <html><head><meta charset="utf-8"><title>Live calls</title>
+    <style>
+      body{font-family:system-ui;margin:24px}
+      table{border-collapse:collapse;width:100%;margin-top:12px}
+      td,th{border:1px solid #ddd;padding:8px;font-size:14px}
+      th{background:#eee;text-align:left}
+      tr.stuck td{background:#fdecea}
+      .w{display:inline-block;margin:0 8px 8px 0;padding:8px 12px;border-radius:10px;background:#512da8;color:#fff}
+      .muted{color:#666;font-size:13px}
+    </style></head>
+    <body>
+      <h3>Live calls</h3>
+      <div id="workers"></div>
+      <table><thead><tr>
+        <th>Call ID</th><th>Worker</th><th>Duur(s)</th><th>Stil(s)</th><th>Modus</th>
+        <th>Bestelling</th><th>Beurten</th><th>Laatste beurt (ms)</th>
+      </tr></thead><tbody id="calls"><tr><td colspan="8">Verbinden…</td></tr></tbody></table>
+      <p class="muted" id="status"></p>
+      <p><a href="/dashboard">Terug</a></p>
+    <script>
+      const esc = v => String(v ?? "").replace(/[&<>"']/g, c => ({"&":"&amp;","<":"&lt;",">":"&gt;",'"':"&quot;","'":"&#39;"}[c]));
+      const es = new EventSource("/dashboard/live-calls/stream");
+      es.onmessage = ev => {
+        const d = JSON.parse(ev.data);
+        document.getElementById("workers").innerHTML = Object.entries(d.workers).map(([w, s]) =>
+          `<span class="w">${esc(w)}: ${s.active} actief${s.stuck ? `, ${s.stuck} vast` : ""}</span>`).join("") || "Geen actieve workers met calls";
+        document.getElementById("calls").innerHTML = d.calls.map(c => `
+          <tr class="${c.stuck ? "stuck" : ""}">
+            <td>${esc(c.call_id)}</td><td>${esc(c.worker)}</td><td>${c.duration_s}</td><td>${c.idle_s}</td>
+            <td>${esc(c.mode)}</td><td>${esc((c.items || []).map(i => i.qty + "× " + i.name).join(", "))}</td>
+            <td>${c.turns}</td><td>${esc(c.last_turn_ms)}</td>
+          </tr>`).join("") || "<tr><td colspan='8'>Geen lopende calls</td></tr>";
+        document.getElementById("status").textContent = "Bijgewerkt " + new Date().toLocaleTimeString();
+      };
+      es.onerror = () => { document.getElementById("status").textContent = "Verbinding weg, opnieuw proberen…"; };
+    </script>
+    </body></html>
+    """)
@@ -1,17 +1,33 @@
 from fastapi import APIRouter, Depends, Request
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse
 from sqlalchemy import text
-import html
+from urllib.parse import urlencode
+import csv, html, io, json, re
 
 from src.app.dashboard.auth import require_admin
 from src.infra.db import engine
-from src.infra.logs import get_events, get_calls
+from src.infra.logs import (
+    CALL_COLUMNS, HL_START, HL_STOP, calls_cursor, calls_query, events_cursor, events_query,
+    get_calls, get_events, stream_rows,
+)
 
 router = APIRouter()
 
+PAGE_LOGS = 100
+PAGE_CALLS = 50
+LOG_COLUMNS = ["id", "ts", "level", "msg"]
+
 def esc(v):
     return html.escape("" if v is None else str(v), quote=True)
 
+def highlight(v, q):
+    """Escapen, daarna pas <mark>: markers van ts_headline, anders (deelwoord-treffer
+    via ILIKE) de letterlijke zoekterm."""
+    s = "" if v is None else str(v)
+    if HL_START not in s and q:
+        s = re.sub(re.escape(q), lambda m: f"{HL_START}{m.group(0)}{HL_STOP}", s, flags=re.IGNORECASE)
+    return esc(s).replace(HL_START, "<mark>").replace(HL_STOP, "</mark>")
+
 @router.get("/dashboard/monitoring", response_class=HTMLResponse, dependencies=[Depends(require_admin)])
 def dashboard_monitoring(request: Request):
     qp = request.query_params
@@ -20,16 +36,41 @@ def dashboard_monitoring(request: Request):
     level = qp.get("level")
     start = qp.get("start")
     end = qp.get("end")
+    sort = "rank" if qp.get("sort") == "rank" else "time"
+    cursor = qp.get("cursor")
+    offset = int(qp["offset"]) if qp.get("offset", "").isdigit() else 0
 
+    # één rij extra ophalen: bestaat er een volgende pagina?
     if tab == "calls":
-        rows = get_calls(limit=50, q=q, start=start, end=end)
+        size = PAGE_CALLS
+        rows = get_calls(limit=size + 1, q=q, start=start, end=end, after=cursor)
     else:
-        rows = get_events(limit=100, level=level, q=q, start=start, end=end)
+        size = PAGE_LOGS
+        rows = get_events(limit=size + 1, level=level, q=q, start=start, end=end, sort=sort,
+                          after=cursor, offset=offset if sort == "rank" else 0)
+    more = len(rows) > size
+    rows = rows[:size]
+
+    filters = {k: v for k, v in (("tab", tab), ("q", q), ("level", level), ("start", start),
+                                 ("end", end), ("sort", sort if tab == "logs" else None)) if v}
+    nav = []
+    if cursor or offset:
+        nav.append(f'<a href="/dashboard/monitoring?{esc(urlencode(filters))}">« Eerste pagina</a>')
+    if more:
+        if tab == "logs" and sort == "rank":
+            nxt = {**filters, "offset": offset + size}      # rangorde: geen keyset mogelijk
+        else:
+            nxt = {**filters, "cursor": calls_cursor(rows[-1]) if tab == "calls" else events_cursor(rows[-1])}
+        nav.append(f'<a href="/dashboard/monitoring?{esc(urlencode(nxt))}">Volgende »</a>')
+    export = " | ".join(
+        f'<a href="/dashboard/monitoring/export?{esc(urlencode({**filters, "format": fmt}))}">Export {fmt.upper()}</a>'
+        for fmt in ("csv", "jsonl")
+    )
 
     def table_logs(items):
         head = "<tr><th>Tijd</th><th>Niveau</th><th>Bericht</th></tr>"
         body = "".join(
-            f"<tr><td>{esc(i['ts'])}</td><td>{esc(i['level'])}</td><td>{esc(i['msg'])}</td></tr>"
+            f"<tr><td>{esc(i['ts'])}</td><td>{esc(i['level'])}</td><td>{highlight(i.get('msg_hl', i['msg']), q)}</td></tr>"
             for i in items
         )
         if not body:
@@ -41,13 +82,13 @@ def dashboard_monitoring(request: Request):
         def row(i):
             return (
                 "<tr>"
-                f"<td>{esc(i['call_id'])}</td>"
-                f"<td>{esc(i['from_masked'] or '')}</td>"
-                f"<td>{esc(i['to_number'] or '')}</td>"
+                f"<td>{highlight(i['call_id'], q)}</td>"
+                f"<td>{highlight(i['from_masked'], q)}</td>"
+                f"<td>{highlight(i['to_number'], q)}</td>"
                 f"<td>{esc(i['started_at'])}</td>"
                 f"<td>{esc(i['ended_at'] or '')}</td>"
                 f"<td>{esc(i['duration_sec'] or '')}</td>"
-                f"<td>{esc(i['result'] or '')}</td>"
+                f"<td>{highlight(i['result'], q)}</td>"
                 "</tr>"
             )
         body = "".join(row(i) for i in items) or "<tr><td colspan='7'>Geen data</td></tr>"
@@ -62,7 +103,8 @@ def dashboard_monitoring(request: Request):
       table{{border-collapse:collapse;width:100%;margin-top:12px}}
       td,th{{border:1px solid #ddd;padding:8px;font-size:14px}}
       th{{background:#eee;text-align:left}}
-      .toolbar input{{padding:6px;margin-right:6px}}
+      .toolbar input,.toolbar select{{padding:6px;margin-right:6px}}
+      mark{{background:#ffe082;padding:0 1px}}
     </style>
     </head>
     <body>
@@ -82,11 +124,59 @@ def dashboard_monitoring(request: Request):
           <input type="datetime-local" name="start" value="{esc(start or '')}">
           <label>Einde:</label>
           <input type="datetime-local" name="end" value="{esc(end or '')}">
+          <label>Sorteer:</label>
+          <select name="sort">
+            <option value="time">Nieuwste eerst</option>
+            <option value="rank" {'selected' if sort=='rank' else ''}>Relevantie</option>
+          </select>
           <button type="submit">Filter</button>
         </form>
       </p>
+      <p>{export}</p>
       {(table_logs(rows) if tab=='logs' else table_calls(rows))}
+      <p>{" &nbsp; ".join(nav)}</p>
       <p><a href="/dashboard">Terug</a></p>
     </body></html>
     """
     return HTMLResponse(html_doc)
+
+
+def _csv_chunks(columns, batches):
+    buf = io.StringIO()
+    w = csv.DictWriter(buf, fieldnames=columns, extrasaction="ignore")
+    w.writeheader()
+    for batch in batches:
+        w.writerows(batch)
+        yield buf.getvalue()
+        buf.seek(0); buf.truncate()
+    yield buf.getvalue()
+
+def _jsonl_chunks(columns, batches):
+    for batch in batches:
+        yield "".join(
+            json.dumps({c: r.get(c) for c in columns}, ensure_ascii=False, default=str) + "\n"
+            for r in batch
+        )
+
+@router.get("/dashboard/monitoring/export", dependencies=[Depends(require_admin)])
+def dashboard_monitoring_export(request: Request):
+    """Volledige resultset (zelfde filters als de pagina, zonder limiet) als CSV of
+    JSONL. Server-side cursor: rijen gaan per batch de deur uit, geheugen blijft vlak.
+    Sync generator → StreamingResponse draait hem in de threadpool."""
+    qp = request.query_params
+    tab = qp.get("tab", "logs")
+    fmt = "jsonl" if qp.get("format") == "jsonl" else "csv"
+    q, start, end = qp.get("q"), qp.get("start"), qp.get("end")
+    if tab == "calls":
+        columns = CALL_COLUMNS
+        sql, params = calls_query(limit=None, q=q, start=start, end=end)
+    else:
+        columns = LOG_COLUMNS
+        sql, params = events_query(limit=None, level=qp.get("level"), q=q, start=start, end=end, headline=False)
+    batches = stream_rows(sql, params)
+    chunks = _jsonl_chunks(columns, batches) if fmt == "jsonl" else _csv_chunks(columns, batches)
+    media = "application/x-ndjson" if fmt == "jsonl" else "text/csv; charset=utf-8"
+    return StreamingResponse(chunks, media_type=media, headers={
+        "Content-Disposition": f'attachment; filename="{tab}.{fmt}"',
+        "X-Accel-Buffering": "no",
+    })
@@ -1,7 +1,8 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Request
 from pydantic import BaseModel, conint
 from typing import Optional
 from ...infra import live_settings
+from .settings_api import changed_by
 
 router = APIRouter()
 
@@ -28,7 +29,7 @@ def ui_read():
 
 
 @router.post("/dashboard/api/settings")
-def ui_save(p: UiSaveIn):
+def ui_save(p: UiSaveIn, request: Request):
     """Slaat dashboardinstellingen op in de database."""
     updates = {}
     if p.bot_enabled is not None:
@@ -42,5 +43,5 @@ def ui_save(p: UiSaveIn):
     if p.delay_schotels_min is not None:
         updates["delay_schotels_min"] = p.delay_schotels_min
 
-    ok, msg = live_settings.set_many(updates)
+    ok, msg = live_settings.set_many(updates, changed_by=changed_by(request))
     return {"ok": ok, "message": msg}
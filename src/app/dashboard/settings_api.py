@@ -1,21 +1,55 @@
 from __future__ import annotations
-from typing import Dict, Any
-from fastapi import APIRouter, Body
+from datetime import datetime
+from typing import Dict, Any, Optional
+from fastapi import APIRouter, Body, Depends, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse
 from src.infra.live_settings import (
     get_all as ls_get_all,
     set_many as ls_set_many,
+    settings_at as ls_settings_at,
+    history as ls_history,
+    version as ls_version,
     DEFAULTS,
 )
+from src.app.dashboard.auth import require_admin
 
-router = APIRouter()  # geen wachtwoord op Live-instellingen
+router = APIRouter()  # geen wachtwoord op Live-instellingen (history wel: bevat IP's)
+
+def changed_by(request: Request) -> str:
+    """Geen login op deze pagina: herkomst zo goed als het gaat. Niet zelf
+    X-Forwarded-For lezen (vrij in te vullen); achter een proxy zet uvicorn
+    (--proxy-headers --forwarded-allow-ips) client.host al goed."""
+    return f"dashboard@{request.client.host if request.client else '?'}"
+
+def _parse_ts(name: str, value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        # '+' uit een niet-ge-encodeerde query-string komt als spatie binnen
+        return datetime.fromisoformat(value.strip().replace(" ", "+"))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name}: geen ISO 8601-tijdstip")
 
 @router.get("/dashboard/api/settings")
 def get_settings() -> JSONResponse:
-    return JSONResponse(ls_get_all())
+    return JSONResponse(ls_get_all(), headers={"X-Settings-Version": str(ls_version())})
 
 @router.post("/dashboard/api/settings")
-def post_settings(payload: Dict[str, Any] = Body(...)) -> JSONResponse:
+def post_settings(request: Request, payload: Dict[str, Any] = Body(...)) -> JSONResponse:
     filtered = {k: v for k, v in payload.items() if k in DEFAULTS}  # negeer onbekende keys
-    ok, msg = ls_set_many(filtered)
+    ok, msg = ls_set_many(filtered, changed_by=changed_by(request))
     return JSONResponse({"ok": ok, "message": msg}, status_code=200 if ok else 400)
+
+@router.get("/dashboard/api/settings/at", dependencies=[Depends(require_admin)])
+def get_settings_at(t: str) -> JSONResponse:
+    """Stand op tijdstip t (ISO 8601), bv. ?t=2025-10-10T19:30:00+02:00"""
+    at = _parse_ts("t", t)
+    if at is None:
+        raise HTTPException(status_code=400, detail="t is verplicht")
+    return JSONResponse(jsonable_encoder(ls_settings_at(at)))
+
+@router.get("/dashboard/api/settings/history", dependencies=[Depends(require_admin)])
+def get_settings_history(start: str | None = None, end: str | None = None, limit: int = 200) -> JSONResponse:
+    return JSONResponse(jsonable_encoder(ls_history(
+        _parse_ts("start", start), _parse_ts("end", end), min(max(1, limit), 1000))))
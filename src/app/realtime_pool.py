@@ -0,0 +1,153 @@
+"""Per-worker pool met voorverwarmde OpenAI realtime websockets."""
+from __future__ import annotations
+import asyncio, logging, math, time
+from collections import deque
+
+log = logging.getLogger("sara.pool")
+
+
+class RealtimePool:
+    """Houdt N geauthenticeerde + geconfigureerde realtime sockets klaar.
+
+    - `acquire()` geeft een warme socket (hit) of verbindt direct (miss)
+    - sockets ouder dan `max_age_s` worden gesloten en vervangen, zodat een
+      call nooit een bijna-verlopen sessie krijgt
+    - de doelgrootte volgt het aantal calls in de laatste `window_s`:
+      verwachte calls binnen `horizon_s` + `min_size`, begrensd op `max_size`
+    """
+
+    def __init__(
+        self,
+        connect,
+        min_size: int = 1,
+        max_size: int = 8,
+        max_age_s: float = 600,
+        window_s: float = 300,
+        horizon_s: float = 10,
+        interval_s: float = 1.0,
+    ):
+        self._connect = connect  # async () -> geconfigureerde socket
+        self.min_size = max(0, min_size)
+        self.max_size = max(self.min_size, max_size)
+        self.max_age_s = max_age_s
+        self.window_s = window_s
+        self.horizon_s = horizon_s
+        self.interval_s = interval_s
+        self._idle: deque = deque()         # (created_at, ws)
+        self._arrivals: deque = deque()     # monotonic timestamps van acquire()
+        self._filling = 0
+        self._task: asyncio.Task | None = None
+        self._bg: set = set()               # refill/discard-taken (sterke referentie)
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.errors = 0
+
+    # ── publieke API
+    async def acquire(self):
+        now = time.monotonic()
+        self._arrivals.append(now)
+        while self._idle:
+            created, ws = self._idle.popleft()
+            if now - created < self.max_age_s and getattr(ws, "open", True):
+                self.hits += 1
+                self._kick()
+                return ws
+            await self._discard(ws)
+            self.expired += 1
+        self.misses += 1
+        self._kick()
+        return await self._connect()
+
+    def target(self) -> int:
+        now = time.monotonic()
+        while self._arrivals and now - self._arrivals[0] > self.window_s:
+            self._arrivals.popleft()
+        rate = len(self._arrivals) / self.window_s if self.window_s else 0.0
+        want = self.min_size + math.ceil(rate * self.horizon_s)
+        return max(self.min_size, min(self.max_size, want))
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "idle": len(self._idle),
+            "filling": self._filling,
+            "target": self.target(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else None,
+            "expired": self.expired,
+            "errors": self.errors,
+        }
+
+    def start(self):
+        if self._task is None and self.max_size > 0:
+            self._task = asyncio.create_task(self._maintain())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        bg = list(self._bg)
+        for t in bg:
+            t.cancel()
+        await asyncio.gather(*bg, return_exceptions=True)
+        while self._idle:
+            _, ws = self._idle.popleft()
+            await self._discard(ws)
+
+    # ── intern
+    def _spawn(self, coro) -> None:
+        # de event-loop houdt taken maar zwak vast: zelf bewaren tot ze klaar zijn
+        t = asyncio.create_task(coro)
+        self._bg.add(t)
+        t.add_done_callback(self._bg.discard)
+
+    def _kick(self):
+        if self._task is not None:
+            self._spawn(self._refill())
+
+    async def _maintain(self):
+        while True:
+            try:
+                self._evict()
+                await self._refill()
+            except Exception as e:
+                log.error(f"pool maintain err: {e}")
+            await asyncio.sleep(self.interval_s)
+
+    def _evict(self):
+        # ruim verlopen (of bijna verlopen) en gesloten sockets op
+        now = time.monotonic()
+        keep = deque()
+        for created, ws in self._idle:
+            if now - created >= self.max_age_s or not getattr(ws, "open", True):
+                self.expired += 1
+                self._spawn(self._discard(ws))
+            else:
+                keep.append((created, ws))
+        self._idle = keep
+
+    async def _refill(self):
+        need = self.target() - len(self._idle) - self._filling
+        if need <= 0:
+            return
+        self._filling += need
+        await asyncio.gather(*(self._add_one() for _ in range(need)))
+
+    async def _add_one(self):
+        try:
+            ws = await self._connect()
+            self._idle.append((time.monotonic(), ws))
+        except Exception as e:
+            self.errors += 1
+            log.error(f"pool connect err: {e}")
+        finally:
+            self._filling -= 1
+
+    @staticmethod
+    async def _discard(ws):
+        try:
+            await ws.close()
+        except Exception:
+            pass
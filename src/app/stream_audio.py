@@ -0,0 +1,257 @@
+"""Audio-plumbing voor de Twilio ↔ OpenAI bridge (inkomend bundelen, uitgaand pacen)."""
+from __future__ import annotations
+import asyncio, base64, logging
+from collections import deque
+
+from src.infra.audio import ULAW_DECODE
+
+log = logging.getLogger("sara.ws")
+
+# ── inkomende frames bundelen
+class FrameAggregator:
+    """Verzamelt μ-law frames en stuurt ze als één chunk door.
+
+    Flush zodra `chunk_ms` audio binnen is, als de oudste frame `chunk_ms`
+    oud is (timer) of expliciet via `flush()` (bij `stop`).
+    """
+    BYTES_PER_MS = 8  # μ-law 8kHz mono
+
+    def __init__(self, send, chunk_ms: int = 100):
+        self._send = send  # async (bytes) -> None
+        self.chunk_ms = max(20, chunk_ms)
+        self._limit = self.chunk_ms * self.BYTES_PER_MS
+        self._buf = bytearray()
+        self._t0 = 0.0
+        self._lock = asyncio.Lock()
+        self._timer: asyncio.Task | None = None
+        self.frames_in = 0
+        self.chunks_out = 0
+
+    async def add(self, ulaw: bytes):
+        if not self._buf:
+            self._t0 = asyncio.get_running_loop().time()
+        self._buf += ulaw
+        self.frames_in += 1
+        if len(self._buf) >= self._limit:
+            await self.flush()
+
+    async def flush(self):
+        async with self._lock:
+            if not self._buf:
+                return
+            chunk = bytes(self._buf)
+            self._buf.clear()
+            self.chunks_out += 1
+            await self._send(chunk)
+
+    async def _tick(self):
+        wait = self.chunk_ms / 1000
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(wait)
+            if self._buf and loop.time() - self._t0 >= wait:
+                await self.flush()
+
+    def start(self):
+        if self._timer is None:
+            self._timer = asyncio.create_task(self._tick())
+
+    async def close(self):
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        await self.flush()
+
+# ── uitgaande audio pacen (jitterbuffer richting Twilio)
+class OutboundPacer:
+    """Stuurt exact 20ms μ-law frames in real-time tempo naar Twilio.
+
+    - `push()` knipt OpenAI-deltas in frames van 160 bytes
+    - `end_response()` vult de laatste frame aan met stilte en zet een mark
+      in de rij; Twilio bevestigt die zodra alles ervoor is afgespeeld
+    - `clear()` (barge-in) gooit de rij weg en stuurt Twilio `clear`
+    - maximaal `max_ms` audio gebufferd; daarboven vallen de oudste frames weg
+    """
+    FRAME = 160          # 20ms @ 8kHz μ-law
+    FRAME_S = 0.02
+    SILENCE = b"\xff"
+
+    def __init__(self, send, lead_ms: int = 60, max_ms: int = 30_000):
+        self._send = send  # async (dict) -> None (Twilio JSON-bericht)
+        self.tap = None    # optioneel (bytes) -> None per verstuurde frame (opname)
+        self.stream_sid: str | None = None
+        self.lead = max(0, lead_ms) / 1000
+        self.max_frames = max(1, max_ms // 20)
+        self._q: deque = deque()       # bytes (frame) | str (mark-naam)
+        self._frames = 0
+        self._tail = bytearray()
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._play_until = 0.0
+        self.marks_pending: set[str] = set()
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.clears = 0
+
+    @property
+    def busy(self) -> bool:
+        """True zolang er audio in de rij staat of Twilio nog afspeelt."""
+        return bool(self._frames or self._tail or self.marks_pending)
+
+    def push(self, ulaw: bytes):
+        self._tail += ulaw
+        n = len(self._tail) - len(self._tail) % self.FRAME
+        for i in range(0, n, self.FRAME):
+            self._q.append(bytes(self._tail[i:i + self.FRAME]))
+            self._frames += 1
+        del self._tail[:n]
+        self._trim()
+        self._wake.set()
+
+    def end_response(self, mark: str):
+        if self._tail:
+            pad = self.FRAME - len(self._tail)
+            self._q.append(bytes(self._tail) + self.SILENCE * pad)
+            self._frames += 1
+            self._tail.clear()
+        self._q.append(mark)
+        self._wake.set()
+
+    def on_mark(self, name: str):
+        self.marks_pending.discard(name)
+
+    async def clear(self) -> bool:
+        """Barge-in: rij leeg + Twilio `clear`. Geeft True als er iets speelde."""
+        was_busy = self.busy
+        self._q.clear()
+        self._frames = 0
+        self._tail.clear()
+        self.marks_pending.clear()
+        self._play_until = 0.0
+        if was_busy:
+            self.clears += 1
+            await self._send({"event": "clear", "streamSid": self.stream_sid})
+        return was_busy
+
+    def _trim(self):
+        while self._frames > self.max_frames:
+            item = self._q.popleft()
+            if isinstance(item, bytes):
+                self._frames -= 1
+                self.frames_dropped += 1
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self._q:
+                self._wake.clear()
+                await self._wake.wait()
+                continue
+            now = loop.time()
+            if self._play_until < now:
+                self._play_until = now
+            ahead = self._play_until - now
+            if ahead > self.lead:
+                await asyncio.sleep(ahead - self.lead)
+                continue
+            item = self._q.popleft()
+            if isinstance(item, str):
+                self.marks_pending.add(item)
+                await self._send({"event": "mark", "streamSid": self.stream_sid, "mark": {"name": item}})
+                continue
+            self._frames -= 1
+            self._play_until += self.FRAME_S
+            self.frames_sent += 1
+            if self.tap is not None:
+                self.tap(item)
+            await self._send({
+                "event": "media",
+                "streamSid": self.stream_sid,
+                "media": {"payload": base64.b64encode(item).decode()},
+            })
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+# ── lokale VAD-gate (stilte niet upstream sturen)
+class VadGate:
+    """Energie + zero-crossing-rate per 20ms μ-law frame.
+
+    - spraak: energie boven max(min_energy, ruisvloer × factor), of iets
+      lager maar met hoge ZCR (s/f/sch-klanken)
+    - pre-roll: laatste `preroll_ms` stilte gaat mee bij een spraakbegin,
+      zodat woordbegin niet wegvalt
+    - hangover: na spraak nog `hangover_ms` doorlaten; moet langer zijn dan
+      de server-VAD silence_duration, anders ziet OpenAI nooit het einde
+    """
+    FRAME_MS = 20
+
+    def __init__(self, hangover_ms: int = 800, preroll_ms: int = 200,
+                 min_energy: float = 4e4, factor: float = 4.0, zcr_hi: float = 0.25):
+        self.hang_frames = max(1, hangover_ms // self.FRAME_MS)
+        self._pre: deque = deque(maxlen=max(0, preroll_ms // self.FRAME_MS))
+        self.min_energy = min_energy
+        self.factor = factor
+        self.zcr_hi = zcr_hi
+        self.floor = min_energy / factor
+        self._hang = 0
+        self.frames_passed = 0
+        self.frames_suppressed = 0
+
+    @staticmethod
+    def features(ulaw: bytes) -> tuple[float, float]:
+        """(gemiddelde energie, zero-crossing-rate) van één frame."""
+        if not ulaw:
+            return 0.0, 0.0
+        dec = ULAW_DECODE
+        e = 0
+        zc = 0
+        prev = dec[ulaw[0]]
+        for b in ulaw:
+            v = dec[b]
+            e += v * v
+            if (v >= 0) != (prev >= 0):
+                zc += 1
+            prev = v
+        n = len(ulaw)
+        return e / n, zc / n
+
+    def is_speech(self, ulaw: bytes) -> bool:
+        energy, zcr = self.features(ulaw)
+        thr = max(self.min_energy, self.floor * self.factor)
+        speech = energy >= thr or (energy >= thr / 4 and zcr >= self.zcr_hi)
+        if not speech:
+            # ruisvloer langzaam volgen, alleen op stilte
+            self.floor = 0.95 * self.floor + 0.05 * energy
+        return speech
+
+    def feed(self, ulaw: bytes) -> list[bytes]:
+        """Frames die door mogen (leeg = onderdrukt)."""
+        if self.is_speech(ulaw):
+            out = list(self._pre) + [ulaw]
+            self.frames_passed += len(out)
+            self._pre.clear()
+            self._hang = self.hang_frames
+            return out
+        if self._hang > 0:
+            self._hang -= 1
+            self.frames_passed += 1
+            return [ulaw]
+        if len(self._pre) == self._pre.maxlen:
+            self.frames_suppressed += 1  # oudste valt uit de pre-roll: definitief weg
+        self._pre.append(ulaw)
+        return []
+
+    def stats(self) -> dict:
+        total = self.frames_passed + self.frames_suppressed
+        return {
+            "passed": self.frames_passed,
+            "suppressed": self.frames_suppressed,
+            "suppressed_ratio": round(self.frames_suppressed / total, 3) if total else None,
+        }
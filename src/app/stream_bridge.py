@@ -1,31 +1,84 @@
 from __future__ import annotations
 from fastapi import APIRouter, WebSocket
-import os, json, base64, asyncio, logging, websockets
-
-# audioop fallback (Py3.13)
-try:
-    import audioop  # type: ignore
-except ModuleNotFoundError:
-    from audioop_lts import audioop  # type: ignore
+import os, json, base64, asyncio, logging, threading, time, websockets
+from collections import deque
 
 # jouw workflow
 from src.workflows import call_flow as cf
 from src.nlu.parse_order import parse_items
 from src.infra import live_settings as ls
+from src.infra import admission, audio, call_events, call_registry
+from src.app.stream_audio import FrameAggregator, OutboundPacer, VadGate
+from src.app.realtime_pool import RealtimePool
+from src.app.turn_timer import TurnTimer
+from src.infra import metrics
+from src.infra.logs import db_log_stats, log_call_recording
+from src.app.call_recorder import CallRecorder
+from src.workflows.prompt_audio import PromptAudioCache
 
 router = APIRouter()
 log = logging.getLogger("sara.ws")
 
 # ── ENV
 OPENAI_MODEL = os.getenv("OPENAI_REALTIME_MODEL", "gpt-4o-realtime-preview")
+# lokaal testen: wijs naar src/tools/fake_realtime.py (bv. ws://127.0.0.1:8765)
+OPENAI_URL   = os.getenv("OPENAI_REALTIME_URL", "wss://api.openai.com/v1/realtime")
 VOICE        = os.getenv("OPENAI_REALTIME_VOICE", "marin")
+# inkomende audio bundelen (Twilio levert 20ms-frames) + server-VAD aan/uit
+IN_CHUNK_MS  = int(os.getenv("SARA_IN_CHUNK_MS", "100"))
+SERVER_VAD   = os.getenv("SARA_SERVER_VAD", "1") != "0"
+# audiomodus: "g711" = μ-law 1-op-1 doorgeven, "pcm16" = transcoderen (fallback)
+AUDIO_MODE   = os.getenv("SARA_AUDIO_MODE", "g711").lower()
+AUDIO_MODES  = ("g711", "pcm16")
+# uitgaand: hoeveel audio we vóór mogen lopen op Twilio + max buffer per call
+OUT_LEAD_MS  = int(os.getenv("SARA_OUT_LEAD_MS", "60"))
+OUT_MAX_MS   = int(os.getenv("SARA_OUT_MAX_MS", "30000"))
+# lokale VAD-gate: stilte niet naar OpenAI sturen (optioneel)
+LOCAL_VAD    = os.getenv("SARA_LOCAL_VAD", "0") == "1"
+VAD_HANG_MS  = int(os.getenv("SARA_LOCAL_VAD_HANGOVER_MS", "800"))  # > server silence_duration_ms
+VAD_PRE_MS   = int(os.getenv("SARA_LOCAL_VAD_PREROLL_MS", "200"))
+
+# opname per call (ringbuffer, weggeschreven bij call-einde)
+RECORD       = os.getenv("SARA_RECORD", "0") == "1"
+REC_DIR      = os.getenv("SARA_REC_DIR", "data/recordings")
+REC_MAX_S    = int(os.getenv("SARA_REC_MAX_S", "300"))
+REC_MMAP     = os.getenv("SARA_REC_MMAP", "0") == "1"
+
+# warme realtime sockets per worker (0 = uit, altijd vers verbinden)
+POOL_MIN     = int(os.getenv("SARA_POOL_MIN", "1"))
+POOL_MAX     = int(os.getenv("SARA_POOL_MAX", "6"))
+POOL_MAX_AGE = float(os.getenv("SARA_POOL_MAX_AGE_S", "600"))
+
+# upstream weggevallen: opnieuw verbinden met backoff, beller-audio zolang bufferen
+RECONNECT_TRIES   = int(os.getenv("SARA_RECONNECT_TRIES", "5"))
+RECONNECT_BASE_MS = int(os.getenv("SARA_RECONNECT_BASE_MS", "200"))
+RECONNECT_MAX_MS  = int(os.getenv("SARA_RECONNECT_MAX_MS", "2000"))
+RECONNECT_BUF_MS  = int(os.getenv("SARA_RECONNECT_BUF_MS", "4000"))
+
+# per-beurt response buiten de gesprekshistorie ("none") of erin ("auto")
+TURN_CONTEXT = os.getenv("SARA_TURN_CONTEXT", "none")
+
+# persona + context één keer per sessie; per beurt alleen de uit te spreken tekst
+SESSION_INSTRUCTIONS = (
+    "Je bent Sara, de digitale belassistent van Ristorante Adam Spanbroek in Spanbroek. "
+    "Je spreekt Nederlands, vriendelijk, rustig en kort. "
+    "Elk bericht dat je krijgt is de tekst die je nu moet uitspreken: zeg die letterlijk, "
+    "voeg niets toe en laat niets weg. Bedragen spreek je uit in euro's."
+)
+
+# vaste zinnen als voorgerenderde audio i.p.v. response.create
+PROMPT_AUDIO = os.getenv("SARA_PROMPT_AUDIO", "1") != "0"
+
+# realtime event-namen (oude + huidige API)
+AUDIO_DELTA_EVENTS = ("output_audio_buffer.delta", "response.audio.delta")
+RESPONSE_DONE_EVENTS = ("response.completed", "response.done")
 
 # ── OpenAI realtime connect (websockets>=12)
 async def openai_connect():
     key = os.getenv("OPENAI_API_KEY", "")
     if not key:
         raise RuntimeError("OPENAI_API_KEY ontbreekt")
-    url = f"wss://api.openai.com/v1/realtime?model={OPENAI_MODEL}"
+    url = f"{OPENAI_URL}?model={OPENAI_MODEL}"
     headers = [
         ("Authorization", f"Bearer {key}"),
         ("OpenAI-Beta", "realtime=v1"),
@@ -44,9 +97,60 @@ async def openai_connect():
         log.error(f"OpenAI connect error: {e}")
         raise
 
-# ── μ-law 8kHz ↔ PCM16
-def ulaw_to_pcm16(b: bytes) -> bytes: return audioop.ulaw2lin(b, 2)
-def pcm16_to_ulaw(b: bytes) -> bytes: return audioop.lin2ulaw(b, 2)
+# ── sessieconfig per audiomodus
+def session_config(mode: str) -> dict:
+    fmt = "g711_ulaw" if mode == "g711" else "pcm16"
+    # NL transcript + VAD; content genereren doen wij zelf met say(): geen
+    # automatische response na een beurt en geen eigen interrupt (barge-in doet de bridge)
+    return {
+        "instructions": SESSION_INSTRUCTIONS,
+        "voice": VOICE,
+        "modalities": ["audio", "text"],
+        "input_audio_format": fmt,
+        "output_audio_format": fmt,
+        "input_audio_transcription": {"model": "gpt-4o-transcribe", "language": "nl"},
+        "turn_detection": (
+            {"type": "server_vad", "threshold": 0.5, "silence_duration_ms": 600,
+             "create_response": False, "interrupt_response": False}
+            if SERVER_VAD else None
+        ),
+    }
+
+async def openai_session():
+    """Verbind + configureer (standaardmodus); gebruikt door pool en bij een miss."""
+    oai = await openai_connect()
+    await oai.send(json.dumps({"type": "session.update", "session": session_config(pick_mode({}))}))
+    return oai
+
+pool = RealtimePool(openai_session, min_size=POOL_MIN, max_size=POOL_MAX, max_age_s=POOL_MAX_AGE)
+
+prompt_cache = PromptAudioCache(VOICE)
+
+async def warm_prompt_audio():
+    """Op de achtergrond (TTS is sync); tot die tijd gaan vaste zinnen live via het model."""
+    if PROMPT_AUDIO and os.getenv("OPENAI_API_KEY"):
+        stop = threading.Event()
+        try:
+            await asyncio.to_thread(prompt_cache.warm, cf.fixed_prompts(), stop)
+        finally:
+            stop.set()  # geannuleerd (shutdown): de thread stopt na de lopende zin
+
+async def start_pool():
+    if POOL_MAX > 0 and os.getenv("OPENAI_API_KEY"):
+        pool.start()
+        log.info(f"realtime pool gestart (min={POOL_MIN} max={POOL_MAX})")
+
+async def stop_pool():
+    await pool.close()
+
+def pick_mode(start: dict) -> str:
+    """Modus per sessie via TwiML <Parameter name="audio_mode">, anders env."""
+    m = ((start or {}).get("customParameters") or {}).get("audio_mode", "").lower()
+    return m if m in AUDIO_MODES else (AUDIO_MODE if AUDIO_MODE in AUDIO_MODES else "pcm16")
+
+# ── μ-law 8kHz ↔ PCM16 (tabel/vectorized, zie src/infra/audio.py)
+def ulaw_to_pcm16(b: bytes) -> bytes: return audio.ulaw_decode(b)
+def pcm16_to_ulaw(b: bytes) -> bytes: return audio.ulaw_encode(b)
 
 # ── dunne state (businesslogica zit in cf.*)
 class State:
@@ -60,6 +164,11 @@ class State:
             if k in by: by[k].qty += it.qty
             else: by[k] = cf.Item(**it.__dict__)
         self.items = list(by.values())
+    def copy(self) -> "State":
+        c = State()
+        c.mode = self.mode
+        c.items = [cf.Item(**i.__dict__) for i in self.items]
+        return c
 
 def detect_mode(t: str) -> str | None:
     t = t.lower()
@@ -73,15 +182,121 @@ def detect_yesno(t: str) -> str | None:
     if any(w in t for w in ["nee", "niet goed"]): return "nee"
     return None
 
-async def say(oai, text: str):
-    await oai.send(json.dumps({
+def plan_turn(st: State, user: str, s: dict) -> tuple[State, str]:
+    """Beslislogica per beurt, zonder side-effects: (nieuwe state, tekst voor say())."""
+    nst = st.copy()
+    md = detect_mode(user)
+    if md: nst.mode = md
+    items, _ = parse_items(user)
+    if items: nst.merge(items)
+
+    # beslis vervolgstap via jouw workflow
+    if not nst.items:
+        return nst, cf.ASK_ORDER
+    if not nst.mode:
+        return nst, cf.ASK_MODE
+
+    mins = cf.total_minutes(nst.mode, nst.items, s)
+    tline = cf.time_phrase(nst.mode, mins)
+    summary, total = cf.summarize(nst.items)
+    pay = cf.payment_phrase(nst.mode)
+
+    yn = detect_yesno(user)
+    if yn == "ja":
+        return nst, f"Dank u wel. De bestelling staat genoteerd: {summary}. Totaal {total} euro. {tline} {pay}. Fijne avond!"
+    if yn == "nee":
+        return nst, cf.ASK_CHANGE
+    return nst, f"Ik heb genoteerd: {summary}. Dat is in totaal {total} euro. {tline} {pay}. Klopt dat?"
+
+def restore_events(st: State) -> list[dict]:
+    """Na reconnect: stand van de bestelling in de nieuwe sessie zetten. Alleen nodig
+    als responses de gesprekshistorie zien; de beslislogica zelf draait op `st` hier."""
+    if TURN_CONTEXT == "none" or (not st.mode and not st.items):
+        return []
+    summary, total = cf.summarize(st.items)
+    note = (f"Gesprek hervat na een storing. Modus: {st.mode or 'nog onbekend'}. "
+            f"Bestelling tot nu toe: {summary or 'nog niets'} (totaal {total} euro).")
+    return [{
+        "type": "conversation.item.create",
+        "item": {"type": "message", "role": "system", "content": [{"type": "input_text", "text": note}]},
+    }]
+
+def match_key(t: str) -> str:
+    """Vergelijkingssleutel partial ↔ final transcript. Alleen hoofdletters/witruimte
+    negeren: komma's sturen parse_items, dus die moeten gelijk zijn."""
+    return " ".join(t.lower().split())
+
+def turn_payload(text: str) -> str:
+    """Compacte response.create: alleen de tekst als input-item; persona zit in de sessie."""
+    return json.dumps({
         "type": "response.create",
         "response": {
-            "modalities": ["audio"],
-            "instructions": text,
-            "audio": {"voice": VOICE}
-        }
-    }))
+            "conversation": TURN_CONTEXT,
+            "input": [{
+                "type": "message",
+                "role": "user",
+                "content": [{"type": "input_text", "text": text}],
+            }],
+        },
+    }, ensure_ascii=False)
+
+async def say(oai, text: str):
+    msg = turn_payload(text)
+    # ~4 tekens per token: schatting van wat wij per beurt meesturen
+    metrics.histogram("prompt.turn_tokens_est").record(len(msg) / 4)
+    await oai.send(msg)
+
+def record_usage(resp: dict):
+    """Werkelijk tokengebruik uit response.done/completed (indien meegestuurd)."""
+    u = (resp or {}).get("usage") or {}
+    for k in ("input_tokens", "output_tokens"):
+        if isinstance(u.get(k), int):
+            metrics.histogram(f"prompt.{k}").record(u[k])
+            metrics.incr(f"prompt.{k}_total", u[k])
+
+_tasks: set = set()
+
+def spawn(coro) -> asyncio.Task:
+    """Achtergrondtaak met een sterke referentie tot hij klaar is (de event-loop
+    houdt alleen een zwakke: anders kan hij halverwege opgeruimd worden)."""
+    t = asyncio.create_task(coro)
+    _tasks.add(t)
+    t.add_done_callback(_task_done)
+    return t
+
+def _task_done(t: asyncio.Task) -> None:
+    _tasks.discard(t)
+    if not t.cancelled() and t.exception() is not None:
+        log.error(f"achtergrondtaak {t.get_coro().__qualname__} err: {t.exception()!r}")
+
+async def finish_recording(rec: CallRecorder):
+    """Na de call: bestanden schrijven + koppelen aan call_sessions, buiten de event-loop."""
+    try:
+        st = rec.stats()
+        path = await asyncio.to_thread(rec.flush)
+        if path is None:
+            return
+        metrics.histogram("rec.write_ns_per_frame").record(st["write_ns_per_frame"])
+        metrics.incr("rec.bytes", st["in_bytes"] + st["out_bytes"])
+        log.info(f"REC {path} {st}")
+        await asyncio.to_thread(log_call_recording, rec.call_id, str(path))
+    except Exception as e:
+        log.error(f"REC err: {e}")
+
+@router.get("/realtime/stats")
+def realtime_stats():
+    return {
+        "pool": pool.stats(),
+        "prompt_audio": prompt_cache.stats(),
+        "latency": metrics.snapshot("turn."),
+        "prompt_tokens": metrics.snapshot("prompt."),
+        "recording": metrics.snapshot("rec."),
+        "admission": admission.stats(),
+        "upstream": metrics.snapshot("upstream."),
+        "db_logs": db_log_stats(),
+        "call_events": call_events.stats(),
+        "counters": metrics.counters(),
+    }
 
 @router.websocket("/ws/twilio")
 async def ws_twilio(ws: WebSocket):
@@ -95,25 +310,184 @@ async def ws_twilio(ws: WebSocket):
     log.info(f"WS accepted. proto={proto}")
 
     try:
-        oai = await openai_connect()
+        oai = await pool.acquire()  # warm uit de pool, anders vers (al geconfigureerd)
     except Exception:
         await ws.close()
         return
 
-    # NL transcript + VAD; content genereren doen wij zelf met say()
-    await oai.send(json.dumps({
-        "type": "session.update",
-        "session": {
-            "input_audio_transcription": {"model": "gpt-4o-transcribe", "language": "nl"},
-            "turn_detection": {"type": "server_vad", "threshold": 0.5, "silence_duration_ms": 600}
-        }
-    }))
+    mode = pick_mode({})
 
     st = State()
+    pcm = audio.PcmTranscoder()  # alleen gebruikt in pcm16-modus (8k ↔ 24k)
+
+    upstream_down = False            # OpenAI-socket weg, reconnect loopt
+    closing = False                  # call loopt af: niet meer reconnecten
+    inbuf: deque[bytes] = deque()    # beller-audio tijdens reconnect (begrensd)
+    inbuf_bytes = 0
+    inbuf_dropped = 0
+
+    def buffer_in(ulaw: bytes):
+        nonlocal inbuf_bytes, inbuf_dropped
+        inbuf.append(ulaw)
+        inbuf_bytes += len(ulaw)
+        while inbuf_bytes > RECONNECT_BUF_MS * 8:  # μ-law: 8 bytes/ms
+            old = inbuf.popleft()
+            inbuf_bytes -= len(old)
+            inbuf_dropped += len(old)
+
+    async def send_audio(ulaw: bytes):
+        nonlocal upstream_down
+        if upstream_down:
+            buffer_in(ulaw)
+            return
+        data = ulaw if mode == "g711" else pcm.to_realtime(ulaw)
+        try:
+            await oai.send(json.dumps({"type": "input_audio_buffer.append", "audio": base64.b64encode(data).decode()}))
+            if not SERVER_VAD:
+                # zonder server-VAD moeten wij zelf committen (per chunk, niet per frame)
+                await oai.send(json.dumps({"type": "input_audio_buffer.commit"}))
+        except Exception as e:
+            # pump_out merkt de verbroken socket en reconnect; tot dan bufferen
+            log.warning(f"upstream send err: {e}")
+            upstream_down = True
+            buffer_in(ulaw)
+
+    agg = FrameAggregator(send_audio, IN_CHUNK_MS)
+    gate = VadGate(hangover_ms=VAD_HANG_MS, preroll_ms=VAD_PRE_MS) if LOCAL_VAD else None
+
+    async def send_twilio(msg: dict):
+        await ws.send_text(json.dumps(msg))
+
+    pacer = OutboundPacer(send_twilio, lead_ms=OUT_LEAD_MS, max_ms=OUT_MAX_MS)
+    rec = CallRecorder(REC_DIR, max_s=REC_MAX_S, use_mmap=REC_MMAP) if RECORD else None
+    if rec is not None:
+        pacer.tap = rec.write_out
+    resp_seq = 0
+    resp_id: str | None = None       # response waarvan nu audio binnenkomt
+    resp_active = False              # response.create verstuurd, nog niet klaar
+    cancelled: set[str] = set()      # na barge-in: late deltas negeren
+    drop_audio = False               # barge-in vóór de eerste delta: tot response.done niets afspelen
+    timer = TurnTimer()
+    call_id: str | None = None
+    end_reason = "disconnected"      # → call_sessions.result
+    last_say: str | None = None      # tekst van de lopende response (voor herhalen na reconnect)
+    pending_say: str | None = None   # say() tijdens reconnect
+
+    async def speak(text: str):
+        nonlocal resp_seq, resp_active, last_say, pending_say
+        if rec is not None:
+            rec.event("say", text=text)
+        pre = prompt_cache.get(text) if PROMPT_AUDIO else None
+        if pre is not None:
+            # voorgerenderd: direct de pacer in, geen model-roundtrip (dus geen
+            # say_sent: anders telt model_ttfa_ms een ~0ms-beurt mee)
+            timer.mark("cached_audio")
+            pacer.push(pre)
+            resp_seq += 1
+            pacer.end_response(f"prompt_{resp_seq}")
+            timer.mark("first_audio")
+            timer.mark("response_done")
+            record_turn()
+            return
+        if upstream_down:
+            pending_say = text
+            return
+        resp_active = True
+        last_say = text
+        try:
+            await say(oai, text)
+        except Exception as e:
+            log.warning(f"upstream say err: {e}")
+            resp_active = False
+            pending_say = text  # na reconnect alsnog
+            return
+        timer.mark("say_sent")
+
+    def record_turn():
+        res = timer.finish()
+        if not res or not call_id:
+            return
+        log.info(f"TURN {timer.turn} {res}")
+        # alleen echte beurten (beller stopt → Sara klinkt); de begroeting heeft
+        # geen turn_ms en hoort niet in turns/mean/p95 van call_sessions
+        if "turn_ms" not in res:
+            return
+        call_registry.update(call_id, turns=timer.turn, last_turn_ms=res["turn_ms"])
+        log_event("turn_latency", {"turn": timer.turn, **res}, int(res["turn_ms"]))
+
+    def log_event(event: str, data: dict, latency_ms: int):
+        # alleen in het geheugen; de writer-thread schrijft in batches
+        if call_id:
+            call_events.event(call_id, event, data=data, latency_ms=latency_ms)
+
+    async def reconnect() -> bool:
+        """Nieuwe realtime-sessie (warm uit de pool als het kan), config + state terug,
+        gebufferde audio na, onderbroken zin opnieuw. False = opgegeven."""
+        nonlocal oai, upstream_down, resp_id, resp_active, drop_audio, pending_say, inbuf_bytes, inbuf_dropped, end_reason
+        upstream_down = True
+        t0 = time.perf_counter()
+        if call_id:
+            call_registry.update(call_id, upstream="reconnecting")
+        metrics.incr("upstream.drops")
+        try: await oai.close()
+        except: pass
+        new = None
+        attempt = 0
+        while attempt < RECONNECT_TRIES and not closing:
+            attempt += 1
+            try:
+                new = await pool.acquire()
+                await new.send(json.dumps({"type": "session.update", "session": session_config(mode)}))
+                for ev in restore_events(st):
+                    await new.send(json.dumps(ev))
+                break
+            except Exception as e:
+                log.warning(f"upstream reconnect {attempt}/{RECONNECT_TRIES} mislukt: {e}")
+                if new is not None:
+                    try: await new.close()
+                    except: pass
+                new = None
+                await asyncio.sleep(min(RECONNECT_MAX_MS, RECONNECT_BASE_MS * 2 ** (attempt - 1)) / 1000)
+        ms = int((time.perf_counter() - t0) * 1000)
+        info = {"attempts": attempt, "buffered_ms": inbuf_bytes // 8, "dropped_ms": inbuf_dropped // 8}
+        if new is None:
+            metrics.incr("upstream.reconnect_failed")
+            log.error(f"upstream reconnect opgegeven na {ms}ms {info}")
+            log_event("upstream_reconnect", {"ok": False, **info}, ms)
+            end_reason = "upstream_failed"
+            return False
+
+        oai = new
+        upstream_down = False
+        buffered = list(inbuf)
+        inbuf.clear()
+        inbuf_bytes = inbuf_dropped = 0
+        for chunk in buffered:
+            await send_audio(chunk)
+        # audio van de oude response komt niet meer; zin opnieuw uitspreken
+        if resp_id:
+            cancelled.add(resp_id)
+        resp_id = None
+        redo = pending_say or (last_say if resp_active else None)
+        resp_active = False
+        drop_audio = False
+        pending_say = None
+        if redo:
+            await speak(redo)
+        metrics.histogram("upstream.recovery_ms").record_ms(ms)
+        metrics.incr("upstream.reconnects")
+        log.info(f"upstream hersteld in {ms}ms {info}")
+        if call_id:
+            call_registry.update(call_id, upstream="ok")
+        log_event("upstream_reconnect", {"ok": True, **info}, ms)
+        return True
 
     async def pump_in():
+        nonlocal mode, call_id, closing, end_reason
         try:
             opened = False
+            agg.start()
+            pacer.start()
             while True:
                 raw = await ws.receive_text()
                 m = json.loads(raw)
@@ -121,93 +495,186 @@ async def ws_twilio(ws: WebSocket):
 
                 if ev == "start" and not opened:
                     opened = True
-                    ts = cf.time_status(cf.now_ams())
-                    if ts and any(k in ts.lower() for k in ("gesloten", "niet geopend")):
-                        await say(oai, ts)
-                    else:
-                        await say(oai, "Goedendag, u spreekt met Sara, de belassistent van Ristorante Adam Spanbroek. Wat wilt u bestellen?")
+                    pacer.stream_sid = m.get("streamSid") or (m.get("start") or {}).get("streamSid")
+                    sid = (m.get("start") or {}).get("callSid") or pacer.stream_sid
+                    if not await admission.confirm(sid):
+                        # worker vol: stream sluiten → Twilio gaat door naar /twilio/overflow
+                        closing = True
+                        break
+                    call_id = sid
+                    cp = (m.get("start") or {}).get("customParameters") or {}
+                    call_events.start(call_id, cp.get("from"), cp.get("to"))
+                    call_registry.register(call_id, stream_sid=pacer.stream_sid)
+                    if rec is not None:
+                        rec.call_id = call_id
+                        rec.meta = {"stream_sid": pacer.stream_sid, "start": m.get("start") or {}}
+                        rec.event("start")
+                    md = pick_mode(m.get("start"))
+                    if md != mode:
+                        mode = md
+                        await oai.send(json.dumps({"type": "session.update", "session": session_config(mode)}))
+                    log.info(f"audio mode={mode}")
+                    call_registry.update(call_id, audio_mode=mode)
+                    await speak(cf.opening_stream(cf.now_ams()))
 
                 elif ev == "media":
-                    pcm16 = ulaw_to_pcm16(base64.b64decode(m["media"]["payload"]))
-                    await oai.send(json.dumps({"type": "input_audio_buffer.append", "audio": base64.b64encode(pcm16).decode()}))
-                    await oai.send(json.dumps({"type": "input_audio_buffer.commit"}))
+                    frame = base64.b64decode(m["media"]["payload"])
+                    if rec is not None:
+                        rec.write_in(frame)
+                    if gate is None:
+                        await agg.add(frame)
+                    else:
+                        for f in gate.feed(frame):
+                            await agg.add(f)
                     # geen auto response.create; we wachten transcript-event en spreken zelf met say()
 
+                elif ev == "mark":
+                    pacer.on_mark((m.get("mark") or {}).get("name", ""))
+                    if rec is not None:
+                        rec.event("mark", name=(m.get("mark") or {}).get("name", ""))
+
                 elif ev == "stop":
+                    closing = True
+                    end_reason = "ok"
+                    if rec is not None:
+                        rec.event("stop")
                     break
         except Exception as e:
             log.error(f"IN err: {e}")
         finally:
+            closing = True
+            try: await agg.close()
+            except Exception as e: log.error(f"IN flush err: {e}")
+            log.info(f"IN frames={agg.frames_in} chunks={agg.chunks_out}")
+            if gate is not None:
+                metrics.incr("vad.frames_passed", gate.frames_passed)
+                metrics.incr("vad.frames_suppressed", gate.frames_suppressed)
+                log.info(f"VAD {gate.stats()}")
+            log.info(f"OUT frames={pacer.frames_sent} dropped={pacer.frames_dropped} clears={pacer.clears}")
             try: await oai.send(json.dumps({"type": "session.close"}))
             except: pass
 
+    partial: dict[str, str] = {}   # item_id → transcript tot nu toe
+    spec: tuple | None = None      # (match_key, basis-state, nieuwe state, antwoord)
+
     async def pump_out():
-        try:
-            async for frame in oai:
-                try:
-                    d = json.loads(frame)
-                except Exception:
-                    continue
-                t = d.get("type")
-
-                # audio terug naar Twilio
-                if t == "output_audio_buffer.delta":
-                    ulaw = pcm16_to_ulaw(base64.b64decode(d["audio"]))
-                    await ws.send_text(json.dumps({"event": "media", "media": {"payload": base64.b64encode(ulaw).decode()}}))
-                    continue
-
-                # transcript ontvangen
-                if t in (
-                    "input_audio_transcription.completed",
-                    "response.input_audio_transcription.completed",
-                    "conversation.item.input_audio_transcription.completed",
-                ):
-                    tx = d.get("transcript") or d.get("input_audio_transcription", {}).get("text") or d.get("text", "")
-                    user = (tx or "").strip().lower()
-                    if not user:
+        nonlocal resp_seq, resp_id, resp_active, drop_audio, st, spec
+        while True:
+            try:
+                async for frame in oai:
+                    try:
+                        d = json.loads(frame)
+                    except Exception:
                         continue
-                    log.info(f"USER> {user}")
+                    t = d.get("type")
 
-                    # update state
-                    md = detect_mode(user)
-                    if md: st.mode = md
-                    items, _ = parse_items(user)
-                    if items: st.merge(items)
-
-                    # beslis vervolgstap via jouw workflow
-                    if not st.items:
-                        await say(oai, "Wat wilt u bestellen?")
+                    # audio terug naar Twilio (via pacer: 20ms frames, real-time tempo)
+                    if t in AUDIO_DELTA_EVENTS:
+                        rid = d.get("response_id")
+                        if drop_audio and rid:
+                            cancelled.add(rid)
+                        if rid and rid in cancelled:
+                            continue
+                        resp_id = rid
+                        timer.mark("first_audio")
+                        raw = base64.b64decode(d.get("audio") or d.get("delta") or "")
+                        pacer.push(raw if mode == "g711" else pcm.from_realtime(raw))
                         continue
 
-                    if st.items and not st.mode:
-                        await say(oai, "Wilt u laten bezorgen of komt u het afhalen?")
+                    if t == "input_audio_buffer.speech_stopped":
+                        timer.mark("speech_stopped")
                         continue
 
-                    s = ls.get_all()
-                    mins = cf.total_minutes(st.mode, st.items, s)
-                    tline = cf.time_phrase(st.mode, mins)
-                    summary, total = cf.summarize(st.items)
-                    pay = cf.payment_phrase(st.mode)
-
-                    yn = detect_yesno(user)
-                    if yn == "ja":
-                        await say(oai, f"Dank u wel. De bestelling staat genoteerd: {summary}. Totaal {total} euro. {tline} {pay}. Fijne avond!")
+                    # barge-in: beller praat door Sara heen → afspelen stoppen
+                    if t == "input_audio_buffer.speech_started":
+                        cleared = await pacer.clear()   # Twilio `clear` alleen als er audio stond
+                        if (cleared or resp_active) and resp_id:
+                            cancelled.add(resp_id)
+                        if resp_active:
+                            # ook vóór de eerste audio-delta: anders speelt het antwoord
+                            # alsnog over de beller heen
+                            await oai.send(json.dumps({"type": "response.cancel"}))
+                            drop_audio = resp_id is None  # id nog onbekend: deltas tot response.done weg
+                        if cleared or resp_active:
+                            log.info(f"barge-in: {'clear' if cleared else 'geen audio'}"
+                                     f"{' + response.cancel' if resp_active else ''}")
                         continue
-                    if yn == "nee":
-                        await say(oai, "Geen probleem. Wat wilt u wijzigen of toevoegen?")
+
+                    # partial transcript: alvast vooruit rekenen (niets zeggen)
+                    if t == "conversation.item.input_audio_transcription.delta":
+                        iid = d.get("item_id", "")
+                        partial[iid] = partial.get(iid, "") + (d.get("delta") or "")
+                        text = partial[iid].strip().lower()
+                        if text:
+                            nst, reply = plan_turn(st, text, ls.snapshot())
+                            spec = (match_key(text), st, nst, reply)
                         continue
 
-                    await say(oai, f"Ik heb genoteerd: {summary}. Dat is in totaal {total} euro. {tline} {pay}. Klopt dat?")
-                    continue
+                    # transcript ontvangen
+                    if t in (
+                        "input_audio_transcription.completed",
+                        "response.input_audio_transcription.completed",
+                        "conversation.item.input_audio_transcription.completed",
+                    ):
+                        partial.pop(d.get("item_id", ""), None)
+                        tx = d.get("transcript") or d.get("input_audio_transcription", {}).get("text") or d.get("text", "")
+                        user = (tx or "").strip().lower()
+                        if not user:
+                            spec = None
+                            continue
+                        timer.mark("transcript")
+                        log.info(f"USER> {user}")
+                        if rec is not None:
+                            rec.event("transcript", text=user)
 
-                if t == "response.completed":
-                    await ws.send_text(json.dumps({"event": "mark", "mark": {"name": "oai_done"}}))
-        except Exception as e:
-            log.error(f"OUT err: {e}")
+                        # speculatief antwoord bruikbaar als de final gelijk is aan de partial
+                        if spec and spec[1] is st and spec[0] == match_key(user):
+                            st, reply = spec[2], spec[3]
+                            metrics.incr("turn.spec_hit")
+                        else:
+                            if spec:
+                                metrics.incr("turn.spec_miss")
+                            st, reply = plan_turn(st, user, ls.snapshot())  # geen DB-I/O in de websocket-loop
+                        spec = None
+                        timer.mark("parsed")
+                        if call_id:
+                            call_registry.update(call_id, mode=st.mode, items=[i.__dict__ for i in st.items])
+                        await speak(reply)
+                        continue
+
+                    if t in RESPONSE_DONE_EVENTS:
+                        resp_seq += 1
+                        pacer.end_response(f"oai_done_{resp_seq}")
+                        resp_id = None
+                        resp_active = False
+                        drop_audio = False
+                        record_usage(d.get("response"))
+                        timer.mark("response_done")
+                        record_turn()
+            except Exception as e:
+                log.error(f"OUT err: {e}")
+            # socket dicht terwijl de beller er nog is → opnieuw verbinden
+            if closing or not await reconnect():
+                break
 
     t1 = asyncio.create_task(pump_in())
     t2 = asyncio.create_task(pump_out())
     await asyncio.wait([t1, t2], return_when=asyncio.FIRST_COMPLETED)
+    closing = True
+    for t in (t1, t2):
+        t.cancel()
+    await pacer.close()
+    if call_id:
+        await admission.release(call_id)
+        call_registry.unregister(call_id)
+        summary = call_events.end(
+            call_id, end_reason,
+            order_total=cf.summarize(st.items)[1] if st.items else None,
+            data={"mode": st.mode, "items": [i.__dict__ for i in st.items]},
+        )
+        log.info(f"CALL END {call_id} {end_reason} turns={summary['turns']} p95={summary['lat_p95']}")
+    if rec is not None:
+        spawn(finish_recording(rec))
 
     try: await oai.close()
     except: pass
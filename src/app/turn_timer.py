@@ -0,0 +1,46 @@
+"""Tijdstempels per beurt in de realtime call-loop (beller stopt → Sara klinkt)."""
+from __future__ import annotations
+import time
+from typing import Dict, Optional
+
+from src.infra import metrics
+
+STAGES = ("speech_stopped", "transcript", "parsed", "say_sent", "cached_audio", "first_audio", "response_done")
+
+# (naam, van, tot) → histogram "turn.<naam>"
+SPANS = (
+    ("asr_ms", "speech_stopped", "transcript"),
+    ("nlu_ms", "transcript", "parsed"),
+    ("prompt_ms", "parsed", "say_sent"),
+    ("cached_prompt_ms", "parsed", "cached_audio"),   # voorgerenderde zin i.p.v. model
+    ("model_ttfa_ms", "say_sent", "first_audio"),
+    ("turn_ms", "speech_stopped", "first_audio"),
+    ("total_ms", "speech_stopped", "response_done"),
+)
+
+
+class TurnTimer:
+    """Eén per call. `mark()` per stage; `finish()` bij response klaar."""
+
+    def __init__(self):
+        self.turn = 0
+        self._t: Dict[str, float] = {}
+
+    def mark(self, stage: str) -> None:
+        if stage == "speech_stopped":
+            self._t = {}
+            self.turn += 1
+        self._t.setdefault(stage, time.perf_counter())
+
+    def finish(self) -> Optional[Dict[str, float]]:
+        """Rond de beurt af: spans in ms naar histogrammen; None als er niets te meten viel."""
+        t, self._t = self._t, {}
+        if "say_sent" not in t and "cached_audio" not in t:
+            return None
+        out: Dict[str, float] = {}
+        for name, a, b in SPANS:
+            if a in t and b in t:
+                ms = round((t[b] - t[a]) * 1000, 1)
+                out[name] = ms
+                metrics.histogram(f"turn.{name}").record_ms(ms)
+        return out or None
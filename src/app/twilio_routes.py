@@ -1,27 +1,67 @@
 from __future__ import annotations
 from fastapi import APIRouter, Request, Response
-from twilio.twiml.voice_response import VoiceResponse, Gather
+from twilio.twiml.voice_response import VoiceResponse, Gather, Connect
 from src.workflows.call_flow import (
     now_ams, time_status, greeting, Item,
     total_minutes, time_phrase, payment_phrase, summarize
 )
-from src.infra import live_settings
+from src.infra import admission, gather_state, live_settings
+from src.infra.settings import settings as app_settings
 from src.nlu.parse_order import parse_items
-import json
+import json, os, uuid
 
 router = APIRouter(prefix="/twilio", tags=["twilio"])
 VOICE_OPTS = dict(language="nl-NL")  # evt. voice toevoegen als je Polly gebruikt
 
+STREAM_URL = os.getenv("SARA_STREAM_URL", "wss://sara-assistent.onrender.com/ws/twilio")
+OVERLOAD_FALLBACK = os.getenv("SARA_OVERLOAD_FALLBACK", "gather")  # gather | forward
+
+
 @router.post("/voice")
-async def inbound_call(_: Request):
-    from twilio.twiml.voice_response import VoiceResponse, Connect
-    resp = VoiceResponse()
-    resp.say("Een moment, ik verbind u met SARA.", language="nl-NL")
-    connect = Connect()
-    connect.stream(url="wss://sara-assistent.onrender.com/ws/twilio")
-    resp.append(connect)
-    return Response(str(resp), media_type="application/xml")
+async def inbound_call(request: Request):
+    """Realtime-stream als er plek is; anders terugvallen op Gather of doorverbinden."""
+    form = await request.form()
+    sid = form.get("CallSid") or f"anon-{uuid.uuid4().hex}"
+    if await admission.admit(sid):
+        resp = VoiceResponse()
+        resp.say("Een moment, ik verbind u met SARA.", **VOICE_OPTS)
+        connect = Connect()
+        stream = connect.stream(url=STREAM_URL)
+        # komt terug als start.customParameters (voor call_sessions)
+        stream.parameter(name="from", value=form.get("From") or "")
+        stream.parameter(name="to", value=form.get("To") or "")
+        resp.append(connect)
+        # alleen bereikt als wíj de stream sluiten (worker vol bij confirm, upstream
+        # weg); hangt de beller op dan voert Twilio niets meer uit
+        resp.redirect("/twilio/overflow")
+        return Response(str(resp), media_type="application/xml")
+    return overload_fallback()
+
+
+@router.post("/overflow")
+async def overflow_call(_: Request):
+    """Stream door de bridge gesloten (overbelast/storing): zelfde fallback als bij /voice."""
+    return overload_fallback()
+
+
+def overload_fallback() -> Response:
+    if OVERLOAD_FALLBACK == "forward" and app_settings.FORWARD_LIVE:
+        resp = VoiceResponse()
+        resp.say("Het is op dit moment erg druk. Ik verbind u door met een medewerker.", **VOICE_OPTS)
+        resp.dial(app_settings.FORWARD_LIVE)
+        return Response(str(resp), media_type="application/xml")
+    return gather_welcome()
+
 
+@router.post("/gather")
+async def gather_call(_: Request):
+    """Gather-flow zonder realtime-sessie (ook de no-input-herhaling)."""
+    return gather_welcome()
+
+
+def gather_welcome() -> Response:
+    resp = VoiceResponse()
+    ts = time_status(now_ams())
     if ts:
         # Gesloten (incl. begroeting in de tekst): melden en ophangen
         if ("niet geopend" in ts.lower()) or ("gesloten" in ts.lower()):
@@ -42,8 +82,8 @@ async def inbound_call(_: Request):
     )
     gather.say("Waarmee kan ik u helpen?", **VOICE_OPTS)
     resp.append(gather)
-    # Geen input? Nog een poging
-    resp.redirect("/twilio/voice")
+    # Geen input? Nog een poging (zonder opnieuw admission)
+    resp.redirect("/twilio/gather")
 
     return Response(str(resp), media_type="application/xml")
 
@@ -58,24 +98,33 @@ async def handle_intent(request: Request):
     """
     form = await request.form()
     speech = (form.get("SpeechResult") or "").lower().strip()
+    sid = form.get("CallSid") or ""
 
     # ---- logging: wat Twilio verstaan heeft
     print(json.dumps({"twilio_speech": speech}, ensure_ascii=False))
 
+    # state van eerdere beurten (mag op een andere worker zijn gezet)
+    sess = await gather_state.load(sid) if sid else gather_state.GatherSession()
+
     # 1) Modus bepalen
-    mode = ""
     if "bezorg" in speech:
-        mode = "bezorgen"
+        sess.mode = "bezorgen"
     elif "afhaal" in speech or "afhalen" in speech:
-        mode = "afhalen"
+        sess.mode = "afhalen"
+    mode = sess.mode
 
-    # 2) Items uit de spraak halen
-    items, misses = parse_items(speech)
+    # 2) Items uit de spraak halen en bij eerdere beurten optellen
+    new_items, misses = parse_items(speech)
+    sess.merge(new_items)
+    items = sess.items
+    if sid:
+        await gather_state.save(sid, sess)
 
     # ---- logging: parserresultaat
     print(json.dumps({
         "mode": mode or None,
-        "parsed_items": [i.__dict__ for i in items],
+        "parsed_items": [i.__dict__ for i in new_items],
+        "order_items": [i.__dict__ for i in items],
         "misses": misses
     }, ensure_ascii=False))
 
@@ -101,7 +150,7 @@ async def handle_intent(request: Request):
         return Response(str(resp), media_type="application/xml")
 
     # 3) Tijd + bedrag + betaallijn
-    settings = live_settings.get_all()
+    settings = await live_settings.aget_all()
     mins = total_minutes(mode, items, settings)
     tline = time_phrase(mode, mins)
     summary, total = summarize(items)
@@ -127,19 +176,32 @@ async def confirm_intent(request: Request):
     """Bevestigt of corrigeert de bestelling."""
     form = await request.form()
     speech = (form.get("SpeechResult") or "").lower().strip()
+    sid = form.get("CallSid") or ""
+    sess = await gather_state.load(sid) if sid else gather_state.GatherSession()
 
     # ---- logging: bevestiging
-    print(json.dumps({"confirm_speech": speech}, ensure_ascii=False))
+    print(json.dumps({
+        "confirm_speech": speech,
+        "mode": sess.mode or None,
+        "order_items": [i.__dict__ for i in sess.items],
+    }, ensure_ascii=False))
 
     resp = VoiceResponse()
     if "ja" in speech:
+        if sid:
+            await gather_state.clear(sid)
         resp.say("Dank u wel. De bestelling staat genoteerd. Een fijne avond!", **VOICE_OPTS)
         resp.hangup()
         return Response(str(resp), media_type="application/xml")
 
     if "nee" in speech:
-        resp.say("Geen probleem. Wat wilt u wijzigen of toevoegen?", **VOICE_OPTS)
-        resp.redirect("/twilio/intent")
+        # bestelling blijft staan; volgende beurt vult aan (geen redirect zonder SpeechResult)
+        gather = Gather(
+            input="speech", action="/twilio/intent", method="POST",
+            language="nl-NL", speech_timeout="auto"
+        )
+        gather.say("Geen probleem. Wat wilt u wijzigen of toevoegen?", **VOICE_OPTS)
+        resp.append(gather)
         return Response(str(resp), media_type="application/xml")
 
     resp.say("Ik heb u niet goed verstaan. Ik verbind u even door.", **VOICE_OPTS)
@@ -0,0 +1,117 @@
+"""
+Admission control voor realtime-calls: hoeveel streams mag deze worker / het cluster tegelijk houden.
+
+- per worker: dict CallSid → verloopmoment (in-process), gehandhaafd in
+  `confirm()` op de worker waar de websocket (de realtime-sessie) landt
+- cluster: Redis sorted set (score = verloopmoment) via één Lua-script, dus
+  tellen + toelaten is atomair; zonder REDIS_URL (of bij Redis-fouten) alleen
+  de worker-limiet
+- /twilio/voice reserveert in het cluster (kort TTL, de websocket moet nog komen);
+  de bridge bevestigt bij het start-event (TTL = max. gespreksduur) en geeft vrij
+  bij einde
+
+Twilio kan webhook en websocket op verschillende workers laten landen: daarom
+telt de worker-limiet pas bij confirm(). Weigert die, dan sluit de bridge de
+stream en gaat Twilio verder met de fallback (/twilio/overflow).
+"""
+from __future__ import annotations
+import logging, os, time
+from typing import Dict
+
+from src.infra import metrics
+from src.infra.redis_client import get_client
+
+log = logging.getLogger("sara.admission")
+
+MAX_WORKER    = int(os.getenv("SARA_MAX_CALLS_WORKER", "20"))   # 0 = geen limiet
+MAX_CLUSTER   = int(os.getenv("SARA_MAX_CALLS_CLUSTER", "0"))   # 0 = geen limiet
+RESERVE_TTL_S = int(os.getenv("SARA_ADMIT_RESERVE_S", "30"))    # webhook → websocket
+CALL_TTL_S    = int(os.getenv("SARA_ADMIT_CALL_S", "1800"))     # langste gesprek
+REDIS_KEY     = os.getenv("SARA_ADMIT_KEY", "sara:active_calls")
+
+# KEYS[1]=zset  ARGV: now, expiry, limit, member  → 1 toegelaten / 0 vol
+_ADMIT_LUA = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+if redis.call('ZSCORE', KEYS[1], ARGV[4]) then
+  redis.call('ZADD', KEYS[1], ARGV[2], ARGV[4])
+  return 1
+end
+local limit = tonumber(ARGV[3])
+if limit > 0 and redis.call('ZCARD', KEYS[1]) >= limit then
+  return 0
+end
+redis.call('ZADD', KEYS[1], ARGV[2], ARGV[4])
+return 1
+"""
+
+_local: Dict[str, float] = {}
+
+
+def _prune(now: float) -> None:
+    for sid in [s for s, exp in _local.items() if exp <= now]:
+        del _local[sid]
+
+
+def local_active() -> int:
+    _prune(time.time())
+    return len(_local)
+
+
+async def _cluster_admit(sid: str, ttl_s: int, limit: int) -> bool:
+    r = get_client()
+    if r is None:
+        return True
+    now = time.time()
+    try:
+        return bool(await r.eval(_ADMIT_LUA, 1, REDIS_KEY, now, now + ttl_s, limit, sid))
+    except Exception as e:
+        # Redis weg: niet alle calls weigeren, de worker-limiet blijft gelden
+        log.warning(f"admission redis err: {e}")
+        metrics.incr("admission.redis_errors")
+        return True
+
+
+async def admit(sid: str) -> bool:
+    """Reserveer een plek in het cluster voor een nieuwe call; False = overbelast."""
+    if not await _cluster_admit(sid, RESERVE_TTL_S, MAX_CLUSTER):
+        metrics.incr("admission.rejected_cluster")
+        log.warning(f"admission: cluster vol (max {MAX_CLUSTER}) call={sid}")
+        return False
+    metrics.incr("admission.admitted")
+    return True
+
+
+async def confirm(sid: str) -> bool:
+    """Stream is op deze worker gestart: worker-limiet checken en de reservering
+    omzetten naar een lopend gesprek. False = worker vol (plek al vrijgegeven)."""
+    now = time.time()
+    _prune(now)
+    if sid not in _local and MAX_WORKER > 0 and len(_local) >= MAX_WORKER:
+        metrics.incr("admission.rejected_worker")
+        log.warning(f"admission: worker vol ({len(_local)}/{MAX_WORKER}) call={sid}")
+        await release(sid)
+        return False
+    _local[sid] = now + CALL_TTL_S
+    await _cluster_admit(sid, CALL_TTL_S, 0)  # bestaand lid verlengen; nooit weigeren
+    return True
+
+
+async def release(sid: str) -> None:
+    _local.pop(sid, None)
+    r = get_client()
+    if r is None:
+        return
+    try:
+        await r.zrem(REDIS_KEY, sid)
+    except Exception as e:
+        log.warning(f"admission release err: {e}")
+
+
+def stats() -> dict:
+    return {
+        "worker_active": local_active(),
+        "worker_max": MAX_WORKER,
+        "cluster_max": MAX_CLUSTER,
+        "cluster": bool(get_client()),
+        **metrics.counters("admission."),
+    }
@@ -0,0 +1,198 @@
+"""
+G.711 μ-law codec + stateful resampler voor de realtime bridge.
+
+- decode: vaste 256-entry tabel (μ-law → PCM16)
+- encode: 64K-tabel op het unsigned 16-bit sample; NumPy-gather als NumPy
+  er is, anders array/memoryview + bytes.__getitem__ (geen audioop nodig)
+- Resampler: polyphase FIR met integer factor (8k↔24k), houdt filterhistorie
+  vast tussen 20ms-frames zodat er geen klikjes op framegrenzen ontstaan
+"""
+from __future__ import annotations
+import math
+import sys
+from operator import mul
+from array import array
+from typing import List
+
+try:
+    import numpy as np  # type: ignore
+except ModuleNotFoundError:  # pragma: no cover - afhankelijk van omgeving
+    np = None
+
+_LE = sys.byteorder == "little"
+
+# ── G.711 μ-law (zelfde afronding als audioop / Sun g711.c)
+_BIAS = 0x84
+_CLIP = 8159
+_SEG_UEND = (0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF, 0x1FFF)
+
+def _ulaw2linear(u: int) -> int:
+    u = ~u & 0xFF
+    t = ((u & 0x0F) << 3) + _BIAS
+    t <<= (u & 0x70) >> 4
+    return (_BIAS - t) if (u & 0x80) else (t - _BIAS)
+
+def _linear2ulaw(sample: int) -> int:
+    v = sample >> 2  # 14-bit
+    if v < 0:
+        v, mask = -v, 0x7F
+    else:
+        mask = 0xFF
+    if v > _CLIP:
+        v = _CLIP
+    v += _BIAS >> 2
+    for seg, end in enumerate(_SEG_UEND):
+        if v <= end:
+            return ((seg << 4) | ((v >> (seg + 1)) & 0x0F)) ^ mask
+    return 0x7F ^ mask
+
+# 256 μ-law codes → int16
+ULAW_DECODE: List[int] = [_ulaw2linear(u) for u in range(256)]
+# 65536 unsigned samples (two's complement) → μ-law byte
+ULAW_ENCODE: bytes = bytes(_linear2ulaw(s - 65536 if s >= 32768 else s) for s in range(65536))
+
+_DEC_PAIRS = [v.to_bytes(2, "little", signed=True) for v in ULAW_DECODE]
+
+if np is not None:
+    _NP_DEC = np.array(ULAW_DECODE, dtype="<i2")
+    _NP_ENC = np.frombuffer(ULAW_ENCODE, dtype=np.uint8)
+
+
+def ulaw_decode(b: bytes) -> bytes:
+    """μ-law → PCM16 little-endian (zelfde sample-rate)."""
+    if np is not None:
+        return _NP_DEC[np.frombuffer(b, dtype=np.uint8)].tobytes()
+    return b"".join(map(_DEC_PAIRS.__getitem__, b))
+
+
+def ulaw_encode(b: bytes) -> bytes:
+    """PCM16 little-endian → μ-law (zelfde sample-rate)."""
+    if np is not None:
+        return _NP_ENC[np.frombuffer(b, dtype="<u2")].tobytes()
+    u = array("H")
+    u.frombytes(b)
+    if not _LE:
+        u.byteswap()
+    return bytes(map(ULAW_ENCODE.__getitem__, u))
+
+
+# ── polyphase resampler (integer factor)
+def _lowpass(taps: int, cutoff: float) -> List[float]:
+    """Windowed-sinc (Blackman); cutoff in cycli/sample op de hoge rate."""
+    mid = (taps - 1) / 2
+    h = []
+    for n in range(taps):
+        x = n - mid
+        s = 2 * cutoff if x == 0 else math.sin(2 * math.pi * cutoff * x) / (math.pi * x)
+        w = 0.42 - 0.5 * math.cos(2 * math.pi * n / (taps - 1)) + 0.08 * math.cos(4 * math.pi * n / (taps - 1))
+        h.append(s * w)
+    g = sum(h)
+    return [v / g for v in h]
+
+
+def _clip16(v: float) -> int:
+    v = int(round(v))
+    return 32767 if v > 32767 else (-32768 if v < -32768 else v)
+
+
+class Resampler:
+    """Stateful PCM16 resampler src_rate → dst_rate (integer verhouding).
+
+    Eén instantie per richting per call; `process()` mag met willekeurige
+    framegroottes worden aangeroepen (bv. 20ms = 160 samples @ 8kHz).
+    """
+
+    def __init__(self, src_rate: int, dst_rate: int, taps_per_phase: int = 16):
+        if src_rate == dst_rate:
+            raise ValueError("src_rate == dst_rate")
+        hi, lo = max(src_rate, dst_rate), min(src_rate, dst_rate)
+        if hi % lo:
+            raise ValueError(f"alleen integer factor: {src_rate}->{dst_rate}")
+        self.factor = hi // lo
+        self.up = dst_rate > src_rate
+        n = taps_per_phase * self.factor
+        # iets onder Nyquist van de lage rate (telefonie loopt tot ~3.4kHz)
+        h = _lowpass(n, 0.45 / self.factor)
+        if self.up:
+            h = [v * self.factor for v in h]
+            # fases: phase[p][k] = h[k*L + p]
+            self._phases = [h[p::self.factor] for p in range(self.factor)]
+            self._rphases = [ph[::-1] for ph in self._phases]
+            self._hist = [0.0] * (taps_per_phase - 1)
+        else:
+            self._h = h
+            self._rh = h[::-1]
+            self._hist = [0.0] * (n - 1)
+            self._skip = 0  # offset tot volgende output-sample in de nieuwe input
+        if np is not None:
+            if self.up:
+                self._np_phases = [np.array(ph) for ph in self._phases]
+            else:
+                self._np_h = np.array(h)
+            self._np_hist = np.zeros(len(self._hist))
+
+    def process(self, pcm: bytes) -> bytes:
+        if not pcm:
+            return b""
+        if np is not None:
+            return self._process_np(pcm)
+        x = array("h")
+        x.frombytes(pcm)
+        if not _LE:
+            x.byteswap()
+        buf = self._hist + list(x)
+        out = array("h")
+        if self.up:
+            k = len(self._phases[0])
+            # fases omgedraaid zodat het venster niet per sample gespiegeld hoeft
+            rph = self._rphases
+            for i in range(len(x)):
+                win = buf[i:i + k]
+                for ph in rph:
+                    out.append(_clip16(sum(map(mul, ph, win))))
+            self._hist = buf[len(buf) - (k - 1):]
+        else:
+            rh, n = self._rh, len(self._rh)
+            i = self._skip
+            while i < len(x):
+                out.append(_clip16(sum(map(mul, rh, buf[i:i + n]))))
+                i += self.factor
+            self._skip = i - len(x)
+            self._hist = buf[len(buf) - (n - 1):]
+        if not _LE:
+            out.byteswap()
+        return out.tobytes()
+
+    def _process_np(self, pcm: bytes) -> bytes:
+        x = np.frombuffer(pcm, dtype="<i2").astype(np.float64)
+        buf = np.concatenate((self._np_hist, x))
+        if self.up:
+            k = len(self._np_phases[0])
+            cols = [np.convolve(buf, ph, mode="valid") for ph in self._np_phases]
+            y = np.stack(cols, axis=1).reshape(-1)
+            self._np_hist = buf[len(buf) - (k - 1):]
+        else:
+            n = len(self._np_h)
+            full = np.convolve(buf, self._np_h, mode="valid")
+            y = full[self._skip::self.factor]
+            last = self._skip + (len(y) - 1) * self.factor if len(y) else self._skip - self.factor
+            self._skip = last + self.factor - len(x)
+            self._np_hist = buf[len(buf) - (n - 1):]
+        return np.clip(np.rint(y), -32768, 32767).astype("<i2").tobytes()
+
+
+class PcmTranscoder:
+    """Per-call: Twilio μ-law 8kHz ↔ realtime PCM16 24kHz."""
+
+    TWILIO_RATE = 8000
+    REALTIME_RATE = 24000
+
+    def __init__(self):
+        self._up = Resampler(self.TWILIO_RATE, self.REALTIME_RATE)
+        self._down = Resampler(self.REALTIME_RATE, self.TWILIO_RATE)
+
+    def to_realtime(self, ulaw: bytes) -> bytes:
+        return self._up.process(ulaw_decode(ulaw))
+
+    def from_realtime(self, pcm24: bytes) -> bytes:
+        return ulaw_encode(self._down.process(pcm24))
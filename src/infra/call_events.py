@@ -0,0 +1,239 @@
+"""
+Call-events + call_sessions via een gebufferde writer (geen DB-I/O in de call-loop).
+
+- start()/event()/end() zijn niet-blokkerend: ze zetten alleen in geheugen
+- per call wordt bijgehouden wat de samenvatting nodig heeft (beurten, latencies)
+- een writer-thread schrijft elke FLUSH_S of per BATCH events: één INSERT … unnest
+  voor de events, multi-row upserts voor call_sessions, in één transactie
+- end() schrijft de samenvatting: duur, resultaat, beurten, gem./p95 latency, ordertotaal
+"""
+from __future__ import annotations
+import json, logging, os, threading, time
+from collections import deque
+from itertools import groupby
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+from src.infra.db import engine
+
+log = logging.getLogger("sara.callevents")
+
+QUEUE_MAX = int(os.getenv("SARA_CALL_EVENTS_MAX", "20000"))
+BATCH     = int(os.getenv("SARA_CALL_EVENTS_BATCH", "500"))
+FLUSH_S   = float(os.getenv("SARA_CALL_EVENTS_FLUSH_S", "1.0"))
+RETRIES   = int(os.getenv("SARA_CALL_EVENTS_RETRIES", "3"))   # sessie-upserts na een mislukte batch
+LATENCY_EVENT = "turn_latency"   # events die meetellen als beurt in de samenvatting
+
+_EVENTS_SQL = text("""
+    INSERT INTO call_events (call_id, ts, event, level, data_json, latency_ms, status_code)
+    SELECT * FROM unnest(
+        CAST(:cid AS TEXT[]), CAST(:ts AS TIMESTAMPTZ[]), CAST(:evt AS TEXT[]), CAST(:lvl AS TEXT[]),
+        CAST(:data AS JSONB[]), CAST(:lat AS INTEGER[]), CAST(:code AS INTEGER[])
+    )
+""")
+
+_START_SQL = text("""
+    INSERT INTO call_sessions (call_id, from_masked, to_number, started_at)
+    VALUES (:cid, :frm, :to, :at)
+    ON CONFLICT (call_id) DO NOTHING
+""")
+
+_END_SQL = text("""
+    INSERT INTO call_sessions
+        (call_id, started_at, ended_at, duration_sec, result, error_code, error_msg,
+         turns, latency_mean_ms, latency_p95_ms, order_total)
+    VALUES
+        (:cid, :started, :ended, :dur, :res, :ecode, :emsg, :turns, :lat_mean, :lat_p95, :total)
+    ON CONFLICT (call_id) DO UPDATE SET
+        ended_at = EXCLUDED.ended_at,
+        duration_sec = EXCLUDED.duration_sec,
+        result = EXCLUDED.result,
+        error_code = EXCLUDED.error_code,
+        error_msg = EXCLUDED.error_msg,
+        turns = EXCLUDED.turns,
+        latency_mean_ms = EXCLUDED.latency_mean_ms,
+        latency_p95_ms = EXCLUDED.latency_p95_ms,
+        order_total = EXCLUDED.order_total
+""")
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _jsonable(data: Any) -> Optional[str]:
+    if data is None:
+        return None
+    try:
+        return json.dumps(data, ensure_ascii=False, default=str)
+    except Exception:
+        return json.dumps({"_repr": str(data)})
+
+
+def _p95(values: List[int]) -> Optional[int]:
+    if not values:
+        return None
+    v = sorted(values)
+    return v[max(0, -(-95 * len(v) // 100) - 1)]  # nearest-rank
+
+
+class _CallAgg:
+    __slots__ = ("started", "events", "latencies")
+
+    def __init__(self, started: datetime):
+        self.started = started
+        self.events = 0
+        self.latencies: List[int] = []
+
+
+class CallEventWriter:
+    def __init__(self, capacity: int = QUEUE_MAX, batch: int = BATCH, flush_s: float = FLUSH_S):
+        self.capacity = max(1, capacity)
+        self.batch = max(1, batch)
+        self.flush_s = flush_s
+        self._events: deque = deque()
+        self._sessions: deque = deque()      # (sql, params, pogingen) in volgorde
+        self._calls: Dict[str, _CallAgg] = {}
+        self._cv = threading.Condition()
+        self._stop = False
+        self._thread: Optional[threading.Thread] = None
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.session_failed = 0
+        self.batches = 0
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="call-event-writer", daemon=True)
+            self._thread.start()
+
+    def _agg(self, call_id: str) -> _CallAgg:
+        a = self._calls.get(call_id)
+        if a is None:
+            a = self._calls[call_id] = _CallAgg(_now())
+        return a
+
+    # ── publieke API (niet-blokkerend)
+    def start(self, call_id: str, from_nr: Optional[str] = None, to_nr: Optional[str] = None) -> None:
+        from src.infra.logs import mask_number
+        with self._cv:
+            a = self._agg(call_id)
+            self._sessions.append((_START_SQL, {"cid": call_id, "frm": mask_number(from_nr), "to": to_nr, "at": a.started}, 0))
+        self.event(call_id, "call_start")
+
+    def event(self, call_id: str, event: str, level: str = "INFO", data: Any = None,
+              latency_ms: Optional[int] = None, status_code: Optional[int] = None) -> None:
+        self._ensure_thread()
+        row = (call_id, _now(), event, level, _jsonable(data), latency_ms, status_code)
+        with self._cv:
+            a = self._calls.get(call_id)  # alleen calls met start() worden samengevat
+            if a is not None:
+                a.events += 1
+                if event == LATENCY_EVENT and latency_ms is not None:
+                    a.latencies.append(int(latency_ms))
+            if len(self._events) >= self.capacity:
+                self._events.popleft()
+                self.dropped += 1
+            self._events.append(row)
+            if len(self._events) >= self.batch:
+                self._cv.notify()
+
+    def end(self, call_id: str, result: str = "ok", order_total: Optional[float] = None,
+            error_code: Optional[str] = None, error_msg: Optional[str] = None,
+            data: Optional[Dict[str, Any]] = None, duration_sec: Optional[int] = None) -> Dict[str, Any]:
+        """Samenvatting in call_sessions (upsert) + call_end-event; geeft de samenvatting terug."""
+        self.event(call_id, "call_end", "INFO" if result == "ok" else "ERROR", {"result": result, **(data or {})})
+        ended = _now()
+        with self._cv:
+            a = self._calls.pop(call_id, None) or _CallAgg(ended)
+            lat = a.latencies
+            summary = {
+                "cid": call_id,
+                "started": a.started,
+                "ended": ended,
+                "dur": duration_sec if duration_sec is not None else int((ended - a.started).total_seconds()),
+                "res": result,
+                "ecode": error_code,
+                "emsg": error_msg,
+                "turns": len(lat),
+                "lat_mean": int(sum(lat) / len(lat)) if lat else None,
+                "lat_p95": _p95(lat),
+                "total": order_total,
+            }
+            self._sessions.append((_END_SQL, summary, 0))
+            self._cv.notify()
+        return summary
+
+    # ── writer-thread
+    def _write(self, sessions: list, events: list) -> None:
+        try:
+            with engine.begin() as conn:
+                # volgorde start → end telt; opeenvolgende gelijke upserts als één executemany
+                for sql, group in groupby(sessions, key=lambda x: x[0]):
+                    conn.execute(sql, [params for _, params, _ in group])
+                if events:
+                    cols = list(zip(*events))
+                    conn.execute(_EVENTS_SQL, {
+                        "cid": list(cols[0]), "ts": list(cols[1]), "evt": list(cols[2]), "lvl": list(cols[3]),
+                        "data": list(cols[4]), "lat": list(cols[5]), "code": list(cols[6]),
+                    })
+            self.written += len(events)
+            self.batches += 1
+        except Exception as e:
+            self.failed += len(events)
+            # samenvattingen niet kwijtraken: opnieuw met de volgende batch(es), vóór
+            # nieuwere upserts (volgorde start → end blijft); na RETRIES pogingen opgeven
+            retry = [x for x in sessions if x[2] < RETRIES]
+            with self._cv:
+                self._sessions.extendleft((sql, params, n + 1) for sql, params, n in reversed(retry))
+            self.session_failed += len(sessions) - len(retry)
+            log.warning(f"call-events batch mislukt ({len(events)} events, "
+                        f"{len(retry)} sessie-upserts opnieuw): {e}")
+
+    def _run(self) -> None:
+        while True:
+            with self._cv:
+                deadline = time.monotonic() + self.flush_s
+                while not self._stop and len(self._events) < self.batch:
+                    left = deadline - time.monotonic()
+                    if left <= 0:
+                        break
+                    self._cv.wait(left)
+                n = min(self.batch, len(self._events))
+                events = [self._events.popleft() for _ in range(n)]
+                sessions = list(self._sessions)
+                self._sessions.clear()
+                stop = self._stop and not self._events
+            if events or sessions:
+                self._write(sessions, events)
+            if stop and not self._sessions:  # opnieuw in de rij na een fout: nog een ronde
+                return
+
+    def close(self, timeout: float = 5.0) -> None:
+        with self._cv:
+            self._stop = True
+            self._cv.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": len(self._events),
+            "open_calls": len(self._calls),
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "sessions_failed": self.session_failed,
+        }
+
+
+writer = CallEventWriter()
+
+start = writer.start
+event = writer.event
+end = writer.end
+stats = writer.stats
+close = writer.close
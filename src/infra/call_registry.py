@@ -0,0 +1,136 @@
+"""
+Register van lopende calls over alle workers heen (voor het live-dashboard).
+
+- elke worker houdt zijn eigen calls in-process bij (register/update/unregister,
+  synchroon en goedkoop: mag vanuit de websocket-loop)
+- `run_heartbeat()` schrijft die elke HEARTBEAT_S naar Redis: hash
+  `sara:calls` (call_id → JSON) + sorted set `sara:calls:seen` (laatste heartbeat)
+- wat langer dan EXPIRY_S geen heartbeat kreeg (worker gecrasht) verloopt vanzelf
+- zonder REDIS_URL: alleen de calls van deze worker (lokale stand-in)
+"""
+from __future__ import annotations
+import asyncio, json, logging, os, socket, time
+from typing import Any, Dict, List
+
+from src.infra.redis_client import get_client
+
+log = logging.getLogger("sara.calls")
+
+WORKER_ID   = os.getenv("SARA_WORKER_ID") or f"{socket.gethostname()}:{os.getpid()}"
+HEARTBEAT_S = float(os.getenv("SARA_CALLS_HEARTBEAT_S", "2"))
+EXPIRY_S    = float(os.getenv("SARA_CALLS_EXPIRY_S", "10"))
+STUCK_S     = float(os.getenv("SARA_CALLS_STUCK_S", "45"))  # zo lang geen activiteit = verdacht
+HASH_KEY    = "sara:calls"
+SEEN_KEY    = "sara:calls:seen"
+
+_local: Dict[str, Dict[str, Any]] = {}
+_tasks: set = set()  # lopende _forget-taken (sterke referentie)
+
+
+def register(call_id: str, **info: Any) -> None:
+    now = time.time()
+    _local[call_id] = {
+        "call_id": call_id,
+        "worker": WORKER_ID,
+        "started_at": now,
+        "last_activity": now,
+        "turns": 0,
+        "last_turn_ms": None,
+        "mode": None,
+        "items": [],
+        **info,
+    }
+
+
+def update(call_id: str, **fields: Any) -> None:
+    e = _local.get(call_id)
+    if e is not None:
+        e.update(fields)
+        e["last_activity"] = time.time()
+
+
+def unregister(call_id: str) -> None:
+    if _local.pop(call_id, None) is None:
+        return
+    r = get_client()
+    if r is not None:
+        t = asyncio.create_task(_forget(r, call_id))
+        _tasks.add(t)
+        t.add_done_callback(_tasks.discard)
+
+
+async def _forget(r, call_id: str) -> None:
+    try:
+        await r.hdel(HASH_KEY, call_id)
+        await r.zrem(SEEN_KEY, call_id)
+    except Exception as e:
+        log.warning(f"call registry forget err: {e}")
+
+
+def _decorate(e: Dict[str, Any], now: float) -> Dict[str, Any]:
+    out = dict(e)
+    out["duration_s"] = int(now - e["started_at"])
+    out["idle_s"] = int(now - e["last_activity"])
+    out["stuck"] = out["idle_s"] >= STUCK_S
+    return out
+
+
+async def heartbeat_once() -> None:
+    r = get_client()
+    if r is None:
+        return
+    now = time.time()
+    # verlopen (workers zonder heartbeat) opruimen
+    stale = await r.zrangebyscore(SEEN_KEY, "-inf", now - EXPIRY_S)
+    pipe = r.pipeline(transaction=False)
+    if stale:
+        pipe.hdel(HASH_KEY, *stale)
+        pipe.zremrangebyscore(SEEN_KEY, "-inf", now - EXPIRY_S)
+    # pas na de await de eigen calls pakken: wat intussen afliep niet opnieuw schrijven
+    sent = list(_local)
+    if sent:
+        pipe.hset(HASH_KEY, mapping={cid: json.dumps(_local[cid], ensure_ascii=False) for cid in sent})
+        pipe.zadd(SEEN_KEY, {cid: now for cid in sent})
+    await pipe.execute()
+    # afgelopen tijdens execute: _forget kan vóór onze hset zijn aangekomen
+    gone = [cid for cid in sent if cid not in _local]
+    if gone:
+        await r.hdel(HASH_KEY, *gone)
+        await r.zrem(SEEN_KEY, *gone)
+
+
+async def run_heartbeat() -> None:
+    while True:
+        try:
+            await heartbeat_once()
+        except Exception as e:
+            log.warning(f"call registry heartbeat err: {e}")
+        await asyncio.sleep(HEARTBEAT_S)
+
+
+async def snapshot() -> List[Dict[str, Any]]:
+    """Alle lopende calls (cluster als Redis er is), oudste eerst."""
+    now = time.time()
+    calls: Dict[str, Dict[str, Any]] = {}
+    r = get_client()
+    if r is not None:
+        try:
+            ids = await r.zrangebyscore(SEEN_KEY, now - EXPIRY_S, "+inf")
+            if ids:
+                for raw in await r.hmget(HASH_KEY, ids):
+                    if raw:
+                        e = json.loads(raw)
+                        calls[e["call_id"]] = e
+        except Exception as e:
+            log.warning(f"call registry read err: {e}")
+    calls.update(_local)  # eigen calls altijd actueel
+    return sorted((_decorate(e, now) for e in calls.values()), key=lambda e: e["started_at"])
+
+
+def per_worker(calls: List[Dict[str, Any]]) -> Dict[str, Dict[str, int]]:
+    out: Dict[str, Dict[str, int]] = {}
+    for c in calls:
+        w = out.setdefault(c["worker"], {"active": 0, "stuck": 0})
+        w["active"] += 1
+        w["stuck"] += int(c["stuck"])
+    return out
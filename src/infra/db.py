@@ -1,22 +1,145 @@
+import logging
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
+from src.infra import partitions
+
+log = logging.getLogger("sara.db")
 
 DATABASE_URL = os.getenv("DATABASE_URL", "")
 # Render/Neon/PG: SSL vaak verplicht; SQLAlchemy v2 pakt sslmode uit URL
 engine = create_engine(DATABASE_URL, pool_pre_ping=True, future=True)
 
-def init_db() -> None:
-    """Maakt tabellen aan als ze nog niet bestaan."""
-    with engine.begin() as conn:
-        # Generieke logs
-        conn.exec_driver_sql("""
-        CREATE TABLE IF NOT EXISTS logs (
-          id      BIGSERIAL PRIMARY KEY,
+# ── zoeken (monitoring)
+# tekstzoek-config: 'simple' = geen stemming/stopwoorden (logregels zijn mixed NL/EN,
+# ids, foutcodes). Expressie-index i.p.v. generated column: geen herschrijving van
+# bestaande partities. Queries moeten exact LOG_TSV gebruiken (anders geen index).
+TSV_CONFIG = "simple"
+LOG_TSV = f"to_tsvector('{TSV_CONFIG}', msg)"
+# één trigram-index over alle doorzoekbare call_sessions-velden; get_calls() moet
+# exact deze expressie gebruiken anders pakt de planner de index niet
+CALLS_SEARCH_EXPR = (
+    "(call_id || ' ' || coalesce(from_masked, '') || ' ' || coalesce(to_number, '')"
+    " || ' ' || coalesce(result, '') || ' ' || coalesce(error_msg, ''))"
+)
+
+
+def ensure_trgm(conn) -> bool:
+    """pg_trgm aanzetten; zonder rechten (managed PG) verder zonder trigram-indexes."""
+    try:
+        with conn.begin_nested():
+            conn.exec_driver_sql("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        return True
+    except Exception as e:
+        log.warning(f"pg_trgm niet beschikbaar, ILIKE-zoeken zonder index: {e}")
+        return False
+
+
+def ensure_log_search(conn, table: str = "logs", trgm: bool = True) -> None:
+    """GIN-indexes op `msg` (tsvector-expressie + trigram). Op een partitioned tabel
+    op de parent: Postgres bouwt ze per partitie (ook voor nieuwe partities).
+    Op een gevulde tabel is dat een volledige index-build: zie MIGRATIONS."""
+    idx = table.replace(".", "_")
+    conn.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS idx_{idx}_msg_tsv ON {table} USING gin (({LOG_TSV}))")
+    if trgm:
+        # deelwoorden/ids (ILIKE '%…%', ≥3 tekens)
+        conn.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS idx_{idx}_msg_trgm ON {table} USING gin (msg gin_trgm_ops)")
+
+
+def _create_index(conn, name: str, on: str, concurrently: bool) -> None:
+    """CONCURRENTLY (buiten een transactie, zie migrate): schrijven gaat door tijdens
+    de build. Een afgebroken build laat een INVALID index achter: die eerst weg."""
+    if concurrently:
+        if _invalid(conn, name):
+            conn.exec_driver_sql(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+        conn.exec_driver_sql(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {on}")
+    else:
+        conn.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS {name} ON {on}")
+
+
+def ensure_calls_search(conn, trgm: bool = True, concurrently: bool = False) -> None:
+    if trgm:
+        _create_index(conn, "idx_call_sessions_search",
+                      f"call_sessions USING gin ({CALLS_SEARCH_EXPR} gin_trgm_ops)", concurrently)
+
+
+def ensure_calls_keyset(conn, concurrently: bool = False) -> None:
+    """Keyset-paginering op (started_at, call_id) (zie get_calls); vervangt de index
+    op alleen started_at."""
+    _create_index(conn, "idx_call_sessions_started_call",
+                  "call_sessions (started_at DESC, call_id DESC)", concurrently)
+    conn.exec_driver_sql(
+        f"DROP INDEX {'CONCURRENTLY ' if concurrently else ''}IF EXISTS idx_call_sessions_started_at"
+    )
+
+
+def _has_trgm(conn) -> bool:
+    return conn.exec_driver_sql("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'").scalar() is not None
+
+
+def _index_valid(conn, name: str):
+    """True/False (INVALID na een afgebroken CONCURRENTLY-build), None = bestaat niet."""
+    return conn.execute(
+        text("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:i)"), {"i": name}
+    ).scalar()
+
+
+def _invalid(conn, name: str) -> bool:
+    return _index_valid(conn, name) is False
+
+
+def _missing(conn, *indexes: str) -> bool:
+    return any(not _index_valid(conn, i) for i in indexes)
+
+
+# range-partities op ts (zie src/infra/partitions.py): kolommen + indexes van de parent
+PARTITIONED = {
+    "logs": ("""
+          id      BIGSERIAL,
           ts      TIMESTAMPTZ NOT NULL DEFAULT now(),
           level   VARCHAR(10) NOT NULL,
-          msg     TEXT NOT NULL
-        );
-        """)
+          msg     TEXT NOT NULL,
+          PRIMARY KEY (id, ts)
+        """, [("idx_logs_ts", "ts DESC")]),
+    "call_events": ("""
+          id          BIGSERIAL,
+          call_id     TEXT NOT NULL,
+          ts          TIMESTAMPTZ NOT NULL DEFAULT now(),
+          event       TEXT NOT NULL,
+          level       TEXT NOT NULL DEFAULT 'INFO',
+          data_json   JSONB,
+          latency_ms  INTEGER,
+          status_code INTEGER,
+          PRIMARY KEY (id, ts)
+        """, [
+            # andere namen dan de oude (die blijven op call_events_legacy)
+            ("idx_call_events_p_call_ts", "call_id, ts"),
+            ("idx_call_events_p_event", "event"),
+            ("idx_call_events_p_level", "level"),
+        ]),
+}
+
+_DDL_LOCK = 20251001  # meerdere workers tegelijk bij startup: DDL/migratie één voor één
+# CONCURRENTLY-migraties: eigen lock. Met _DDL_LOCK zou een startende worker (in een
+# transactie, wachtend op de lock) op de build wachten en de build op die transactie
+_CONCURRENT_LOCK = 20251002
+
+
+def init_db() -> None:
+    """Maakt tabellen aan als ze nog niet bestaan. Draait bij elke start (import van
+    de app): alleen snelle DDL; wat een bestaande tabel herschrijft of volledig
+    leest staat in MIGRATIONS en draait via `python -m src.tools.migrate`."""
+    legacy = False
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"SELECT pg_advisory_xact_lock({_DDL_LOCK})")
+        trgm = ensure_trgm(conn)
+        # lege database: zoek-indexes meteen (kosten niets); anders via MIGRATIONS
+        fresh = partitions._relkind(conn, "call_sessions") is None
+
+        # Generieke logs (range-partities op ts, zie src/infra/partitions.py)
+        if not partitions.ensure(conn, "logs", *PARTITIONED["logs"]):
+            legacy = True
+        elif fresh:
+            ensure_log_search(conn, "logs", trgm)
 
         # Call-sessies
         conn.exec_driver_sql("""
@@ -33,33 +156,92 @@ def init_db() -> None:
           error_msg    TEXT
         );
         """)
+        # Opname (zie src/app/call_recorder.py): pad naar <call>.json
         conn.exec_driver_sql("""
-        CREATE INDEX IF NOT EXISTS idx_call_sessions_started_at
-          ON call_sessions (started_at DESC);
-        """)
-
-        # Call-events
-        conn.exec_driver_sql("""
-        CREATE TABLE IF NOT EXISTS call_events (
-          id          BIGSERIAL PRIMARY KEY,
-          call_id     TEXT NOT NULL,
-          ts          TIMESTAMPTZ NOT NULL DEFAULT now(),
-          event       TEXT NOT NULL,
-          level       TEXT NOT NULL DEFAULT 'INFO',
-          data_json   JSONB,
-          latency_ms  INTEGER,
-          status_code INTEGER
-        );
-        """)
-        conn.exec_driver_sql("""
-        CREATE INDEX IF NOT EXISTS idx_call_events_call_ts
-          ON call_events (call_id, ts);
+        ALTER TABLE call_sessions ADD COLUMN IF NOT EXISTS recording_path TEXT;
         """)
+        # Samenvatting bij call-einde (zie src/infra/call_events.py)
         conn.exec_driver_sql("""
-        CREATE INDEX IF NOT EXISTS idx_call_events_event
-          ON call_events (event);
-        """)
-        conn.exec_driver_sql("""
-        CREATE INDEX IF NOT EXISTS idx_call_events_level
-          ON call_events (level);
+        ALTER TABLE call_sessions
+          ADD COLUMN IF NOT EXISTS turns           INTEGER,
+          ADD COLUMN IF NOT EXISTS latency_mean_ms INTEGER,
+          ADD COLUMN IF NOT EXISTS latency_p95_ms  INTEGER,
+          ADD COLUMN IF NOT EXISTS order_total     NUMERIC(10,2);
         """)
+        if fresh:
+            ensure_calls_keyset(conn)
+            ensure_calls_search(conn, trgm)
+
+        # Call-events (range-partities op ts)
+        if not partitions.ensure(conn, "call_events", *PARTITIONED["call_events"]):
+            legacy = True
+    if legacy or not fresh:
+        todo = pending_migrations()
+        if todo:
+            # oude installatie: blijft werken (zoeken zonder index) tot de migratie
+            log.warning(f"openstaande DB-migraties {todo}: draai `python -m src.tools.migrate`")
+
+
+# ── migraties (eenmalig, expliciet: python -m src.tools.migrate)
+# (naam, nodig?(conn), uitvoeren(conn)); volgorde telt
+MIGRATIONS = [
+    (f"partition_{t}",
+     lambda conn, t=t: partitions._relkind(conn, t) == "r",
+     lambda conn, t=t: partitions.migrate_legacy(conn, t, *PARTITIONED[t]))
+    for t in PARTITIONED
+] + [
+    # GIN-builds over alle bestaande rijen (blokkeert schrijven op de tabel zolang)
+    ("search_logs",
+     lambda conn: _missing(conn, "idx_logs_msg_tsv") or (_has_trgm(conn) and _missing(conn, "idx_logs_msg_trgm")),
+     lambda conn: ensure_log_search(conn, "logs", ensure_trgm(conn))),
+    # call_sessions is niet gepartitioneerd: CONCURRENTLY, calls loggen gaat door
+    ("search_calls",
+     lambda conn: _has_trgm(conn) and _missing(conn, "idx_call_sessions_search"),
+     lambda conn: ensure_calls_search(conn, True, concurrently=True)),
+    ("keyset_calls",
+     lambda conn: _missing(conn, "idx_call_sessions_started_call")
+     or partitions._relkind(conn, "idx_call_sessions_started_at") is not None,
+     lambda conn: ensure_calls_keyset(conn, concurrently=True)),
+]
+# kunnen niet in een transactie (CREATE/DROP INDEX CONCURRENTLY)
+CONCURRENT = {"search_calls", "keyset_calls"}
+
+
+def pending_migrations() -> list:
+    with engine.connect() as conn:
+        return [name for name, needed, _ in MIGRATIONS if needed(conn)]
+
+
+def migrate() -> list:
+    """Voert openstaande migraties uit, elk in een eigen transactie; geeft de namen terug."""
+    done = []
+    for name, needed, run in MIGRATIONS:
+        if name in CONCURRENT:
+            if not _migrate_autocommit(name, needed, run):
+                continue
+        else:
+            with engine.begin() as conn:
+                conn.exec_driver_sql(f"SELECT pg_advisory_xact_lock({_DDL_LOCK})")
+                if not needed(conn):
+                    continue
+                log.warning(f"migratie {name} …")
+                run(conn)
+        done.append(name)
+    if done:
+        init_db()  # partities/indexes aanvullen
+    return done
+
+
+def _migrate_autocommit(name, needed, run) -> bool:
+    """CONCURRENTLY-stap: geen transactie, lock op sessie-niveau (één migrate tegelijk)."""
+    with engine.connect() as c:
+        conn = c.execution_options(isolation_level="AUTOCOMMIT")
+        conn.exec_driver_sql(f"SELECT pg_advisory_lock({_CONCURRENT_LOCK})")
+        try:
+            if not needed(conn):
+                return False
+            log.warning(f"migratie {name} …")
+            run(conn)
+            return True
+        finally:
+            conn.exec_driver_sql(f"SELECT pg_advisory_unlock({_CONCURRENT_LOCK})")
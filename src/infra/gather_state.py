@@ -0,0 +1,110 @@
+"""
+Sessie-state voor de Gather-flow (/twilio/intent → /twilio/confirm), per CallSid.
+
+Compact als JSON in Redis ({"m": modus, "i": [[naam, categorie, qty, prijs], …]})
+met TTL, zodat elke worker elke webhook kan afhandelen. Zonder REDIS_URL (of
+bij Redis-fouten) een in-process dict met dezelfde TTL (tests, dev).
+"""
+from __future__ import annotations
+import json, logging, os, time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from src.infra.redis_client import get_client
+from src.workflows.call_flow import Item
+
+log = logging.getLogger("sara.gather")
+
+TTL_S = int(os.getenv("SARA_GATHER_TTL_S", "900"))
+MEM_MAX = int(os.getenv("SARA_GATHER_MEM_MAX", "10000"))  # fallback-dict: max. sessies
+KEY_PREFIX = "sara:gather:"
+
+
+@dataclass
+class GatherSession:
+    mode: str = ""
+    items: List[Item] = field(default_factory=list)
+
+    def merge(self, new: List[Item]) -> None:
+        by = {(i.category, i.name, i.unit_price): i for i in self.items}
+        for it in new:
+            k = (it.category, it.name, it.unit_price)
+            if k in by:
+                by[k].qty += it.qty
+            else:
+                by[k] = Item(**it.__dict__)
+        self.items = list(by.values())
+
+    def dumps(self) -> str:
+        return json.dumps(
+            {"m": self.mode, "i": [[i.name, i.category, i.qty, i.unit_price] for i in self.items]},
+            ensure_ascii=False, separators=(",", ":"),
+        )
+
+    @classmethod
+    def loads(cls, raw: str | bytes) -> "GatherSession":
+        d = json.loads(raw)
+        return cls(mode=d.get("m") or "", items=[Item(n, c, q, p) for n, c, q, p in d.get("i") or []])
+
+
+_mem: Dict[str, Tuple[float, str]] = {}
+
+
+def _mem_get(sid: str) -> Optional[str]:
+    hit = _mem.get(sid)
+    if hit is None:
+        return None
+    if hit[0] <= time.time():
+        del _mem[sid]
+        return None
+    return hit[1]
+
+
+def _mem_set(sid: str, raw: str) -> None:
+    """Achteraan (opnieuw) invoegen: met een vaste TTL is de dict-volgorde de
+    verloopvolgorde, dus verlopen sessies (ook nooit meer gelezen) en wat boven
+    MEM_MAX uitkomt staan vooraan."""
+    now = time.time()
+    _mem.pop(sid, None)
+    _mem[sid] = (now + TTL_S, raw)
+    while len(_mem) > 1:
+        oldest = next(iter(_mem))
+        if _mem[oldest][0] > now and len(_mem) <= MEM_MAX:
+            break
+        del _mem[oldest]
+
+
+async def load(sid: str) -> GatherSession:
+    r = get_client()
+    raw = None
+    if r is not None:
+        try:
+            raw = await r.get(KEY_PREFIX + sid)
+        except Exception as e:
+            log.warning(f"gather state redis get err: {e}")
+            raw = _mem_get(sid)
+    else:
+        raw = _mem_get(sid)
+    return GatherSession.loads(raw) if raw else GatherSession()
+
+
+async def save(sid: str, sess: GatherSession) -> None:
+    raw = sess.dumps()
+    r = get_client()
+    if r is not None:
+        try:
+            await r.set(KEY_PREFIX + sid, raw, ex=TTL_S)
+            return
+        except Exception as e:
+            log.warning(f"gather state redis set err: {e}")
+    _mem_set(sid, raw)
+
+
+async def clear(sid: str) -> None:
+    _mem.pop(sid, None)
+    r = get_client()
+    if r is not None:
+        try:
+            await r.delete(KEY_PREFIX + sid)
+        except Exception as e:
+            log.warning(f"gather state redis del err: {e}")
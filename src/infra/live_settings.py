@@ -1,6 +1,6 @@
 from __future__ import annotations
-from typing import Any, Dict, Tuple, Optional
-import json
+from typing import Any, Dict, List, Tuple, Optional
+import asyncio, json, logging, os, select, threading, time
 from src.infra.db import engine
 from sqlalchemy import text
 
@@ -12,16 +12,43 @@ DEFAULTS: Dict[str, Any] = {
     "delay_schotels_min": 10,
 }
 
+log = logging.getLogger("sara.settings")
+
+# in-memory kopie: alle reads uit geheugen. Wijzigingen komen via Postgres
+# NOTIFY binnen (ms); de TTL is alleen een vangnet als de listener hapert.
+SNAPSHOT_TTL_S = float(os.getenv("SARA_SETTINGS_TTL_S", "30"))
+NOTIFY_CHANNEL = "live_settings"
+_snap: Dict[str, Any] = dict(DEFAULTS)
+_snap_at = 0.0          # monotonic; 0 = nog nooit geladen of ongeldig gemaakt
+_snap_task: Optional[asyncio.Task] = None
+_version = 0            # settings-versie van de kopie (live_settings_version_seq)
+_lock = threading.Lock()
+
 _NUM_KEYS = {"delay_pizzas_min", "delay_schotels_min"}
 _BOOL_KEYS = {"bot_enabled", "pastas_enabled", "pickup_enabled"}
 
 def ensure_table() -> None:
+    """DDL; één keer bij startup (app.py), niet per read."""
     ddl = """
     CREATE TABLE IF NOT EXISTS live_settings (
         key TEXT PRIMARY KEY,
         value JSONB NOT NULL,
         updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
     );
+    ALTER TABLE live_settings ADD COLUMN IF NOT EXISTS version BIGINT NOT NULL DEFAULT 0;
+    CREATE SEQUENCE IF NOT EXISTS live_settings_version_seq;
+
+    -- append-only: per opslag de wijziging + de volledige stand daarna (klein:
+    -- een handvol keys), zodat "stand op tijdstip T" één index-lookup is
+    CREATE TABLE IF NOT EXISTS live_settings_history (
+        version    BIGINT PRIMARY KEY,
+        changed_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        changed_by TEXT,
+        changes    JSONB NOT NULL,
+        settings   JSONB NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_live_settings_history_at
+        ON live_settings_history (changed_at DESC) INCLUDE (version, settings);
     """
     with engine.begin() as conn:
         conn.exec_driver_sql(ddl)
@@ -41,36 +68,193 @@ def _validate_payload(updates: Dict[str, Any]) -> Optional[str]:
 def _merge_defaults(db_values: Dict[str, Any]) -> Dict[str, Any]:
     merged = dict(DEFAULTS); merged.update(db_values); return merged
 
-def get_all() -> Dict[str, Any]:
-    ensure_table()
+def _load() -> Tuple[Dict[str, Any], int]:
     with engine.begin() as conn:
-        rows = conn.exec_driver_sql("SELECT key, value FROM live_settings").all()
-    return _merge_defaults({k: v for k, v in rows})
+        rows = conn.exec_driver_sql("SELECT key, value, version FROM live_settings").all()
+    return {k: v for k, v, _ in rows}, max((ver for _, _, ver in rows), default=0)
+
+def _stale() -> bool:
+    return not _snap_at or time.monotonic() - _snap_at > SNAPSHOT_TTL_S
+
+def get_all() -> Dict[str, Any]:
+    """Uit geheugen; alleen naar de DB als de kopie ongeldig of te oud is."""
+    if _stale():
+        _store_snapshot(*_load())
+    return dict(_snap)
 
 def get(key: str) -> Any:
     if key not in DEFAULTS: raise KeyError(f"unknown key: {key}")
-    ensure_table()
-    with engine.begin() as conn:
-        row = conn.exec_driver_sql(
-            "SELECT value FROM live_settings WHERE key=:k", {"k": key}
-        ).first()
-    return row[0] if row else DEFAULTS[key]
+    return get_all()[key]
+
+def version() -> int:
+    return _version
+
+_SAVE_LOCK_ID = 0x5A4A5E77  # pg_advisory_xact_lock: opslagen achter elkaar (consistente history)
+
+# clock_timestamp() i.p.v. now() (= begin van de transactie): pas ná de lock
+# gezet, dus changed_at loopt in dezelfde volgorde als version (settings_at)
+_UPSERT_SQL = text("""
+    INSERT INTO live_settings (key, value, updated_at, version)
+    SELECT e.key, e.value, clock_timestamp(), :ver FROM jsonb_each(CAST(:p AS JSONB)) AS e
+    ON CONFLICT (key)
+    DO UPDATE SET value = EXCLUDED.value, updated_at = EXCLUDED.updated_at, version = EXCLUDED.version
+""")
 
-def set_many(updates: Dict[str, Any]) -> Tuple[bool, str]:
+_HISTORY_SQL = text("""
+    INSERT INTO live_settings_history (version, changed_at, changed_by, changes, settings)
+    SELECT :ver, clock_timestamp(), :by, CAST(:p AS JSONB), jsonb_object_agg(key, value) FROM live_settings
+""")
+
+def set_many(updates: Dict[str, Any], changed_by: Optional[str] = None) -> Tuple[bool, str]:
     err = _validate_payload(updates)
     if err:
         return False, err
-    ensure_table()
-    upsert_sql = text("""
-        INSERT INTO live_settings(key, value, updated_at)
-        VALUES (:k, CAST(:v AS JSONB), now())
-        ON CONFLICT (key)
-        DO UPDATE SET value = CAST(:v AS JSONB), updated_at = now()
-    """)
+    if not updates:
+        return True, "saved"
+    payload = json.dumps(updates)
+    # één transactie: versie, één multi-row upsert, history-rij, notify
     with engine.begin() as conn:
-        for k, v in updates.items():
-            conn.execute(upsert_sql, {"k": k, "v": json.dumps(v)})
+        conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": _SAVE_LOCK_ID})
+        ver = conn.execute(text("SELECT nextval('live_settings_version_seq')")).scalar_one()
+        conn.execute(_UPSERT_SQL, {"p": payload, "ver": ver})
+        conn.execute(_HISTORY_SQL, {"p": payload, "ver": ver, "by": changed_by})
+        # afgeleverd bij commit: alle workers herladen (zie run_listener)
+        conn.execute(text("SELECT pg_notify(:ch, :p)"), {"ch": NOTIFY_CHANNEL, "p": str(ver)})
+    _store_snapshot({**_snap, **updates}, ver)  # deze worker direct
     return True, "saved"
 
-def set_one(key: str, value: Any) -> Tuple[bool, str]:
-    return set_many({key: value})
+def set_one(key: str, value: Any, changed_by: Optional[str] = None) -> Tuple[bool, str]:
+    return set_many({key: value}, changed_by)
+
+# ---------- history ----------
+
+def settings_at(at: Any) -> Dict[str, Any]:
+    """Instellingen die op tijdstip `at` golden (index-lookup op changed_at).
+    Voor veel calls tegelijk dezelfde lookup per rij via LATERAL, bv.:
+      SELECT c.call_id, h.version, h.settings FROM call_sessions c
+      LEFT JOIN LATERAL (SELECT version, settings FROM live_settings_history
+                         WHERE changed_at <= c.started_at ORDER BY changed_at DESC LIMIT 1) h ON true
+    """
+    with engine.connect() as conn:
+        row = conn.execute(text("""
+            SELECT version, changed_at, settings FROM live_settings_history
+             WHERE changed_at <= :at ORDER BY changed_at DESC LIMIT 1
+        """), {"at": at}).mappings().first()
+    if row is None:
+        return {"version": 0, "changed_at": None, "settings": dict(DEFAULTS)}
+    return {"version": row["version"], "changed_at": row["changed_at"], "settings": _merge_defaults(row["settings"])}
+
+def history(start: Any = None, end: Any = None, limit: int = 200) -> List[Dict[str, Any]]:
+    """Versies (nieuwste eerst) met geldigheid [valid_from, valid_to) die [start, end] raken."""
+    sql = """
+        SELECT * FROM (
+            SELECT version, changed_at AS valid_from,
+                   lead(changed_at) OVER (ORDER BY changed_at) AS valid_to,
+                   changed_by, changes, settings
+              FROM live_settings_history
+        ) h WHERE true
+    """
+    params: Dict[str, Any] = {}
+    if start:
+        sql += " AND (valid_to IS NULL OR valid_to > :start)"; params["start"] = start
+    if end:
+        sql += " AND valid_from <= :end"; params["end"] = end
+    sql += f" ORDER BY valid_from DESC LIMIT {int(limit)}"
+    with engine.connect() as conn:
+        rows = conn.execute(text(sql), params).mappings().all()
+    return [dict(r) for r in rows]
+
+# ---------- async snapshot ----------
+
+def _store_snapshot(values: Dict[str, Any], ver: Optional[int] = None) -> None:
+    """Kopie + versie samen vervangen. Een load die ouder is dan wat er staat (een
+    trage refresh van vóór een opslag) wordt genegeerd; ver=None = altijd (tests/replay)."""
+    global _snap, _snap_at, _version
+    with _lock:
+        if ver is not None:
+            if ver < _version:
+                return
+            _version = ver
+        _snap = _merge_defaults(values)
+        _snap_at = time.monotonic()
+
+def invalidate() -> None:
+    """Kopie ongeldig: volgende read herlaadt (sync) of refresh op de achtergrond."""
+    global _snap_at
+    _snap_at = 0.0
+
+async def refresh_snapshot() -> Dict[str, Any]:
+    """Herlaad uit de DB in een thread; bij een fout blijft de oude kopie staan."""
+    try:
+        _store_snapshot(*await asyncio.to_thread(_load))
+    except Exception as e:
+        log.error(f"settings refresh err: {e}")
+    return _snap
+
+def _schedule_refresh(force: bool = False) -> None:
+    global _snap_task
+    # force (NOTIFY): een lopende refresh kan van vóór de commit zijn → altijd opnieuw
+    if not force and _snap_task is not None and not _snap_task.done():
+        return
+    try:
+        _snap_task = asyncio.get_running_loop().create_task(refresh_snapshot())
+    except RuntimeError:
+        pass  # geen event-loop (sync context): gewoon de oude kopie
+
+def snapshot() -> Dict[str, Any]:
+    """Instellingen uit geheugen, nul I/O. Te oud → refresh op de achtergrond."""
+    if _stale():
+        _schedule_refresh()
+    return _snap
+
+async def aget_all() -> Dict[str, Any]:
+    """Async variant van get_all(): alleen de allereerste keer wachten op de DB."""
+    if not _snap_at:
+        return await refresh_snapshot()
+    return snapshot()
+
+async def run_refresher() -> None:
+    """Achtergrondtaak per worker: vangnet naast de listener (zie app startup)."""
+    while True:
+        await refresh_snapshot()
+        await asyncio.sleep(SNAPSHOT_TTL_S)
+
+# ---------- LISTEN/NOTIFY ----------
+
+def _on_notify(payload: str) -> None:
+    if payload.isdigit() and int(payload) <= _version:
+        return  # eigen opslag of al geladen
+    log.info(f"settings gewijzigd (versie {payload}); herladen")
+    invalidate()
+    _schedule_refresh(force=True)
+
+def _listen_forever(loop: asyncio.AbstractEventLoop) -> None:
+    """Blokkerend (eigen thread): LISTEN op een vaste verbinding, bij fouten opnieuw."""
+    while True:
+        raw = None
+        try:
+            raw = engine.raw_connection()
+            conn = raw.driver_connection  # psycopg2
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {NOTIFY_CHANNEL}")
+            # gemiste wijzigingen tijdens (her)verbinden
+            loop.call_soon_threadsafe(_on_notify, "listener-start")
+            while True:
+                if select.select([conn], [], [], 60)[0]:
+                    conn.poll()
+                    while conn.notifies:
+                        n = conn.notifies.pop(0)
+                        loop.call_soon_threadsafe(_on_notify, n.payload)
+        except Exception as e:
+            log.error(f"settings listener err: {e}")
+        finally:
+            if raw is not None:
+                try: raw.invalidate()
+                except Exception: pass
+        time.sleep(2)
+
+async def run_listener() -> None:
+    """Start de NOTIFY-listener-thread voor deze worker (zie app startup)."""
+    loop = asyncio.get_running_loop()
+    threading.Thread(target=_listen_forever, args=(loop,), name="settings-listener", daemon=True).start()
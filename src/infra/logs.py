@@ -1,24 +1,146 @@
+import base64
 import json
 import logging
-from typing import Any, Dict, List, Optional
+import os
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 from sqlalchemy import text
-from .db import engine, init_db
+from .db import CALLS_SEARCH_EXPR, LOG_TSV, TSV_CONFIG, engine, init_db
 
 # ---------- DB logging handler ----------
 
+LOG_QUEUE_MAX = int(os.getenv("SARA_LOG_QUEUE_MAX", "10000"))
+LOG_BATCH     = int(os.getenv("SARA_LOG_BATCH", "200"))
+LOG_FLUSH_S   = float(os.getenv("SARA_LOG_FLUSH_S", "1.0"))
+# vol: "oldest" = oudste weg, "level" = nieuwe records onder KEEP_LEVEL weg (WARNING+ verdringt oudste)
+LOG_DROP      = os.getenv("SARA_LOG_DROP", "level")
+LOG_KEEP_LEVEL = logging.WARNING
+
+_BATCH_SQL = text("""
+    INSERT INTO logs (ts, level, msg)
+    SELECT * FROM unnest(CAST(:ts AS TIMESTAMPTZ[]), CAST(:lvl AS VARCHAR(10)[]), CAST(:msg AS TEXT[]))
+""")
+
+
 class DBHandler(logging.Handler):
+    """Logregels naar de `logs`-tabel zonder DB-I/O in de aanroeper: emit() zet alleen
+    in een begrensde queue; een writer-thread schrijft batches (één INSERT … unnest)
+    per LOG_BATCH regels of elke LOG_FLUSH_S."""
+
+    def __init__(self, capacity: int = LOG_QUEUE_MAX, batch: int = LOG_BATCH,
+                 flush_s: float = LOG_FLUSH_S, drop: str = LOG_DROP):
+        super().__init__()
+        self.capacity = max(1, capacity)
+        self.batch = max(1, batch)
+        self.flush_s = flush_s
+        self.drop = drop
+        self._q: deque = deque()
+        self._cv = threading.Condition()
+        self._stop = False
+        self.dropped = 0
+        self.flushed = 0
+        self.failed = 0
+        self.batches = 0
+        self._writer = threading.Thread(target=self._run, name="db-log-writer", daemon=True)
+        self._writer.start()
+
     def emit(self, record: logging.LogRecord) -> None:
-        msg = self.format(record)
-        lvl = record.levelname
+        if threading.current_thread() is self._writer:
+            return  # nooit loggen over het eigen schrijven (lus)
         try:
-            with engine.begin() as conn:
-                conn.execute(
-                    text("INSERT INTO logs (level, msg) VALUES (:lvl, :msg)"),
-                    {"lvl": lvl, "msg": msg},
-                )
+            row = (datetime.fromtimestamp(record.created, timezone.utc), record.levelname[:10], self.format(record))
         except Exception:
-            # Val stil als DB hikt
-            pass
+            self.handleError(record)
+            return
+        with self._cv:
+            if len(self._q) >= self.capacity:
+                if self.drop == "level" and record.levelno < LOG_KEEP_LEVEL:
+                    self.dropped += 1
+                    return
+                self._q.popleft()
+                self.dropped += 1
+            self._q.append(row)
+            if len(self._q) >= self.batch:
+                self._cv.notify()
+
+    def _take(self) -> list:
+        n = min(self.batch, len(self._q))
+        return [self._q.popleft() for _ in range(n)]
+
+    def _write(self, rows: list) -> None:
+        try:
+            with engine.begin() as conn:
+                conn.execute(_BATCH_SQL, {
+                    "ts": [r[0] for r in rows],
+                    "lvl": [r[1] for r in rows],
+                    "msg": [r[2] for r in rows],
+                })
+            self.flushed += len(rows)
+            self.batches += 1
+        except Exception as e:
+            # Val stil als DB hikt (niet via logging: dat komt hier weer uit)
+            self.failed += len(rows)
+            print(f"db-log batch mislukt ({len(rows)} regels): {e}", file=sys.stderr)
+
+    def _run(self) -> None:
+        while True:
+            with self._cv:
+                deadline = time.monotonic() + self.flush_s
+                while not self._stop and len(self._q) < self.batch:
+                    left = deadline - time.monotonic()
+                    if left <= 0:
+                        break
+                    self._cv.wait(left)
+                rows = self._take()
+                stop = self._stop and not self._q
+            if rows:
+                self._write(rows)
+            if stop:
+                return
+
+    def flush(self, timeout: float = 5.0) -> None:
+        """Wacht (begrensd) tot de queue leeg is."""
+        end = time.monotonic() + timeout
+        with self._cv:
+            self._cv.notify()
+        while self._q and time.monotonic() < end:
+            time.sleep(0.01)
+
+    def close(self) -> None:
+        with self._cv:
+            self._stop = True
+            self._cv.notify()
+        self._writer.join(timeout=5.0)
+        super().close()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": len(self._q),
+            "flushed": self.flushed,
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+
+def _db_handler() -> Optional[DBHandler]:
+    return next((h for h in logging.getLogger().handlers if isinstance(h, DBHandler)), None)
+
+
+def db_log_stats() -> Dict[str, int]:
+    h = _db_handler()
+    return h.stats() if h else {}
+
+
+def shutdown_logging() -> None:
+    """Bij afsluiten: queue leegschrijven (logging.shutdown doet dit ook bij exit)."""
+    h = _db_handler()
+    if h is not None:
+        h.close()
 
 
 def setup_logging() -> None:
@@ -34,86 +156,216 @@ def setup_logging() -> None:
 
 # ---------- Queries voor dashboard ----------
 
-def get_events(
-    limit: int = 300,
+# Zoeken: woorden via de tsvector-index (websearch-syntax: "zin", -woord, or),
+# deelwoorden/ids via de trigram-index (ILIKE, ≥3 tekens). Beide condities
+# zijn geïndexeerd → BitmapOr i.p.v. seq scan over alle partities.
+HL_START, HL_STOP = "\x02", "\x03"   # markers van ts_headline; pagina escapet en zet <mark>
+_HL_OPTS = f'StartSel="{HL_START}", StopSel="{HL_STOP}", HighlightAll=true'
+_TSQ = f"websearch_to_tsquery('{TSV_CONFIG}', :q)"
+TRGM_MIN = 3
+
+
+def like_pattern(q: str) -> str:
+    """'%q%' met LIKE-tekens in q letterlijk."""
+    return "%" + q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def _search_cond(q: str, params: Dict[str, Any]) -> str:
+    params["q"] = q
+    params["qlike"] = like_pattern(q)
+    if len(q.strip()) < TRGM_MIN:
+        return "msg ILIKE :qlike"  # te kort voor trigrammen/woorden: gewoon substring
+    return f"({LOG_TSV} @@ {_TSQ} OR msg ILIKE :qlike)"
+
+
+def encode_cursor(*vals: Any) -> str:
+    """Keyset-cursor (laatste rij van de pagina) als opaque, URL-veilige string."""
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in vals])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+_BIGINT = 1 << 63
+
+
+def decode_cursor(cursor: Optional[str], kinds: Tuple[type, ...] = (datetime, int)) -> Optional[List[Any]]:
+    """None bij ontbrekende/ongeldige cursor (= eerste pagina). De cursor komt van de
+    client: elke waarde moet van het type in `kinds` zijn (datetime als ISO-string),
+    anders zou de query pas in Postgres falen."""
+    if not cursor:
+        return None
+    try:
+        vals = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except Exception:
+        return None
+    if not isinstance(vals, list) or len(vals) != len(kinds):
+        return None
+    out: List[Any] = []
+    for v, kind in zip(vals, kinds):
+        if kind is datetime:
+            try:
+                v = datetime.fromisoformat(v)
+            except (TypeError, ValueError):
+                return None
+        elif not isinstance(v, kind) or isinstance(v, bool):
+            return None
+        elif kind is int and not -_BIGINT <= v < _BIGINT:
+            return None
+        out.append(v)
+    return out
+
+
+def _page(sql: str, order: str, limit: Optional[int], offset: int) -> str:
+    sql += f" ORDER BY {order}"
+    if limit is not None:
+        sql += f" LIMIT {int(limit)}"
+    if offset > 0:
+        sql += f" OFFSET {int(offset)}"
+    return sql
+
+
+def events_query(
+    limit: Optional[int] = 300,
     level: Optional[str] = None,
     q: Optional[str] = None,
     start: Optional[str] = None,
     end: Optional[str] = None,
     offset: int = 0,
-) -> List[Dict[str, Any]]:
-    sql = "SELECT ts, level, msg FROM logs"
+    sort: str = "time",
+    table: str = "logs",
+    after: Optional[str] = None,
+    headline: bool = True,
+) -> Tuple[str, Dict[str, Any]]:
+    """SQL + params voor get_events (ook gebruikt door export en src.tools.bench_search).
+    `after` = cursor van de vorige pagina: keyset op (ts, id), zelfde volgorde als
+    de ts-index; werkt niet voor sort="rank" (daar blijft offset). limit=None: alles."""
+    cols = "id, ts, level, msg"
     conds: List[str] = []
     params: Dict[str, Any] = {}
     if level in ("INFO", "WARN", "ERROR"):
         conds.append("level = :lvl")
         params["lvl"] = level
-    if q:
-        conds.append("msg ILIKE :q")
-        params["q"] = f"%{q}%"
+    search = bool(q and q.strip())
+    if search:
+        conds.append(_search_cond(q, params))
+        cols += f", ts_rank({LOG_TSV}, {_TSQ}) AS rank"
+    # kale vergelijkingen op ts (geen functie eromheen): Postgres slaat partities
+    # buiten [start, end] over; ORDER BY ts leest per partitie de ts-index
     if start:
         conds.append("ts >= :start")
         params["start"] = start
     if end:
         conds.append("ts <= :end")
         params["end"] = end
+    by_rank = search and sort == "rank"
+    key = None if by_rank else decode_cursor(after)
+    if key:
+        conds.append("(ts, id) < (CAST(:k_ts AS TIMESTAMPTZ), :k_id)")
+        params["k_ts"], params["k_id"] = key
+    order = "rank DESC, ts DESC, id DESC" if by_rank else "ts DESC, id DESC"
+    sql = f"SELECT {cols} FROM {table}"
     if conds:
         sql += " WHERE " + " AND ".join(conds)
-    sql += " ORDER BY id DESC"
-    sql += f" LIMIT {int(limit)} OFFSET {int(max(0, offset))}"
+    sql = _page(sql, order, limit, offset)
+    if search and headline:
+        # ts_headline is duur: alleen over de rijen die op de pagina komen
+        params["hl"] = _HL_OPTS
+        sql = (
+            f"SELECT e.*, ts_headline('{TSV_CONFIG}', e.msg, {_TSQ}, :hl) AS msg_hl "
+            f"FROM ({sql}) e ORDER BY {order}"
+        )
+    return sql, params
+
+
+def get_events(
+    limit: int = 300,
+    level: Optional[str] = None,
+    q: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    offset: int = 0,
+    sort: str = "time",
+    after: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Logregels, nieuwste eerst (of sort="rank": beste match eerst). Met q ook
+    `rank` en `msg_hl` (msg met HL_START/HL_STOP rond de treffers).
+    Volgende pagina: after=events_cursor(rows[-1])."""
+    sql, params = events_query(limit, level, q, start, end, offset, sort, after=after)
     with engine.connect() as conn:
         rows = conn.execute(text(sql), params).mappings().all()
     return [dict(r) for r in rows]
 
 
-def get_calls(
-    limit: int = 50,
+def events_cursor(row: Dict[str, Any]) -> str:
+    return encode_cursor(row["ts"], row["id"])
+
+
+CALL_COLUMNS = [
+    "call_id", "from_masked", "to_number", "started_at", "ended_at", "duration_sec",
+    "result", "error_code", "error_msg", "turns", "latency_mean_ms", "latency_p95_ms", "order_total",
+]
+
+
+def calls_query(
+    limit: Optional[int] = 50,
     q: Optional[str] = None,
     start: Optional[str] = None,
     end: Optional[str] = None,
     offset: int = 0,
-) -> List[Dict[str, Any]]:
-    sql = """
-    SELECT call_id, from_masked, to_number, started_at, ended_at,
-           duration_sec, result, error_code, error_msg
-      FROM call_sessions
-    """
+    after: Optional[str] = None,
+) -> Tuple[str, Dict[str, Any]]:
+    """SQL + params voor get_calls/export; keyset op (started_at, call_id)."""
     conds: List[str] = []
     params: Dict[str, Any] = {}
     if q:
-        conds.append("""(
-            call_id ILIKE :q OR
-            from_masked ILIKE :q OR
-            to_number ILIKE :q OR
-            COALESCE(result,'') ILIKE :q OR
-            COALESCE(error_msg,'') ILIKE :q
-        )""")
-        params["q"] = f"%{q}%"
+        # één ILIKE op de geïndexeerde expressie (idx_call_sessions_search)
+        conds.append(f"{CALLS_SEARCH_EXPR} ILIKE :q")
+        params["q"] = like_pattern(q)
     if start:
         conds.append("started_at >= :start")
         params["start"] = start
     if end:
         conds.append("started_at <= :end")
         params["end"] = end
+    key = decode_cursor(after, (datetime, str))
+    if key:
+        conds.append("(started_at, call_id) < (CAST(:k_at AS TIMESTAMPTZ), :k_cid)")
+        params["k_at"], params["k_cid"] = key
+    sql = f"SELECT {', '.join(CALL_COLUMNS)} FROM call_sessions"
     if conds:
         sql += " WHERE " + " AND ".join(conds)
-    sql += " ORDER BY started_at DESC"
-    sql += f" LIMIT {int(limit)} OFFSET {int(max(0, offset))}"
+    return _page(sql, "started_at DESC, call_id DESC", limit, offset), params
+
+
+def get_calls(
+    limit: int = 50,
+    q: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    offset: int = 0,
+    after: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Call-sessies, nieuwste eerst. Volgende pagina: after=calls_cursor(rows[-1])."""
+    sql, params = calls_query(limit, q, start, end, offset, after)
     with engine.connect() as conn:
         rows = conn.execute(text(sql), params).mappings().all()
     return [dict(r) for r in rows]
 
-# ---------- Call-logging helpers ----------
 
-def _jsonable(data: Any) -> Optional[str]:
-    if data is None:
-        return None
-    try:
-        return json.dumps(data)
-    except Exception:
-        return json.dumps({"_repr": str(data)})
+def calls_cursor(row: Dict[str, Any]) -> str:
+    return encode_cursor(row["started_at"], row["call_id"])
 
 
+def stream_rows(sql: str, params: Dict[str, Any], batch: int = 1000) -> Iterator[List[Dict[str, Any]]]:
+    """Server-side cursor (stream_results): rijen per `batch` uit Postgres, het
+    geheugen blijft vlak ongeacht de grootte van de resultset. Blokkerend:
+    in een thread gebruiken (StreamingResponse doet dat voor sync generators)."""
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, max_row_buffer=batch).execute(text(sql), params)
+        for part in result.mappings().partitions(batch):
+            yield [dict(r) for r in part]
+
+# ---------- Call-logging helpers ----------
+
 def mask_number(nr: Optional[str]) -> Optional[str]:
     if not nr:
         return None
@@ -121,23 +373,11 @@ def mask_number(nr: Optional[str]) -> Optional[str]:
     return s[:-6] + "******" + s[-2:] if len(s) > 8 else "****"
 
 
+# Gebufferd via src/infra/call_events.py: geen eigen transactie per aanroep meer.
+
 def log_call_start(call_id: str, from_nr: Optional[str], to_nr: Optional[str]) -> None:
-    with engine.begin() as conn:
-        conn.execute(
-            text("""
-            INSERT INTO call_sessions (call_id, from_masked, to_number)
-            VALUES (:cid, :frm, :to)
-            ON CONFLICT (call_id) DO NOTHING
-            """),
-            {"cid": call_id, "frm": mask_number(from_nr), "to": to_nr},
-        )
-        conn.execute(
-            text("""
-            INSERT INTO call_events (call_id, event, level)
-            VALUES (:cid, 'call_start', 'INFO')
-            """),
-            {"cid": call_id},
-        )
+    from src.infra import call_events
+    call_events.start(call_id, from_nr, to_nr)
 
 
 def log_call_event(
@@ -148,23 +388,8 @@ def log_call_event(
     latency_ms: Optional[int] = None,
     status_code: Optional[int] = None,
 ) -> None:
-    with engine.begin() as conn:
-        conn.execute(
-            text("""
-            INSERT INTO call_events
-                (call_id, event, level, data_json, latency_ms, status_code)
-            VALUES
-                (:cid, :evt, :lvl, CAST(:data AS JSONB), :lat, :code)
-            """),
-            {
-                "cid": call_id,
-                "evt": event,
-                "lvl": level,
-                "data": _jsonable(data),
-                "lat": latency_ms,
-                "code": status_code,
-            },
-        )
+    from src.infra import call_events
+    call_events.event(call_id, event, level, data, latency_ms, status_code)
 
 
 def log_call_end(
@@ -174,34 +399,18 @@ def log_call_end(
     error_code: Optional[str] = None,
     error_msg: Optional[str] = None,
 ) -> None:
+    from src.infra import call_events
+    call_events.end(call_id, result, error_code=error_code, error_msg=error_msg, duration_sec=duration_sec)
+
+
+def log_call_recording(call_id: str, path: str) -> None:
+    """Koppel een opname aan de call; maakt de sessierij aan als die nog ontbreekt."""
     with engine.begin() as conn:
         conn.execute(
             text("""
-            UPDATE call_sessions
-               SET ended_at = now(),
-                   duration_sec = COALESCE(:dur, duration_sec),
-                   result = :res,
-                   error_code = :ecode,
-                   error_msg = :emsg
-             WHERE call_id = :cid
-            """),
-            {
-                "cid": call_id,
-                "dur": duration_sec,
-                "res": result,
-                "ecode": error_code,
-                "emsg": error_msg,
-            },
-        )
-        conn.execute(
-            text("""
-            INSERT INTO call_events (call_id, event, level, data_json)
-            VALUES (
-                :cid,
-                'call_end',
-                CASE WHEN :res = 'ok' THEN 'INFO' ELSE 'ERROR' END,
-                jsonb_build_object('result', :res)
-            )
+            INSERT INTO call_sessions (call_id, recording_path)
+            VALUES (:cid, :path)
+            ON CONFLICT (call_id) DO UPDATE SET recording_path = EXCLUDED.recording_path
             """),
-            {"cid": call_id, "res": result},
+            {"cid": call_id, "path": path},
         )
@@ -0,0 +1,115 @@
+"""
+In-process latency-histogrammen (HDR-stijl) + registry.
+
+Waarden worden in microseconden opgeslagen in log-lineaire buckets:
+exact tot 128, daarboven 64 sub-buckets per macht van 2 (≤ ~0.8% fout).
+Geheugen blijft begrensd (max. enkele honderden buckets per histogram).
+"""
+from __future__ import annotations
+import threading
+from typing import Dict, List, Optional
+
+_SUB_BITS = 7
+_SUB = 1 << _SUB_BITS      # 128
+_HALF = _SUB >> 1          # 64
+
+
+def _index(v: int) -> int:
+    if v < _SUB:
+        return v
+    e = v.bit_length() - _SUB_BITS
+    return _SUB + (e - 1) * _HALF + ((v >> e) - _HALF)
+
+
+def _value(i: int) -> int:
+    """Midden van bucket i (in dezelfde eenheid als record)."""
+    if i < _SUB:
+        return i
+    e = (i - _SUB) // _HALF + 1
+    m = (i - _SUB) % _HALF + _HALF
+    return (m << e) + ((1 << e) >> 1)
+
+
+class Histogram:
+    def __init__(self, name: str):
+        self.name = name
+        self._counts: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total_us = 0
+        self.max_us = 0
+
+    def record_ms(self, ms: float) -> None:
+        us = max(0, int(ms * 1000))
+        with self._lock:
+            i = _index(us)
+            self._counts[i] = self._counts.get(i, 0) + 1
+            self.count += 1
+            self.total_us += us
+            if us > self.max_us:
+                self.max_us = us
+
+    # eenheid-vrij (bv. tokens); opslag/percentielen werken identiek
+    record = record_ms
+
+    def percentile(self, p: float) -> Optional[float]:
+        with self._lock:
+            if not self.count:
+                return None
+            rank = max(1, int(round(p / 100 * self.count)))
+            seen = 0
+            for i in sorted(self._counts):
+                seen += self._counts[i]
+                if seen >= rank:
+                    return min(_value(i), self.max_us) / 1000
+        return self.max_us / 1000
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        return {
+            "count": self.count,
+            "mean": round(self.total_us / self.count / 1000, 2) if self.count else None,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": self.max_us / 1000 if self.count else None,
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts.clear()
+            self.count = self.total_us = self.max_us = 0
+
+
+_registry: Dict[str, Histogram] = {}
+_reg_lock = threading.Lock()
+
+
+def histogram(name: str) -> Histogram:
+    h = _registry.get(name)
+    if h is None:
+        with _reg_lock:
+            h = _registry.setdefault(name, Histogram(name))
+    return h
+
+
+def snapshot(prefix: str = "") -> Dict[str, Dict[str, Optional[float]]]:
+    """{naam: {count, mean, p50, p95, p99, max}} in milliseconden."""
+    return {n: h.summary() for n, h in sorted(_registry.items()) if n.startswith(prefix)}
+
+
+def names() -> List[str]:
+    return sorted(_registry)
+
+
+# ---------- simpele tellers ----------
+
+_counters: Dict[str, int] = {}
+
+
+def incr(name: str, n: int = 1) -> None:
+    with _reg_lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def counters(prefix: str = "") -> Dict[str, int]:
+    return {k: v for k, v in sorted(_counters.items()) if k.startswith(prefix)}
@@ -0,0 +1,178 @@
+"""
+Range-partities (per dag of week op `ts`) voor `logs` en `call_events` + retentie.
+
+- `ensure(conn, table, ...)`: maakt de partitioned parent aan (nieuwe installatie);
+  een bestaande gewone tabel blijft ongemoeid (zie `migrate_legacy`)
+- `migrate_legacy(conn, table, ...)`: eenmalige migratie van een oude installatie
+  (python -m src.tools.migrate): de gewone tabel wordt <table>_legacy en als
+  partitie tot het eerste nieuwe interval gekoppeld (geen data kopiëren)
+- `maintain()`: maakt PARTITION_AHEAD_DAYS vooruit partities aan en ruimt
+  partities op die helemaal ouder zijn dan de retentie (DROP, of met
+  SARA_PARTITION_ARCHIVE=1: DETACH + verplaatsen naar schema `archive`)
+- een DEFAULT-partitie vangt rijen buiten de aangemaakte ranges op
+
+Queries moeten direct op `ts` filteren (geen functie om de kolom) zodat Postgres
+partities kan overslaan (partition pruning).
+"""
+from __future__ import annotations
+import asyncio, logging, os
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+
+log = logging.getLogger("sara.partitions")
+
+INTERVAL            = os.getenv("SARA_PARTITION_INTERVAL", "day").lower()   # day | week
+PARTITION_AHEAD_DAYS = int(os.getenv("SARA_PARTITION_AHEAD_DAYS", "7"))
+ARCHIVE             = os.getenv("SARA_PARTITION_ARCHIVE", "0") == "1"
+MAINTAIN_EVERY_S    = float(os.getenv("SARA_PARTITION_MAINTAIN_S", "3600"))
+# retentie per tabel in dagen (0 = nooit opruimen)
+RETENTION_DAYS: Dict[str, int] = {
+    "logs": int(os.getenv("SARA_LOG_RETENTION_DAYS", "30")),
+    "call_events": int(os.getenv("SARA_EVENT_RETENTION_DAYS", "180")),
+}
+TABLES = tuple(RETENTION_DAYS)
+
+
+def _step() -> timedelta:
+    return timedelta(days=7 if INTERVAL == "week" else 1)
+
+
+def _floor(d: date) -> date:
+    return d - timedelta(days=d.weekday()) if INTERVAL == "week" else d
+
+
+def _name(table: str, start: date) -> str:
+    return f"{table}_p{start:%Y%m%d}"
+
+
+def _relkind(conn, table: str) -> Optional[str]:
+    return conn.execute(
+        text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:t)"), {"t": table}
+    ).scalar()
+
+
+def _create_parent(conn, table: str, columns_ddl: str, indexes: List[Tuple[str, str]]) -> None:
+    conn.exec_driver_sql(f"CREATE TABLE IF NOT EXISTS {table} ({columns_ddl}) PARTITION BY RANGE (ts)")
+    for name, cols in indexes:
+        conn.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({cols})")
+
+
+def ensure(conn, table: str, columns_ddl: str, indexes: List[Tuple[str, str]]) -> bool:
+    """Partitioned parent (+ indexes, partities, default-partitie). False = er staat
+    nog een gewone tabel (oude installatie): niets gedaan, migratie nodig."""
+    kind = _relkind(conn, table)
+    if kind == "r":
+        return False
+    _create_parent(conn, table, columns_ddl, indexes)
+    create_ahead(conn, table)
+    conn.exec_driver_sql(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT")
+    return True
+
+
+def migrate_legacy(conn, table: str, columns_ddl: str, indexes: List[Tuple[str, str]]) -> bool:
+    """Gewone tabel → partitie <table>_legacy van een nieuwe partitioned `table`.
+    Leest de hele tabel (PK-index, partitie-check, indexes van de parent): alleen
+    als expliciete migratie draaien, niet bij startup. False = niets te doen."""
+    if _relkind(conn, table) != "r":
+        return False
+    legacy = f"{table}_legacy"
+    conn.exec_driver_sql(f"ALTER TABLE {table} RENAME TO {legacy}")
+    # PK van een partitie moet gelijk zijn aan die van de parent (id, ts)
+    conn.exec_driver_sql(
+        f"ALTER TABLE {legacy} DROP CONSTRAINT {table}_pkey, ADD CONSTRAINT {legacy}_pkey PRIMARY KEY (id, ts)"
+    )
+    _create_parent(conn, table, columns_ddl, indexes)
+    # ids doorlaten lopen na de oude rijen
+    conn.exec_driver_sql(
+        f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+        f"COALESCE((SELECT max(id) FROM {legacy}), 0) + 1, false)"
+    )
+    # oude rijen lopen tot nu: legacy dekt ook het lopende interval
+    first = _floor(datetime.now(timezone.utc).date()) + _step()
+    conn.exec_driver_sql(
+        f"ALTER TABLE {table} ATTACH PARTITION {legacy} FOR VALUES FROM (MINVALUE) TO ('{first.isoformat()}')"
+    )
+    create_ahead(conn, table, first)
+    conn.exec_driver_sql(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT")
+    log.warning(f"{table}: bestaande tabel → partitie {legacy}")
+    return True
+
+
+def create_ahead(conn, table: str, start: Optional[date] = None) -> int:
+    start = start or _floor(datetime.now(timezone.utc).date())
+    until = start + timedelta(days=PARTITION_AHEAD_DAYS)
+    n = 0
+    d = start
+    while d <= until:
+        name = _name(table, d)
+        if _relkind(conn, name) is None:
+            try:
+                with conn.begin_nested():  # savepoint: één mislukte partitie breekt de rest niet
+                    conn.exec_driver_sql(
+                        f"CREATE TABLE {name} PARTITION OF {table} "
+                        f"FOR VALUES FROM ('{d.isoformat()}') TO ('{(d + _step()).isoformat()}')"
+                    )
+                n += 1
+            except Exception as e:
+                # bv. overlap (interval gewijzigd) of al rijen voor deze range in DEFAULT
+                log.warning(f"partitie {name} niet aangemaakt: {e}")
+        d += _step()
+    return n
+
+
+def _partitions(conn, table: str) -> List[Tuple[str, Optional[datetime]]]:
+    """(naam, bovengrens) per partitie; None = DEFAULT of MAXVALUE. De grens staat
+    in pg_get_expr in de sessie-TimeZone (bv. '… 02:00:00+02'): in SQL naar
+    timestamptz casten i.p.v. in Python parsen."""
+    rows = conn.execute(text(r"""
+        SELECT c.relname,
+               CAST(substring(pg_get_expr(c.relpartbound, c.oid) FROM $$TO \('([^']+)'\)$$) AS TIMESTAMPTZ)
+          FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+         WHERE i.inhparent = to_regclass(:t)
+    """), {"t": table}).all()
+    return [(name, upper) for name, upper in rows]
+
+
+def drop_expired(conn, table: str, retention_days: int) -> List[str]:
+    if retention_days <= 0:
+        return []
+    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+    gone = []
+    for name, upper in _partitions(conn, table):
+        if upper is None or upper > cutoff:
+            continue
+        if ARCHIVE:
+            conn.exec_driver_sql("CREATE SCHEMA IF NOT EXISTS archive")
+            conn.exec_driver_sql(f"ALTER TABLE {table} DETACH PARTITION {name}")
+            conn.exec_driver_sql(f"ALTER TABLE {name} SET SCHEMA archive")
+        else:
+            conn.exec_driver_sql(f"DROP TABLE {name}")
+        gone.append(name)
+    return gone
+
+
+def maintain(engine) -> Dict[str, Dict[str, object]]:
+    """Eén onderhoudsronde (blokkerend): vooruit aanmaken + verlopen opruimen."""
+    report: Dict[str, Dict[str, object]] = {}
+    for table in TABLES:
+        with engine.begin() as conn:
+            if _relkind(conn, table) != "p":
+                continue
+            created = create_ahead(conn, table)
+            removed = drop_expired(conn, table, RETENTION_DAYS[table])
+        report[table] = {"created": created, "removed": removed}
+        if created or removed:
+            log.info(f"partities {table}: +{created} / -{len(removed)} {'(archief)' if ARCHIVE else ''}")
+    return report
+
+
+async def run_maintenance(engine) -> None:
+    """Achtergrondtaak (zie app startup); DB-werk in een thread."""
+    while True:
+        try:
+            await asyncio.to_thread(maintain, engine)
+        except Exception as e:
+            log.error(f"partitie-onderhoud err: {e}")
+        await asyncio.sleep(MAINTAIN_EVERY_S)
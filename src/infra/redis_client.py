@@ -0,0 +1,20 @@
+"""
+Gedeelde async Redis-client (lazy). None als REDIS_URL leeg is of de
+redis-package ontbreekt: aanroepers vallen dan terug op in-process state.
+"""
+from __future__ import annotations
+from src.infra.settings import settings
+
+try:
+    import redis.asyncio as aioredis
+except Exception:  # redis niet geïnstalleerd
+    aioredis = None
+
+_client = None
+
+
+def get_client():
+    global _client
+    if _client is None and aioredis is not None and settings.REDIS_URL:
+        _client = aioredis.from_url(settings.REDIS_URL, socket_timeout=0.5)
+    return _client
@@ -0,0 +1,72 @@
+"""
+Micro-benchmark μ-law codec + resampler.
+
+Vergelijkt src.infra.audio met stdlib audioop (≤3.12) en audioop-lts (3.13+),
+per 20ms-frame (160 samples @ 8kHz).
+
+    python -m src.tools.bench_audio [--frames 5000]
+"""
+from __future__ import annotations
+import argparse
+import math
+import timeit
+import warnings
+from array import array
+
+from src.infra import audio
+
+FRAME = 160  # 20ms @ 8kHz
+
+
+def _backends():
+    out = {}
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        try:
+            import audioop  # type: ignore
+            out["audioop"] = audioop
+        except ModuleNotFoundError:
+            pass
+    try:
+        from audioop_lts import audioop as lts  # type: ignore
+        out["audioop-lts"] = lts
+    except ModuleNotFoundError:
+        pass
+    return out
+
+
+def _fmt(name: str, secs: float, n: int) -> str:
+    return f"{name:<34} {secs / n * 1e6:8.2f} µs/frame"
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--frames", type=int, default=5000)
+    n = ap.parse_args().frames
+
+    pcm8 = array("h", [int(9000 * math.sin(2 * math.pi * 440 * i / 8000)) for i in range(FRAME)]).tobytes()
+    ulaw = audio.ulaw_encode(pcm8)
+    pcm24 = audio.Resampler(8000, 24000).process(pcm8)
+
+    print(f"numpy: {'ja' if audio.np is not None else 'nee (array-fallback)'}; {n} frames")
+    print(_fmt("sara ulaw_decode", timeit.timeit(lambda: audio.ulaw_decode(ulaw), number=n), n))
+    print(_fmt("sara ulaw_encode", timeit.timeit(lambda: audio.ulaw_encode(pcm8), number=n), n))
+    for name, mod in _backends().items():
+        print(_fmt(f"{name} ulaw2lin", timeit.timeit(lambda: mod.ulaw2lin(ulaw, 2), number=n), n))
+        print(_fmt(f"{name} lin2ulaw", timeit.timeit(lambda: mod.lin2ulaw(pcm8, 2), number=n), n))
+        st = [None]
+        def _ratecv():
+            _, st[0] = mod.ratecv(pcm8, 2, 1, 8000, 24000, st[0])
+        print(_fmt(f"{name} ratecv 8k→24k", timeit.timeit(_ratecv, number=n), n))
+
+    up = audio.Resampler(8000, 24000)
+    down = audio.Resampler(24000, 8000)
+    print(_fmt("sara Resampler 8k→24k", timeit.timeit(lambda: up.process(pcm8), number=n), n))
+    print(_fmt("sara Resampler 24k→8k", timeit.timeit(lambda: down.process(pcm24), number=n), n))
+    tc = audio.PcmTranscoder()
+    print(_fmt("sara PcmTranscoder heen+terug", timeit.timeit(
+        lambda: tc.from_realtime(tc.to_realtime(ulaw)), number=n), n))
+
+
+if __name__ == "__main__":
+    main()
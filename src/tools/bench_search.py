@@ -0,0 +1,113 @@
+"""
+Benchmark monitoring-zoeken: ILIKE zonder index (oud) vs tsvector/trigram-indexes.
+
+Vult een eigen schema (sara_bench, raakt `logs` niet) met N logregels, meet de
+oude query (msg ILIKE '%q%') zonder indexes, maakt daarna dezelfde indexes
+als init_db()/migrate (ensure_log_search) en meet de nieuwe query uit get_events().
+
+    python -m src.tools.bench_search [--rows 1000000] [--repeat 5] [--keep]
+
+Vereist DATABASE_URL (gebruik een test-DB: seeden van 1M rijen duurt even).
+"""
+from __future__ import annotations
+import argparse
+import statistics
+import time
+
+from sqlalchemy import text
+
+from src.infra.db import engine, ensure_log_search, ensure_trgm
+from src.infra.logs import events_query, like_pattern
+
+SCHEMA = "sara_bench"
+TABLE = f"{SCHEMA}.logs"
+
+# zoektermen: zeldzaam woord, veelvoorkomend woord, deel van een call-id, zin
+QUERIES = ["timeout", "pizza", "CA7f3", "upstream reconnect"]
+
+_SEED_SQL = f"""
+INSERT INTO {TABLE} (ts, level, msg)
+SELECT now() - random() * interval '30 days',
+       (ARRAY['INFO','INFO','INFO','WARN','ERROR'])[1 + floor(random() * 5)::int],
+       (ARRAY['USER>','SARA>','realtime','twilio','upstream','order'])[1 + floor(random() * 6)::int]
+       || ' ' || (ARRAY['ik wil een pizza','twee schotels graag','bezorgen of afhalen',
+                        'reconnect poging','websocket gesloten','turn latency ok',
+                        'bestelling bevestigd','pasta carbonara','timeout na 5s',
+                        'session.update verstuurd'])[1 + floor(random() * 10)::int]
+       || ' call=CA' || md5(g::text)
+FROM generate_series(1, :n) AS g
+"""
+
+
+def _time(conn, sql: str, params: dict, repeat: int) -> tuple:
+    runs = []
+    rows = 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        rows = len(conn.execute(text(sql), params).all())
+        runs.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(runs), rows
+
+
+def _old_query(q: str) -> tuple:
+    return f"SELECT ts, level, msg FROM {TABLE} WHERE msg ILIKE :q ORDER BY ts DESC LIMIT 100", {"q": like_pattern(q)}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--keep", action="store_true", help="schema sara_bench niet opruimen")
+    args = ap.parse_args()
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        conn.exec_driver_sql(f"CREATE SCHEMA {SCHEMA}")
+        conn.exec_driver_sql(f"""
+            CREATE TABLE {TABLE} (
+              id    BIGSERIAL PRIMARY KEY,
+              ts    TIMESTAMPTZ NOT NULL DEFAULT now(),
+              level VARCHAR(10) NOT NULL,
+              msg   TEXT NOT NULL
+            )""")
+        conn.exec_driver_sql(f"CREATE INDEX ON {TABLE} (ts DESC)")
+        t0 = time.perf_counter()
+        conn.execute(text(_SEED_SQL), {"n": args.rows})
+        print(f"seed: {args.rows} rijen in {time.perf_counter() - t0:.1f}s")
+    try:
+        before = {}
+        with engine.connect() as conn:
+            conn.exec_driver_sql(f"ANALYZE {TABLE}")
+            for q in QUERIES:
+                before[q] = _time(conn, *_old_query(q), args.repeat)
+
+        with engine.begin() as conn:
+            t0 = time.perf_counter()
+            trgm = ensure_trgm(conn)
+            ensure_log_search(conn, TABLE, trgm)
+            conn.exec_driver_sql(f"ANALYZE {TABLE}")
+            print(f"indexes: {time.perf_counter() - t0:.1f}s (pg_trgm: {'ja' if trgm else 'nee'})")
+
+        after = {}
+        with engine.connect() as conn:
+            for q in QUERIES:
+                after[q] = (
+                    _time(conn, *_old_query(q), args.repeat),
+                    _time(conn, *events_query(limit=100, q=q, table=TABLE), args.repeat),
+                    _time(conn, *events_query(limit=100, q=q, sort="rank", table=TABLE), args.repeat),
+                )
+    finally:
+        if not args.keep:
+            with engine.begin() as conn:
+                conn.exec_driver_sql(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+
+    print(f"\nmediaan van {args.repeat} runs, ms (rijen)")
+    print(f"{'zoekterm':<20} {'ILIKE oud':>14} {'ILIKE+trgm':>14} {'nieuw':>14} {'nieuw/rank':>14}")
+    for q in QUERIES:
+        (b, bn) = before[q]
+        (o, on), (n, nn), (r, rn) = after[q]
+        print(f"{q:<20} {b:>9.1f} ({bn:>3}) {o:>9.1f} ({on:>3}) {n:>9.1f} ({nn:>3}) {r:>9.1f} ({rn:>3})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Lokale stand-in voor de OpenAI realtime websocket (geen netwerk, geen credits).
+
+Spreekt de subset die src/app/stream_bridge.py gebruikt:
+- session.update                    → session.updated (+ audioformaat onthouden)
+- input_audio_buffer.append         → energie-VAD → speech_started / speech_stopped
+- (na --asr-ms)                     → conversation.item.input_audio_transcription.completed
+- response.create                   → (na --ttfa-ms) output_audio_buffer.delta … response.completed
+- response.cancel                   → lopende response stoppen
+
+Transcripts komen uit een script (--transcripts bestand, één regel per beurt),
+standaard een korte bestelling. Start:
+
+    python -m src.tools.fake_realtime --port 8765 --asr-ms 300 --ttfa-ms 400
+    OPENAI_REALTIME_URL=ws://127.0.0.1:8765 OPENAI_API_KEY=x uvicorn src.app.app:app
+"""
+from __future__ import annotations
+import argparse, asyncio, base64, itertools, json, logging, math, random
+from array import array
+from dataclasses import dataclass, field
+from typing import List
+
+import websockets
+
+from src.infra import audio
+
+log = logging.getLogger("sara.fake")
+
+DEFAULT_SCRIPT = ["twee pizza margherita en een shoarma schotel", "bezorgen", "ja klopt"]
+
+
+@dataclass
+class FakeConfig:
+    asr_ms: int = 300            # speech_stopped → transcript
+    ttfa_ms: int = 400           # response.create → eerste audio
+    jitter_ms: int = 50          # ± willekeurig op beide
+    silence_ms: int = 600        # zoals server_vad silence_duration_ms
+    threshold: int = 500         # RMS (PCM16) voor "spraak"
+    speed: float = 4.0           # audio sneller dan real-time afleveren
+    ms_per_char: int = 45        # lengte antwoord ~ lengte instructions
+    max_reply_ms: int = 8000
+    transcripts: List[str] = field(default_factory=lambda: list(DEFAULT_SCRIPT))
+
+
+def _tone(ms: int, rate: int) -> bytes:
+    n = rate * ms // 1000
+    return array("h", [int(3000 * math.sin(2 * math.pi * 440 * i / rate)) for i in range(n)]).tobytes()
+
+
+_CHUNK_MS = 100
+_TONE_PCM24 = _tone(_CHUNK_MS, 24000)
+_TONE_ULAW = audio.ulaw_encode(_tone(_CHUNK_MS, 8000))
+
+
+def _rms(pcm: bytes) -> float:
+    a = array("h")
+    a.frombytes(pcm[: len(pcm) - len(pcm) % 2])
+    return math.sqrt(sum(v * v for v in a) / len(a)) if a else 0.0
+
+
+class FakeSession:
+    def __init__(self, ws, cfg: FakeConfig):
+        self.ws = ws
+        self.cfg = cfg
+        self.fmt = "pcm16"
+        self.vad = True
+        self.speaking = False
+        self.silent_ms = 0.0
+        self.script = itertools.cycle(cfg.transcripts or DEFAULT_SCRIPT)
+        self.resp_n = 0
+        self.resp_task: asyncio.Task | None = None
+        self.item_n = 0
+
+    async def send(self, msg: dict):
+        await self.ws.send(json.dumps(msg))
+
+    def _delay(self, ms: int) -> float:
+        return max(0, ms + random.uniform(-self.cfg.jitter_ms, self.cfg.jitter_ms)) / 1000
+
+    async def on_append(self, b64: str):
+        raw = base64.b64decode(b64)
+        if self.fmt == "g711_ulaw":
+            pcm, dur = audio.ulaw_decode(raw), len(raw) / 8
+        else:
+            pcm, dur = raw, len(raw) / 48  # 24kHz * 2 bytes
+        if not self.vad:
+            return
+        if _rms(pcm) >= self.cfg.threshold:
+            self.silent_ms = 0
+            if not self.speaking:
+                self.speaking = True
+                await self.send({"type": "input_audio_buffer.speech_started"})
+        elif self.speaking:
+            self.silent_ms += dur
+            if self.silent_ms >= self.cfg.silence_ms:
+                self.speaking = False
+                await self.send({"type": "input_audio_buffer.speech_stopped"})
+                asyncio.create_task(self._transcribe())
+
+    async def _transcribe(self):
+        await asyncio.sleep(self._delay(self.cfg.asr_ms))
+        self.item_n += 1
+        await self.send({
+            "type": "conversation.item.input_audio_transcription.completed",
+            "item_id": f"item_{self.item_n}",
+            "transcript": next(self.script),
+        })
+
+    async def _respond(self, rid: str, text: str):
+        try:
+            await asyncio.sleep(self._delay(self.cfg.ttfa_ms))
+            total = min(self.cfg.max_reply_ms, max(_CHUNK_MS, len(text) * self.cfg.ms_per_char))
+            chunk = _TONE_ULAW if self.fmt == "g711_ulaw" else _TONE_PCM24
+            for _ in range(0, total, _CHUNK_MS):
+                await self.send({"type": "output_audio_buffer.delta", "response_id": rid,
+                                 "audio": base64.b64encode(chunk).decode()})
+                await asyncio.sleep(_CHUNK_MS / 1000 / self.cfg.speed)
+            usage = {"input_tokens": len(text) // 4, "output_tokens": total // 20}
+            await self.send({"type": "response.completed",
+                             "response": {"id": rid, "status": "completed", "usage": usage}})
+        except asyncio.CancelledError:
+            await self.send({"type": "response.completed", "response": {"id": rid, "status": "cancelled"}})
+
+    async def handle(self):
+        async for frame in self.ws:
+            try:
+                d = json.loads(frame)
+            except Exception:
+                continue
+            t = d.get("type")
+            if t == "session.update":
+                s = d.get("session") or {}
+                self.fmt = s.get("input_audio_format", self.fmt)
+                if "turn_detection" in s:
+                    self.vad = s["turn_detection"] is not None
+                await self.send({"type": "session.updated", "session": s})
+            elif t == "input_audio_buffer.append":
+                await self.on_append(d.get("audio", ""))
+            elif t == "input_audio_buffer.commit" and not self.vad:
+                pass  # zonder VAD geen beurtdetectie; transcript komt dan niet
+            elif t == "response.create":
+                self.resp_n += 1
+                r = d.get("response") or {}
+                text = r.get("instructions") or " ".join(
+                    c.get("text", "") for it in r.get("input") or [] for c in it.get("content") or []
+                )
+                self.resp_task = asyncio.create_task(self._respond(f"resp_{self.resp_n}", text))
+            elif t == "response.cancel":
+                if self.resp_task and not self.resp_task.done():
+                    self.resp_task.cancel()
+            elif t == "session.close":
+                break
+        if self.resp_task:
+            self.resp_task.cancel()
+
+
+async def serve(host: str, port: int, cfg: FakeConfig):
+    async def handler(ws):
+        await FakeSession(ws, cfg).handle()
+    return await websockets.serve(handler, host, port, max_size=10_000_000)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--asr-ms", type=int, default=300)
+    ap.add_argument("--ttfa-ms", type=int, default=400)
+    ap.add_argument("--jitter-ms", type=int, default=50)
+    ap.add_argument("--speed", type=float, default=4.0)
+    ap.add_argument("--transcripts", help="bestand met één transcript per regel")
+    a = ap.parse_args()
+    script = DEFAULT_SCRIPT
+    if a.transcripts:
+        with open(a.transcripts, encoding="utf-8") as f:
+            script = [ln.strip() for ln in f if ln.strip()]
+    cfg = FakeConfig(asr_ms=a.asr_ms, ttfa_ms=a.ttfa_ms, jitter_ms=a.jitter_ms,
+                     speed=a.speed, transcripts=script)
+    logging.basicConfig(level=logging.INFO)
+
+    async def _run():
+        srv = await serve(a.host, a.port, cfg)
+        log.info(f"fake realtime op ws://{a.host}:{a.port}")
+        await srv.wait_closed()
+
+    asyncio.run(_run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""
+Load-generator: N gesimuleerde Twilio media streams tegen /ws/twilio.
+
+Elke call speelt de WAV-fixtures af in 20ms μ-law frames (real-time), wacht
+na elke fixture tot Sara's antwoord klaar is en meet:
+- beurtlatency: laatste spraakframe van de beller → eerste audioframe terug
+- frame drop rate: gaten > 2 frames in terugkomende audio + te laat
+  verstuurde frames aan onze kant
+- CPU per call van de worker (met --spawn, via /proc)
+
+Zonder netwerk (fake OpenAI + app lokaal, Postgres via DATABASE_URL):
+
+    python -m src.tools.loadgen --spawn --calls 30 fixtures/bestelling.wav fixtures/bezorgen.wav fixtures/ja.wav
+
+Of tegen een draaiende worker:
+
+    python -m src.tools.loadgen --url ws://127.0.0.1:8000/ws/twilio --calls 10 a.wav
+"""
+from __future__ import annotations
+import argparse, asyncio, base64, json, os, subprocess, sys, time, uuid, wave
+from array import array
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import websockets
+
+from src.infra import audio
+from src.infra.metrics import Histogram
+
+FRAME = 160          # 20ms μ-law @ 8kHz
+FRAME_S = 0.02
+SPEECH_RMS = 500     # PCM16-RMS waarboven een frame als spraak telt
+REPLY_IDLE_S = 0.6   # zo lang geen audio terug = antwoord klaar
+REPLY_TIMEOUT_S = 15.0
+
+
+def load_fixture(path: str) -> bytes:
+    """WAV (PCM16 mono, 8/16/24/48kHz) of .ulaw/.raw (μ-law 8kHz) → μ-law 8kHz."""
+    if path.endswith((".ulaw", ".raw")):
+        with open(path, "rb") as f:
+            return f.read()
+    with wave.open(path, "rb") as w:
+        if w.getsampwidth() != 2 or w.getnchannels() != 1:
+            raise ValueError(f"{path}: alleen PCM16 mono")
+        rate, pcm = w.getframerate(), w.readframes(w.getnframes())
+    if rate != 8000:
+        pcm = audio.Resampler(rate, 8000).process(pcm)
+    return audio.ulaw_encode(pcm)
+
+
+def _is_speech(ulaw: bytes) -> bool:
+    a = array("h")
+    a.frombytes(audio.ulaw_decode(ulaw))
+    return bool(a) and (sum(v * v for v in a) / len(a)) ** 0.5 >= SPEECH_RMS
+
+
+@dataclass
+class CallResult:
+    call_sid: str
+    turns_ms: List[float] = field(default_factory=list)
+    frames_sent: int = 0
+    frames_late: int = 0
+    frames_recv: int = 0
+    gaps: int = 0
+    clears: int = 0
+    error: Optional[str] = None
+
+
+class SimCall:
+    def __init__(self, url: str, fixtures: List[bytes]):
+        self.url = url
+        self.fixtures = fixtures
+        self.res = CallResult(call_sid="CA" + uuid.uuid4().hex)
+        self.stream_sid = "MZ" + uuid.uuid4().hex
+        self._last_rx = 0.0
+        self._turn_t0: Optional[float] = None   # einde spraak beller
+        self._got_reply = asyncio.Event()
+
+    async def _send(self, ws, msg: dict):
+        await ws.send(json.dumps(msg))
+
+    async def _receiver(self, ws):
+        async for raw in ws:
+            m = json.loads(raw)
+            ev = m.get("event")
+            now = time.perf_counter()
+            if ev == "media":
+                if self._last_rx and FRAME_S * 2 < now - self._last_rx < REPLY_IDLE_S:
+                    self.res.gaps += 1
+                self._last_rx = now
+                self.res.frames_recv += 1
+                if self._turn_t0 is not None:
+                    self.res.turns_ms.append((now - self._turn_t0) * 1000)
+                    self._turn_t0 = None
+                self._got_reply.set()
+            elif ev == "mark":
+                # echte Twilio bevestigt na afspelen; frames komen al real-time binnen
+                await self._send(ws, {"event": "mark", "streamSid": self.stream_sid, "mark": m.get("mark", {})})
+            elif ev == "clear":
+                self.res.clears += 1
+
+    async def _play(self, ws, ulaw: bytes, t_next: float) -> float:
+        last_speech = None
+        for i in range(0, len(ulaw) - FRAME + 1, FRAME):
+            now = time.perf_counter()
+            if now < t_next:
+                await asyncio.sleep(t_next - now)
+            elif now - t_next > FRAME_S:
+                self.res.frames_late += 1
+            frame = ulaw[i:i + FRAME]
+            await self._send(ws, {"event": "media", "streamSid": self.stream_sid,
+                                  "media": {"payload": base64.b64encode(frame).decode()}})
+            self.res.frames_sent += 1
+            if _is_speech(frame):
+                last_speech = time.perf_counter()
+            t_next += FRAME_S
+        if last_speech is not None:
+            self._turn_t0 = last_speech
+        return t_next
+
+    async def _wait_reply(self, ws, t_next: float) -> float:
+        """Stilte blijven sturen (zoals een echte lijn) tot het antwoord klaar is."""
+        silence = b"\xff" * FRAME
+        self._got_reply.clear()
+        start = time.perf_counter()
+        while True:
+            now = time.perf_counter()
+            if self._got_reply.is_set() and now - self._last_rx > REPLY_IDLE_S:
+                return t_next
+            if now - start > REPLY_TIMEOUT_S:
+                self._turn_t0 = None
+                return t_next
+            t_next = await self._play(ws, silence, t_next)
+
+    async def run(self) -> CallResult:
+        try:
+            async with websockets.connect(self.url, max_size=10_000_000) as ws:
+                rx = asyncio.create_task(self._receiver(ws))
+                await self._send(ws, {"event": "connected", "protocol": "Call", "version": "1.0.0"})
+                await self._send(ws, {"event": "start", "streamSid": self.stream_sid, "start": {
+                    "streamSid": self.stream_sid, "callSid": self.res.call_sid,
+                    "mediaFormat": {"encoding": "audio/x-mulaw", "sampleRate": 8000, "channels": 1},
+                    "customParameters": {},
+                }})
+                t_next = time.perf_counter()
+                t_next = await self._wait_reply(ws, t_next)   # begroeting
+                for fx in self.fixtures:
+                    t_next = await self._play(ws, fx, t_next)
+                    t_next = await self._wait_reply(ws, t_next)
+                await self._send(ws, {"event": "stop", "streamSid": self.stream_sid})
+                rx.cancel()
+        except Exception as e:
+            self.res.error = f"{type(e).__name__}: {e}"
+        return self.res
+
+
+def _proc_cpu_s(pid: int) -> Optional[float]:
+    """utime+stime van een proces (Linux /proc); None elders."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            parts = f.read().rsplit(")", 1)[1].split()
+        return (int(parts[11]) + int(parts[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+async def _wait_port(host: str, port: int, timeout: float = 20.0):
+    t0 = time.monotonic()
+    while time.monotonic() - t0 < timeout:
+        try:
+            _, w = await asyncio.open_connection(host, port)
+            w.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"{host}:{port} komt niet op")
+
+
+def report(results: List[CallResult], wall_s: float, cpu_s: Optional[float]) -> dict:
+    lat = Histogram("turn")
+    for r in results:
+        for ms in r.turns_ms:
+            lat.record_ms(ms)
+    recv = sum(r.frames_recv for r in results)
+    sent = sum(r.frames_sent for r in results)
+    ok = [r for r in results if not r.error]
+    out = {
+        "calls": len(results),
+        "errors": len(results) - len(ok),
+        "wall_s": round(wall_s, 1),
+        "turn_latency_ms": lat.summary(),
+        "rx_gap_rate": round(sum(r.gaps for r in results) / recv, 4) if recv else None,
+        "tx_late_rate": round(sum(r.frames_late for r in results) / sent, 4) if sent else None,
+        "clears": sum(r.clears for r in results),
+        "worker_cpu_s": round(cpu_s, 2) if cpu_s is not None else None,
+        "worker_cpu_pct_per_call": (round(cpu_s / wall_s / len(results) * 100, 2)
+                                    if cpu_s is not None and results and wall_s else None),
+    }
+    errs = sorted({r.error for r in results if r.error})
+    if errs:
+        out["error_samples"] = errs[:5]
+    return out
+
+
+async def run(args) -> dict:
+    fixtures = [load_fixture(p) for p in args.fixtures]
+    url, proc, fake = args.url, None, None
+    if args.spawn:
+        from src.tools.fake_realtime import FakeConfig, serve
+        fake = await serve("127.0.0.1", args.fake_port, FakeConfig(asr_ms=args.asr_ms, ttfa_ms=args.ttfa_ms))
+        env = dict(os.environ, OPENAI_REALTIME_URL=f"ws://127.0.0.1:{args.fake_port}",
+                   OPENAI_API_KEY=os.getenv("OPENAI_API_KEY") or "sk-local")
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "src.app.app:app", "--port", str(args.app_port), "--log-level", "warning"],
+            env=env,
+        )
+        await _wait_port("127.0.0.1", args.app_port)
+        url = f"ws://127.0.0.1:{args.app_port}/ws/twilio"
+    try:
+        cpu0 = _proc_cpu_s(proc.pid) if proc else None
+        t0 = time.perf_counter()
+        calls = []
+        for i in range(args.calls):
+            calls.append(asyncio.create_task(SimCall(url, fixtures).run()))
+            if args.ramp_s and i < args.calls - 1:
+                await asyncio.sleep(args.ramp_s / args.calls)
+        results = await asyncio.gather(*calls)
+        wall = time.perf_counter() - t0
+        cpu1 = _proc_cpu_s(proc.pid) if proc else None
+        cpu = (cpu1 - cpu0) if cpu0 is not None and cpu1 is not None else None
+        return report(results, wall, cpu)
+    finally:
+        if proc:
+            proc.terminate()
+            # niet blokkerend: de fake realtime draait in deze event-loop en moet de
+            # close-handshake van de worker (pool.close) nog kunnen beantwoorden
+            await asyncio.to_thread(proc.wait, 10)
+        if fake:
+            fake.close()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("fixtures", nargs="+", help="WAV/.ulaw per beller-beurt, in volgorde")
+    ap.add_argument("--url", default="ws://127.0.0.1:8000/ws/twilio")
+    ap.add_argument("--calls", type=int, default=10)
+    ap.add_argument("--ramp-s", type=float, default=2.0, help="calls gespreid starten over N seconden")
+    ap.add_argument("--spawn", action="store_true", help="start fake OpenAI + uvicorn-worker lokaal")
+    ap.add_argument("--app-port", type=int, default=8077)
+    ap.add_argument("--fake-port", type=int, default=8765)
+    ap.add_argument("--asr-ms", type=int, default=300)
+    ap.add_argument("--ttfa-ms", type=int, default=400)
+    args = ap.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
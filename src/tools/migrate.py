@@ -0,0 +1,38 @@
+"""
+Eenmalige DB-migraties (zie MIGRATIONS in src/infra/db.py).
+
+Niet bij app-startup: deze stappen lezen of herschrijven bestaande (grote)
+tabellen. Draai ze één keer na een upgrade, bv. als release-stap vóór de
+workers herstarten; de app blijft tot die tijd op het oude schema werken.
+
+    python -m src.tools.migrate [--dry-run]
+"""
+from __future__ import annotations
+import argparse
+import logging
+import time
+
+from src.infra.db import init_db, migrate, pending_migrations
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--dry-run", action="store_true", help="alleen tonen wat openstaat")
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+
+    init_db()
+    todo = pending_migrations()
+    if not todo:
+        print("geen openstaande migraties")
+        return
+    print("openstaand: " + ", ".join(todo))
+    if args.dry_run:
+        return
+    t0 = time.perf_counter()
+    done = migrate()
+    print(f"uitgevoerd: {', '.join(done)} ({time.perf_counter() - t0:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
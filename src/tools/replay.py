@@ -0,0 +1,328 @@
+"""
+Replay van opgenomen calls (src/app/call_recorder.py) door de /ws/twilio-handler.
+
+Per opname (<call>.json + <call>.in.wav):
+- de inkomende audio gaat in 20ms-frames door `ws_twilio`, `--speed` keer
+  sneller dan real-time
+- OpenAI is een in-process stand-in (fake_realtime) die de opgenomen
+  transcripts teruggeeft op dezelfde plek in de audio
+- gerapporteerd per call: transcripts, geparste bestelling (modus + items),
+  say()-teksten (en verschil met de opname), beurt-timings
+
+Geen netwerk, geen DB-writes (call-events worden afgevangen). DATABASE_URL
+moet wel gezet zijn om de app te kunnen importeren.
+
+    python -m src.tools.replay data/recordings --speed 10 --concurrency 20 --out replay.json
+"""
+from __future__ import annotations
+import argparse, asyncio, base64, contextvars, json, sys, time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from src.app import stream_bridge as sb
+from src.app.call_recorder import read_ulaw_wav
+from src.app.realtime_pool import RealtimePool
+from src.infra import live_settings as ls
+from src.infra.metrics import Histogram
+from src.tools.fake_realtime import FakeConfig, FakeSession
+
+FRAME = 160
+FRAME_S = 0.02
+
+
+@dataclass
+class Recording:
+    call_id: str
+    start: Dict[str, Any]
+    audio_in: bytes
+    transcripts: List[tuple]      # (in_byte, tekst)
+    says: List[str]
+
+
+@dataclass
+class ReplayResult:
+    call_id: str
+    transcripts: List[str] = field(default_factory=list)
+    orders: List[Dict[str, Any]] = field(default_factory=list)
+    says: List[str] = field(default_factory=list)
+    turns: List[Dict[str, Any]] = field(default_factory=list)
+    expected_says: List[str] = field(default_factory=list)
+    error: Optional[str] = None
+
+    @property
+    def say_diffs(self) -> List[Dict[str, Any]]:
+        out = []
+        n = max(len(self.says), len(self.expected_says))
+        for i in range(n):
+            got = self.says[i] if i < len(self.says) else None
+            exp = self.expected_says[i] if i < len(self.expected_says) else None
+            if got != exp:
+                out.append({"i": i, "expected": exp, "got": got})
+        return out
+
+
+_current: contextvars.ContextVar[ReplayResult] = contextvars.ContextVar("replay_result")
+_current_rec: contextvars.ContextVar[Recording] = contextvars.ContextVar("replay_rec")
+
+
+def load_recording(path: Path) -> Recording:
+    doc = json.loads(path.read_text(encoding="utf-8"))
+    ev = doc.get("events") or []
+    return Recording(
+        call_id=doc["call_id"],
+        start=doc.get("start") or {},
+        audio_in=read_ulaw_wav(path.parent / doc.get("audio_in", f"{doc['call_id']}.in.wav")),
+        transcripts=[(e.get("in_byte", 0), e.get("text", "")) for e in ev if e.get("event") == "transcript"],
+        says=[e.get("text", "") for e in ev if e.get("event") == "say"],
+    )
+
+
+# ── in-memory websocket-paar (bridge ↔ fake realtime)
+class _Pipe:
+    def __init__(self):
+        self.q: asyncio.Queue = asyncio.Queue()
+        self.peer: Optional[_Pipe] = None
+        self.open = True
+
+    async def send(self, msg: str):
+        if not self.open or not self.peer.open:
+            raise ConnectionError("pipe gesloten")
+        await self.peer.q.put(msg)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        m = await self.q.get()
+        if m is None:
+            raise StopAsyncIteration
+        return m
+
+    async def close(self):
+        if self.open:
+            self.open = False
+            await self.q.put(None)
+            if self.peer.open:
+                self.peer.open = False
+                await self.peer.q.put(None)
+
+
+def _pipe_pair():
+    a, b = _Pipe(), _Pipe()
+    a.peer, b.peer = b, a
+    return a, b
+
+
+class ReplayRealtime(FakeSession):
+    """Fake realtime die transcripts op de opgenomen audiopositie teruggeeft."""
+
+    def __init__(self, ws, cfg: FakeConfig, rec: Recording, res: ReplayResult, lead_bytes: int = 0):
+        super().__init__(ws, cfg)
+        # transcript-event ligt ~ASR-latency na het einde van de spraak
+        self.pending = [(max(0, b - lead_bytes), t) for b, t in rec.transcripts]
+        self.res = res
+        self.in_bytes = 0
+
+    async def on_append(self, b64: str):
+        n = len(base64.b64decode(b64))
+        self.in_bytes += n if self.fmt == "g711_ulaw" else n // 6  # pcm16 24k → μ-law 8k
+        while self.pending and self.in_bytes >= self.pending[0][0]:
+            _, text = self.pending.pop(0)
+            await self.send({"type": "input_audio_buffer.speech_stopped"})
+            asyncio.create_task(self._say_transcript(text))
+
+    async def _say_transcript(self, text: str):
+        await asyncio.sleep(self._delay(self.cfg.asr_ms))
+        self.item_n += 1
+        await self.send({"type": "conversation.item.input_audio_transcription.completed",
+                         "item_id": f"item_{self.item_n}", "transcript": text})
+
+    async def handle(self):
+        # response.create-teksten afvangen: dat zijn de say()-teksten
+        orig = self._respond
+
+        async def _respond(rid, text):
+            self.res.says.append(text)
+            await orig(rid, text)
+        self._respond = _respond
+        await super().handle()
+
+
+class ReplayTwilio:
+    """Minimale stand-in voor starlette's WebSocket zoals ws_twilio die gebruikt."""
+    headers: Dict[str, str] = {}
+
+    def __init__(self):
+        self.inq: asyncio.Queue = asyncio.Queue()
+        self.media_out = 0
+        self.closed = False
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def receive_text(self) -> str:
+        m = await self.inq.get()
+        if m is None:
+            raise RuntimeError("twilio disconnect")
+        return m
+
+    async def send_text(self, s: str):
+        d = json.loads(s)
+        if d.get("event") == "media":
+            self.media_out += 1
+        elif d.get("event") == "mark":
+            # Twilio bevestigt marks; direct terugsturen is goed genoeg voor replay
+            await self.inq.put(json.dumps({"event": "mark", "mark": d.get("mark", {})}))
+
+    async def close(self):
+        self.closed = True
+        await self.inq.put(None)
+
+
+def _install_hooks(cfg: FakeConfig, settings: Dict[str, Any], lead_bytes: int):
+    """Bridge in replay-stand: fake OpenAI, geen opname/prompt-audio/DB, alles traceren."""
+    async def connect():
+        a, b = _pipe_pair()
+        sb.spawn(ReplayRealtime(b, cfg, _current_rec.get(), _current.get(), lead_bytes).handle())
+        # net als openai_session(): de bridge gaat uit van een geconfigureerde sessie
+        await a.send(json.dumps({"type": "session.update", "session": sb.session_config(sb.pick_mode({}))}))
+        return a
+
+    sb.pool = RealtimePool(connect, min_size=0, max_size=0)
+    sb.RECORD = False
+    sb.PROMPT_AUDIO = False
+    sb.admission.MAX_WORKER = 0  # --concurrency bepaalt het aantal calls, niet de worker-limiet
+    ls.SNAPSHOT_TTL_S = float("inf")
+    ls._store_snapshot(settings)
+
+    orig_plan = getattr(sb.plan_turn, "__wrapped__", sb.plan_turn)  # niet dubbel wrappen
+
+    def traced_plan(st, user, s):
+        nst, reply = orig_plan(st, user, s)
+        r = _current.get()
+        r.transcripts.append(user)
+        r.orders.append({"mode": nst.mode, "items": [i.__dict__ for i in nst.items]})
+        return nst, reply
+    traced_plan.__wrapped__ = orig_plan
+    sb.plan_turn = traced_plan
+
+    class CaptureEvents:
+        """Vervangt src.infra.call_events in de bridge: alleen turn-timings bewaren."""
+        def start(self, call_id, from_nr=None, to_nr=None):
+            pass
+
+        def event(self, call_id, event, level="INFO", data=None, latency_ms=None, status_code=None):
+            if event == "turn_latency":
+                _current.get().turns.append(dict(data or {}))
+
+        def end(self, call_id, result="ok", **kw):
+            return {"turns": len(_current.get().turns), "lat_p95": None}
+
+        def stats(self):
+            return {}
+    sb.call_events = CaptureEvents()
+
+
+async def replay_one(rec: Recording, speed: float, tail_s: float) -> ReplayResult:
+    res = ReplayResult(call_id=rec.call_id, expected_says=rec.says)
+    _current.set(res)
+    _current_rec.set(rec)
+    tw = ReplayTwilio()
+    stream_sid = rec.start.get("streamSid") or f"MZreplay{rec.call_id}"
+    start = dict(rec.start, callSid=f"{rec.call_id}-replay", streamSid=stream_sid)
+    handler = asyncio.create_task(sb.ws_twilio(tw))
+    try:
+        await tw.inq.put(json.dumps({"event": "start", "streamSid": stream_sid, "start": start}))
+        t_next = time.perf_counter()
+        step = FRAME_S / speed
+        data = rec.audio_in
+        for i in range(0, len(data) - FRAME + 1, FRAME):
+            payload = base64.b64encode(data[i:i + FRAME]).decode()
+            await tw.inq.put(json.dumps({"event": "media", "streamSid": stream_sid, "media": {"payload": payload}}))
+            t_next += step
+            delay = t_next - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        await asyncio.sleep(tail_s)  # laatste beurt laten afronden
+        await tw.inq.put(json.dumps({"event": "stop", "streamSid": stream_sid}))
+        await asyncio.wait_for(handler, timeout=30)
+    except Exception as e:
+        res.error = f"{type(e).__name__}: {e}"
+        handler.cancel()
+    return res
+
+
+async def run(args) -> Dict[str, Any]:
+    paths: List[Path] = []
+    for p in map(Path, args.recordings):
+        paths += sorted(p.glob("*.json")) if p.is_dir() else [p]
+    recs = [load_recording(p) for p in paths]
+    speed = max(0.1, args.speed)
+    cfg = FakeConfig(asr_ms=int(args.asr_ms / speed), ttfa_ms=int(args.ttfa_ms / speed),
+                     jitter_ms=0, speed=max(4.0, speed * 4))
+    _install_hooks(cfg, json.loads(args.settings) if args.settings else {}, args.asr_ms * 8)
+    tail_s = (args.asr_ms + args.ttfa_ms) / 1000 / speed + 0.5
+
+    sem = asyncio.Semaphore(max(1, args.concurrency))
+
+    async def one(r: Recording):
+        async with sem:
+            # eigen context per call: _current/_current_rec niet delen
+            return await asyncio.create_task(replay_one(r, speed, tail_s), context=contextvars.copy_context())
+
+    t0 = time.perf_counter()
+    results = await asyncio.gather(*(one(r) for r in recs))
+    wall = time.perf_counter() - t0
+
+    hist = {k: Histogram(k) for k in ("turn_ms", "nlu_ms", "prompt_ms", "model_ttfa_ms")}
+    for r in results:
+        for t in r.turns:
+            for k, h in hist.items():
+                if k in t:
+                    h.record_ms(t[k])
+    mismatched = [r for r in results if r.say_diffs]
+    return {
+        "calls": len(results),
+        "errors": sum(1 for r in results if r.error),
+        "say_mismatches": len(mismatched),
+        "wall_s": round(wall, 1),
+        "audio_s": round(sum(len(r.audio_in) for r in recs) / 8000, 1),
+        "timings_ms": {k: h.summary() for k, h in hist.items()},
+        "results": [
+            {
+                "call_id": r.call_id,
+                "error": r.error,
+                "transcripts": r.transcripts,
+                "orders": r.orders,
+                "says": r.says,
+                "say_diffs": r.say_diffs,
+                "turns": r.turns,
+            }
+            for r in results
+        ],
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("recordings", nargs="+", help="<call>.json-bestanden of mappen daarmee")
+    ap.add_argument("--speed", type=float, default=10.0)
+    ap.add_argument("--concurrency", type=int, default=10)
+    ap.add_argument("--asr-ms", type=int, default=300, help="gesimuleerde ASR-latency (real-time)")
+    ap.add_argument("--ttfa-ms", type=int, default=400, help="gesimuleerde model-TTFA (real-time)")
+    ap.add_argument("--settings", help='live settings als JSON, bv. \'{"delay_pizzas_min": 20}\'')
+    ap.add_argument("--out", help="volledig rapport als JSON hierheen")
+    ap.add_argument("--strict", action="store_true", help="exit 1 bij say()-verschillen of fouten")
+    args = ap.parse_args()
+    report = asyncio.run(run(args))
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    summary = {k: v for k, v in report.items() if k != "results"}
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    if args.strict and (report["errors"] or report["say_mismatches"]):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -59,6 +59,39 @@ def greeting(dt: Optional[datetime] = None) -> str:
             "Ristorante Adam Spanbroek. Waarmee kan ik u helpen?")
 
 
+# Vaste zinnen in het live gesprek (ook als voorgerenderde audio, zie prompt_audio)
+GREETING_STREAM = ("Goedendag, u spreekt met Sara, de belassistent van "
+                   "Ristorante Adam Spanbroek.")
+ASK_ORDER = "Wat wilt u bestellen?"
+OPENING_STREAM = f"{GREETING_STREAM} {ASK_ORDER}"
+ASK_MODE = "Wilt u laten bezorgen of komt u het afhalen?"
+ASK_CHANGE = "Geen probleem. Wat wilt u wijzigen of toevoegen?"
+
+
+def is_closed(status: str) -> bool:
+    return any(k in status.lower() for k in ("gesloten", "niet geopend"))
+
+
+def opening_stream(dt: Optional[datetime] = None) -> str:
+    """Eerste zin in de realtime-call: sluitingsmelding, of opening (na de
+    bezorgstop met die melding erin, vóór de vraag)."""
+    ts = time_status(dt)
+    if ts and is_closed(ts):
+        return ts
+    if ts:
+        return f"{GREETING_STREAM} {ts} {ASK_ORDER}"
+    return OPENING_STREAM
+
+
+def fixed_prompts() -> List[str]:
+    """Alle zinnen die niet van de bestelling afhangen: precies wat opening_stream()
+    op elk moment van de dag kan teruggeven, plus de vaste vragen."""
+    today = date.today()
+    openings = {opening_stream(datetime.combine(today, t, tzinfo=AMS))
+                for t in (time(3, 0), time(18, 0), DELIVERY_STOP)}
+    return sorted(openings) + [ASK_ORDER, ASK_MODE, ASK_CHANGE]
+
+
 def time_status(dt: Optional[datetime] = None) -> str:
     """Meld sluiting of bezorgstop."""
     dt = dt or now_ams()
@@ -0,0 +1,105 @@
+"""
+Voorgerenderde audio voor vaste zinnen (begroeting, vragen, sluitingsmelding).
+
+Per (tekst, stem) één keer via de TTS-adapter gegenereerd, omgezet naar
+μ-law 8kHz en in 20ms-frames in geheugen gehouden; de bridge streamt die
+direct naar Twilio zonder `response.create` (geen model-tokens, ~0 TTFA).
+Ook als .ulaw op schijf (SARA_PROMPT_AUDIO_DIR) zodat een nieuwe worker niet
+opnieuw hoeft te synthetiseren. Offline vooraf bouwen:
+
+    python -m src.workflows.prompt_audio
+"""
+from __future__ import annotations
+import hashlib, logging, os, threading
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+from src.infra import audio
+from src.infra.settings import settings
+
+log = logging.getLogger("sara.prompts")
+
+PROMPT_AUDIO_DIR = Path(os.getenv("SARA_PROMPT_AUDIO_DIR", "data/prompt_audio"))
+FRAME = 160  # 20ms μ-law @ 8kHz
+
+
+def _norm(text: str) -> str:
+    return " ".join(text.split())
+
+
+class PromptAudioCache:
+    def __init__(self, voice: str, directory: Path = PROMPT_AUDIO_DIR, tts=None):
+        self.voice = voice
+        self.dir = directory
+        self._tts = tts
+        self._mem: Dict[Tuple[str, str], bytes] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, text: str) -> Path:
+        h = hashlib.sha1(f"{self.voice}\n{_norm(text)}".encode("utf-8")).hexdigest()[:16]
+        return self.dir / f"{self.voice}-{h}.ulaw"
+
+    def _synthesize(self, text: str) -> bytes:
+        if self._tts is None:
+            from src.adapters.openai_tts import OpenAITTSAdapter
+            self._tts = OpenAITTSAdapter()
+        pcm24 = self._tts.synthesize_pcm(text, voice=self.voice)
+        ulaw = audio.ulaw_encode(audio.Resampler(24000, 8000).process(pcm24))
+        pad = -len(ulaw) % FRAME
+        return ulaw + b"\xff" * pad  # hele frames; rest stilte
+
+    def load(self, text: str) -> bytes:
+        """Uit geheugen, schijf of TTS (in die volgorde). Blokkeert: niet in de event-loop."""
+        key = (_norm(text), self.voice)
+        if key in self._mem:
+            return self._mem[key]
+        p = self._path(text)
+        if p.exists():
+            data = p.read_bytes()
+        else:
+            data = self._synthesize(text)
+            try:
+                p.parent.mkdir(parents=True, exist_ok=True)
+                p.write_bytes(data)
+            except OSError as e:
+                log.warning(f"prompt-audio niet opgeslagen: {e}")
+        self._mem[key] = data
+        return data
+
+    def warm(self, texts: Iterable[str], stop: Optional[threading.Event] = None) -> int:
+        """`stop` gezet (shutdown) → na de lopende zin ophouden."""
+        n = 0
+        for t in texts:
+            if stop is not None and stop.is_set():
+                break
+            try:
+                self.load(t)
+                n += 1
+            except Exception as e:
+                log.error(f"prompt-audio '{t[:40]}' mislukt: {e}")
+        log.info(f"prompt-audio klaar: {n} zinnen ({self.voice})")
+        return n
+
+    def get(self, text: str) -> Optional[bytes]:
+        """Alleen geheugen (veilig in de event-loop); None = live genereren."""
+        data = self._mem.get((_norm(text), self.voice))
+        if data is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return data
+
+    def stats(self) -> dict:
+        return {"phrases": len(self._mem), "hits": self.hits, "misses": self.misses}
+
+
+def main() -> None:
+    from src.workflows.call_flow import fixed_prompts
+    logging.basicConfig(level=logging.INFO)
+    voice = os.getenv("OPENAI_REALTIME_VOICE", settings.TTS_VOICE)
+    PromptAudioCache(voice).warm(fixed_prompts())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+μ-law codec en resampler (src/infra/audio.py), met en zonder NumPy.
+"""
+import math
+from array import array
+
+import pytest
+
+from src.infra import audio
+
+audioop = pytest.importorskip("audioop")
+
+ALL_SAMPLES = array("h", range(-32768, 32768)).tobytes()
+
+
+@pytest.fixture(params=["numpy", "pure"])
+def np_mode(request, monkeypatch):
+    if request.param == "numpy":
+        if audio.np is None:
+            pytest.skip("numpy niet geïnstalleerd")
+    else:
+        monkeypatch.setattr(audio, "np", None)
+    return request.param
+
+
+def _sine(freq, rate, n, amp=8000):
+    return array("h", (int(amp * math.sin(2 * math.pi * freq * i / rate)) for i in range(n))).tobytes()
+
+
+def _rms(pcm):
+    x = array("h", pcm)
+    return math.sqrt(sum(v * v for v in x) / len(x))
+
+
+def test_tables_match_audioop():
+    assert audio.ULAW_DECODE == list(array("h", audioop.ulaw2lin(bytes(range(256)), 2)))
+    assert audio.ULAW_ENCODE == audioop.lin2ulaw(array("H", range(65536)).tobytes(), 2)
+
+
+def test_codec_matches_audioop(np_mode):
+    codes = bytes(range(256))
+    assert audio.ulaw_decode(codes) == audioop.ulaw2lin(codes, 2)
+    assert audio.ulaw_encode(ALL_SAMPLES) == audioop.lin2ulaw(ALL_SAMPLES, 2)
+    assert audio.ulaw_decode(b"") == b"" and audio.ulaw_encode(b"") == b""
+
+
+@pytest.mark.parametrize("src,dst,frame", [(8000, 24000, 160), (24000, 8000, 480)])
+def test_resampler_frames_equal_one_shot(np_mode, src, dst, frame):
+    pcm = _sine(440, src, frame * 10)
+    whole = audio.Resampler(src, dst).process(pcm)
+    r = audio.Resampler(src, dst)
+    parts = [r.process(pcm[i:i + 2 * frame]) for i in range(0, len(pcm), 2 * frame)]
+    # elke 20ms-frame levert precies 20ms op (geen drift tussen frames)
+    assert {len(p) for p in parts} == {len(pcm) // 10 * dst // src}
+    assert b"".join(parts) == whole
+
+
+def test_resampler_numpy_and_pure_agree(monkeypatch):
+    if audio.np is None:
+        pytest.skip("numpy niet geïnstalleerd")
+    pcm = _sine(1000, 8000, 1600)
+    fast = audio.Resampler(8000, 24000).process(pcm)
+    monkeypatch.setattr(audio, "np", None)
+    slow = audio.Resampler(8000, 24000).process(pcm)
+    assert max(abs(a - b) for a, b in zip(array("h", fast), array("h", slow))) <= 1
+
+
+def test_round_trip_keeps_speech_band_and_drops_alias(np_mode):
+    up, down = audio.Resampler(8000, 24000), audio.Resampler(24000, 8000)
+    tone = _sine(1000, 8000, 8000)
+    back = down.process(up.process(tone))
+    assert _rms(back[800:]) == pytest.approx(_rms(tone), rel=0.05)
+    # 10kHz op 24k ligt boven Nyquist van 8k: moet het filter tegenhouden
+    alias = audio.Resampler(24000, 8000).process(_sine(10000, 24000, 24000))
+    assert _rms(alias[800:]) < 0.02 * 8000
+
+
+def test_resampler_rejects_non_integer_factor():
+    with pytest.raises(ValueError):
+        audio.Resampler(8000, 11025)
+    with pytest.raises(ValueError):
+        audio.Resampler(8000, 8000)
+
+
+def test_transcoder_sizes(np_mode):
+    t = audio.PcmTranscoder()
+    assert len(t.to_realtime(b"\xff" * 160)) == 480 * 2
+    assert len(t.from_realtime(b"\x00" * 480 * 2)) == 160
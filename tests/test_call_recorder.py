@@ -0,0 +1,49 @@
+"""
+Ringbuffers en bestanden van de call-opname (src/app/call_recorder.py).
+"""
+import json
+
+import pytest
+
+from src.app.call_recorder import CallRecorder, RingBuffer, file_stem, read_ulaw_wav
+
+
+@pytest.mark.parametrize("use_mmap", [False, True])
+def test_ring_buffer_keeps_last_capacity_bytes(use_mmap):
+    rb = RingBuffer(10, use_mmap)
+    rb.write(b"abcd")
+    assert rb.contents() == b"abcd" and not rb.wrapped
+    rb.write(b"efghij")
+    assert rb.contents() == b"abcdefghij"
+    rb.write(b"klm")                      # over de rand
+    assert rb.contents() == b"defghijklm" and rb.wrapped
+    rb.write(b"0123456789XYZ")            # groter dan de buffer
+    assert rb.contents() == b"3456789XYZ"
+    assert rb.written == 4 + 6 + 3 + 10
+    rb.close()
+
+
+def test_file_stem_only_allows_plain_ids():
+    assert file_stem("CA0123abcDEF") == "CA0123abcDEF"
+    for bad in ("../etc/passwd", "CA1/x", "", "CA 1"):
+        stem = file_stem(bad)
+        assert stem.startswith("call") and stem.isalnum()
+
+
+def test_flush_writes_wavs_and_events(tmp_path):
+    rec = CallRecorder(tmp_path, max_s=1)
+    rec.call_id = "../CA1"
+    rec.write_in(b"\x01" * 160)
+    rec.event("transcript", text="hallo")
+    rec.write_out(b"\x02" * 161)          # oneven: WAV krijgt een pad-byte
+    path = rec.flush()
+    doc = json.loads(path.read_text())
+    assert path.parent == tmp_path and doc["call_id"] == "../CA1"
+    assert doc["events"][0]["in_byte"] == 160
+    assert read_ulaw_wav(tmp_path / doc["audio_in"]) == b"\x01" * 160
+    assert read_ulaw_wav(tmp_path / doc["audio_out"]) == b"\x02" * 161
+
+
+def test_flush_without_call_id_writes_nothing(tmp_path):
+    assert CallRecorder(tmp_path / "x", max_s=1).flush() is None
+    assert not (tmp_path / "x").exists()
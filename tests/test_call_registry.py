@@ -0,0 +1,80 @@
+"""
+Heartbeat van het call-register (src/infra/call_registry.py) tegen een mini-Redis.
+"""
+import asyncio
+
+from src.infra import call_registry as cr
+
+
+class FakeRedis:
+    def __init__(self):
+        self.hash, self.seen = {}, {}
+        self.on_execute = None
+
+    async def zrangebyscore(self, key, lo, hi):
+        lo = float("-inf") if lo == "-inf" else lo
+        hi = float("inf") if hi == "+inf" else hi
+        return [k for k, s in self.seen.items() if lo <= s <= hi]
+
+    async def hdel(self, key, *ids):
+        for i in ids:
+            self.hash.pop(i, None)
+
+    async def zrem(self, key, *ids):
+        for i in ids:
+            self.seen.pop(i, None)
+
+    def pipeline(self, transaction=False):
+        return FakePipe(self)
+
+
+class FakePipe:
+    def __init__(self, r):
+        self.r, self.ops = r, []
+
+    def __getattr__(self, name):
+        return lambda *a, **kw: self.ops.append((name, a, kw))
+
+    async def execute(self):
+        if self.r.on_execute:
+            self.r.on_execute()
+        for name, a, kw in self.ops:
+            if name == "hset":
+                self.r.hash.update(kw["mapping"])
+            elif name == "zadd":
+                self.r.seen.update(a[1])
+            elif name == "zremrangebyscore":
+                for k in await self.r.zrangebyscore(*a):
+                    self.r.seen.pop(k)
+            else:
+                await getattr(self.r, name)(*a)
+
+
+def test_heartbeat_does_not_resurrect_ended_call(monkeypatch):
+    r = FakeRedis()
+    monkeypatch.setattr(cr, "get_client", lambda: r)
+    monkeypatch.setattr(cr, "_local", {})
+
+    async def main():
+        cr.register("CA1")
+        cr.register("CA2")
+        await cr.heartbeat_once()
+        assert set(r.hash) == {"CA1", "CA2"}
+        # call eindigt terwijl de heartbeat-pipeline onderweg is
+        r.on_execute = lambda: cr.unregister("CA1")
+        await cr.heartbeat_once()
+        await asyncio.gather(*cr._tasks)
+        return set(r.hash), set(r.seen)
+
+    assert asyncio.run(main()) == ({"CA2"}, {"CA2"})
+    assert not cr._tasks
+
+
+def test_heartbeat_keeps_own_call_with_stale_score(monkeypatch):
+    r = FakeRedis()
+    monkeypatch.setattr(cr, "get_client", lambda: r)
+    monkeypatch.setattr(cr, "_local", {})
+    cr.register("CA1")
+    r.hash["CA1"], r.seen["CA1"] = "{}", 0.0  # heartbeat lang uitgebleven
+    asyncio.run(cr.heartbeat_once())
+    assert "CA1" in r.hash and r.seen["CA1"] > 0
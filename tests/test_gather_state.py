@@ -0,0 +1,49 @@
+"""
+In-process fallback van de Gather-state (src/infra/gather_state.py), zonder Redis.
+"""
+import asyncio
+
+import pytest
+
+from src.infra import gather_state as gs
+from src.workflows.call_flow import Item
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(gs, "get_client", lambda: None)
+    monkeypatch.setattr(gs, "_mem", {})
+    monkeypatch.setattr(gs, "TTL_S", 10)
+    monkeypatch.setattr(gs.time, "time", lambda: now[0])
+    return now
+
+
+def _save(sid, mode="afhalen"):
+    asyncio.run(gs.save(sid, gs.GatherSession(mode=mode)))
+
+
+def test_round_trip_and_expiry(clock):
+    sess = gs.GatherSession(mode="bezorgen", items=[Item("margherita", "pizza", 2, 12.0)])
+    asyncio.run(gs.save("CA1", sess))
+    got = asyncio.run(gs.load("CA1"))
+    assert (got.mode, got.items) == ("bezorgen", sess.items)
+    clock[0] += 11
+    assert asyncio.run(gs.load("CA1")).mode == ""
+
+
+def test_expired_sessions_evicted_on_write(clock):
+    _save("CA1")
+    _save("CA2")
+    clock[0] += 5
+    _save("CA1")                      # vernieuwd: nu na CA2 aan de beurt
+    clock[0] += 6
+    _save("CA3")                      # CA2 verlopen en nooit meer gelezen
+    assert list(gs._mem) == ["CA1", "CA3"]
+
+
+def test_size_cap(clock, monkeypatch):
+    monkeypatch.setattr(gs, "MEM_MAX", 2)
+    for sid in ("CA1", "CA2", "CA3"):
+        _save(sid)
+    assert list(gs._mem) == ["CA2", "CA3"]
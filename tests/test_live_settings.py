@@ -0,0 +1,39 @@
+"""
+In-memory settings-kopie (src/infra/live_settings.py), zonder DB.
+"""
+import os
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+os.environ.setdefault("DATABASE_URL", "postgresql+psycopg2://settings@127.0.0.1:1/settings")
+
+from src.infra import live_settings as ls  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def fresh(monkeypatch):
+    monkeypatch.setattr(ls, "_snap", dict(ls.DEFAULTS))
+    monkeypatch.setattr(ls, "_snap_at", 0.0)
+    monkeypatch.setattr(ls, "_version", 0)
+
+
+def test_older_load_does_not_overwrite_newer_snapshot():
+    ls._store_snapshot({"delay_pizzas_min": 25}, 7)   # opslag in deze worker
+    ls._store_snapshot({"delay_pizzas_min": 10}, 6)   # trage refresh van ervoor
+    assert ls.snapshot()["delay_pizzas_min"] == 25
+    assert ls.version() == 7
+
+
+def test_newer_and_equal_loads_replace_snapshot():
+    ls._store_snapshot({"delay_pizzas_min": 25}, 7)
+    ls._store_snapshot({"delay_pizzas_min": 30}, 8)
+    assert (ls.snapshot()["delay_pizzas_min"], ls.version()) == (30, 8)
+    ls._store_snapshot({"delay_pizzas_min": 30, "bot_enabled": False}, 8)
+    assert ls.snapshot()["bot_enabled"] is False
+
+
+def test_unversioned_store_keeps_version():
+    ls._store_snapshot({"delay_pizzas_min": 25}, 7)
+    ls._store_snapshot({"delay_pizzas_min": 40})
+    assert (ls.snapshot()["delay_pizzas_min"], ls.version()) == (40, 7)
@@ -0,0 +1,48 @@
+"""
+Keyset-cursors en zoek-SQL van de monitoring (src/infra/logs.py), zonder DB.
+"""
+import base64
+import json
+import os
+from datetime import datetime, timezone
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+os.environ.setdefault("DATABASE_URL", "postgresql+psycopg2://logs@127.0.0.1:1/logs")
+
+from src.infra import logs  # noqa: E402
+
+TS = datetime(2025, 10, 10, 19, 30, tzinfo=timezone.utc)
+
+
+def _raw(vals):
+    return base64.urlsafe_b64encode(json.dumps(vals).encode()).decode().rstrip("=")
+
+
+def test_cursor_round_trip():
+    assert logs.decode_cursor(logs.encode_cursor(TS, 42)) == [TS, 42]
+    assert logs.decode_cursor(logs.encode_cursor(TS, "CA1"), (datetime, str)) == [TS, "CA1"]
+
+
+@pytest.mark.parametrize("cursor", [
+    None, "", "%%%", "bm90LWpzb24",                  # leeg / geen base64 / geen JSON
+    _raw({"ts": 1}), _raw([TS.isoformat()]),         # geen lijst / te kort
+    _raw([123, 42]), _raw(["gisteren", 42]),         # ts geen ISO-string
+    _raw([TS.isoformat(), "42"]), _raw([TS.isoformat(), True]),
+    _raw([TS.isoformat(), 1 << 63]),                 # buiten BIGINT
+])
+def test_bad_cursor_is_first_page(cursor):
+    assert logs.decode_cursor(cursor) is None
+    sql, params = logs.events_query(after=cursor)
+    assert "k_ts" not in params and "(ts, id) <" not in sql
+
+
+def test_calls_cursor_needs_string_call_id():
+    assert "k_cid" not in logs.calls_query(after=logs.encode_cursor(TS, 42))[1]
+    sql, params = logs.calls_query(after=logs.encode_cursor(TS, "CA1"))
+    assert params["k_at"] == TS and params["k_cid"] == "CA1"
+
+
+def test_like_pattern_escapes_wildcards():
+    assert logs.like_pattern("50%_a\\b") == "%50\\%\\_a\\\\b%"
@@ -0,0 +1,48 @@
+"""
+Latency-histogrammen (src/infra/metrics.py) en de p95 per call (src/infra/call_events.py).
+"""
+import os
+import random
+
+import pytest
+
+from src.infra import metrics
+
+
+def test_bucket_index_round_trip():
+    for v in list(range(300)) + [1_000, 65_535, 1_000_000, 30_000_000]:
+        mid = metrics._value(metrics._index(v))
+        assert abs(mid - v) <= max(1, v * 0.008)  # ≤ ~0.8% fout
+    assert all(metrics._index(v) <= metrics._index(v + 1) for v in range(0, 100_000, 7))
+
+
+def test_percentiles_close_to_exact():
+    rnd = random.Random(1)
+    vals = [rnd.uniform(1, 2000) for _ in range(5000)]
+    h = metrics.Histogram("t")
+    for v in vals:
+        h.record_ms(v)
+    exact = sorted(vals)
+    for p in (50, 95, 99):
+        assert h.percentile(p) == pytest.approx(exact[int(p / 100 * len(vals)) - 1], rel=0.01)
+    s = h.summary()
+    assert s["count"] == 5000 and s["max"] == pytest.approx(max(vals), abs=0.001)
+
+
+def test_empty_and_single_value():
+    h = metrics.Histogram("t")
+    assert h.percentile(95) is None and h.summary()["mean"] is None
+    h.record_ms(12.5)
+    assert h.percentile(50) == h.percentile(99) == pytest.approx(12.5, rel=0.008)
+    h.reset()
+    assert h.count == 0 and h.percentile(50) is None
+
+
+def test_call_p95_nearest_rank():
+    pytest.importorskip("sqlalchemy")
+    os.environ.setdefault("DATABASE_URL", "postgresql+psycopg2://metrics@127.0.0.1:1/metrics")
+    from src.infra.call_events import _p95
+    assert _p95([]) is None
+    assert _p95([7]) == 7
+    assert _p95(list(range(1, 21))) == 19
+    assert _p95(list(range(100, 0, -1))) == 95
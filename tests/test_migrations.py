@@ -0,0 +1,175 @@
+"""
+Upgrade van het oorspronkelijke schema (gewone logs/call_events-tabellen) naar
+range-partities. Draait tegen een echte Postgres in een eigen schema:
+
+    SARA_TEST_DATABASE_URL=postgresql://user@host/db python -m pytest -q tests
+"""
+import os
+from datetime import date, timedelta
+from urllib.parse import quote
+
+import pytest
+
+sqlalchemy = pytest.importorskip("sqlalchemy")
+URL = os.getenv("SARA_TEST_DATABASE_URL")
+if not URL:
+    pytest.skip("SARA_TEST_DATABASE_URL niet gezet", allow_module_level=True)
+
+SCHEMA = "sara_test_migrations"
+# eigen schema + een TimeZone ≠ UTC (partitiegrenzen komen dan als '…+02' terug)
+DB_URL = URL + ("&" if "?" in URL else "?") + "options=" + quote(
+    f"-csearch_path={SCHEMA},public -cTimeZone=Europe/Amsterdam"
+)
+os.environ["DATABASE_URL"] = DB_URL
+
+from src.infra import db, logs, partitions  # noqa: E402
+
+# andere testmodules kunnen db al geïmporteerd hebben (met een engine die nooit verbindt)
+ENGINE = sqlalchemy.create_engine(DB_URL, pool_pre_ping=True, future=True)
+
+# schema zoals init_db() het aanmaakte vóór de partities
+BASELINE = """
+CREATE TABLE logs (
+  id      BIGSERIAL PRIMARY KEY,
+  ts      TIMESTAMPTZ NOT NULL DEFAULT now(),
+  level   VARCHAR(10) NOT NULL,
+  msg     TEXT NOT NULL
+);
+CREATE TABLE call_sessions (
+  id           BIGSERIAL PRIMARY KEY,
+  call_id      TEXT UNIQUE NOT NULL,
+  from_masked  TEXT,
+  to_number    TEXT,
+  started_at   TIMESTAMPTZ NOT NULL DEFAULT now(),
+  ended_at     TIMESTAMPTZ,
+  duration_sec INTEGER,
+  result       TEXT,
+  error_code   TEXT,
+  error_msg    TEXT
+);
+CREATE INDEX idx_call_sessions_started_at ON call_sessions (started_at DESC);
+CREATE TABLE call_events (
+  id          BIGSERIAL PRIMARY KEY,
+  call_id     TEXT NOT NULL,
+  ts          TIMESTAMPTZ NOT NULL DEFAULT now(),
+  event       TEXT NOT NULL,
+  level       TEXT NOT NULL DEFAULT 'INFO',
+  data_json   JSONB,
+  latency_ms  INTEGER,
+  status_code INTEGER
+);
+CREATE INDEX idx_call_events_call_ts ON call_events (call_id, ts);
+CREATE INDEX idx_call_events_event ON call_events (event);
+CREATE INDEX idx_call_events_level ON call_events (level);
+
+INSERT INTO logs (ts, level, msg)
+SELECT now() - g * interval '1 day', 'INFO', 'oud ' || g FROM generate_series(0, 40) g;
+INSERT INTO call_events (call_id, ts, event)
+SELECT 'CA' || g, now() - g * interval '1 day', 'call_start' FROM generate_series(0, 40) g;
+"""
+
+
+def _sql(sql, params=None, **kw):
+    with db.engine.begin() as conn:
+        res = conn.execute(sqlalchemy.text(sql), {**(params or {}), **kw})
+        return res.all() if res.returns_rows else None
+
+
+@pytest.fixture
+def schema(monkeypatch):
+    monkeypatch.setattr(db, "engine", ENGINE)
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        conn.exec_driver_sql(f"CREATE SCHEMA {SCHEMA}")
+    yield
+    db.engine.dispose()
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+
+
+@pytest.fixture
+def baseline(schema):
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql(BASELINE)
+
+
+def _relkind(table):
+    with db.engine.connect() as conn:
+        return partitions._relkind(conn, table)
+
+
+def test_init_db_leaves_legacy_tables_alone(baseline):
+    db.init_db()  # mag niet falen en niets herschrijven
+    assert _relkind("logs") == "r"
+    assert _relkind("call_events") == "r"
+    todo = db.pending_migrations()
+    assert todo[:3] == ["partition_logs", "partition_call_events", "search_logs"]
+    assert "keyset_calls" in todo
+    assert _relkind("idx_logs_msg_tsv") is None  # geen index-build bij startup
+    assert _relkind("idx_call_sessions_started_call") is None
+    # oude installatie blijft bruikbaar (ook zoeken) tot de migratie
+    _sql("INSERT INTO logs (level, msg) VALUES ('INFO', 'nog steeds')")
+    assert [r[3] for r in _sql(*logs.events_query(q="steeds"))] == ["nog steeds"]
+
+
+def test_migrate_from_baseline(baseline):
+    db.init_db()
+    assert db.migrate()[:3] == ["partition_logs", "partition_call_events", "search_logs"]
+    assert db.pending_migrations() == []
+    assert _relkind("idx_logs_msg_tsv") == "I"  # partitioned index op de parent
+    assert _relkind("idx_call_sessions_started_call") == "i"
+    assert _relkind("idx_call_sessions_started_at") is None
+
+    for table in ("logs", "call_events"):
+        assert _relkind(table) == "p"
+        assert _sql(f"SELECT count(*) FROM {table}")[0][0] == 41
+        # oude rijen (incl. vandaag) in de legacy-partitie, PK (id, ts)
+        assert _sql(f"SELECT count(*) FROM {table}_legacy")[0][0] == 41
+        pk = _sql("SELECT pg_get_constraintdef(oid) FROM pg_constraint WHERE conname = :n", n=f"{table}_legacy_pkey")
+        assert pk == [("PRIMARY KEY (id, ts)",)]
+
+    # nieuwe rijen: ids lopen door, komen in een nieuwe partitie
+    new_id = _sql("INSERT INTO logs (ts, level, msg) VALUES (now() + interval '2 days', 'INFO', 'nieuw') RETURNING id")[0][0]
+    assert new_id > 41
+    part = _sql("SELECT tableoid::regclass::text FROM logs WHERE id = :i", i=new_id)[0][0]
+    assert part.startswith("logs_p")
+
+    db.init_db()  # herstart na migratie: idempotent
+    assert db.migrate() == []
+    hits = _sql(*logs.events_query(q="nieuw"))
+    assert [(r[0], r[3]) for r in hits] == [(new_id, "nieuw")]
+
+
+def test_partition_bounds_in_non_utc_session(baseline):
+    db.init_db()
+    db.migrate()
+    with db.engine.begin() as conn:
+        bounds = dict(partitions._partitions(conn, "logs"))
+        assert bounds["logs_default"] is None
+        assert all(b is not None and b.tzinfo is not None for n, b in bounds.items() if n != "logs_default")
+        # legacy loopt tot na vandaag: valt nooit onder de retentie
+        assert partitions.drop_expired(conn, "logs", 30) == []
+    report = partitions.maintain(db.engine)
+    assert set(report) == {"logs", "call_events"}
+
+
+def test_drop_expired_in_non_utc_session(schema):
+    db.init_db()  # nieuwe installatie: meteen gepartitioneerd
+    assert db.pending_migrations() == []
+    old = date.today() - timedelta(days=60)
+    with db.engine.begin() as conn:
+        assert partitions.create_ahead(conn, "logs", old) > 0
+        gone = partitions.drop_expired(conn, "logs", 30)
+    assert gone and all(n < partitions._name("logs", date.today() - timedelta(days=30)) for n in gone)
+    assert partitions._name("logs", old) in gone
+
+
+def test_concurrent_migration_replaces_invalid_index(baseline):
+    db.init_db()
+    # afgebroken CONCURRENTLY-build: index bestaat maar is INVALID
+    _sql("CREATE INDEX idx_call_sessions_started_call ON call_sessions (started_at DESC, call_id DESC)")
+    _sql("UPDATE pg_index SET indisvalid = false WHERE indexrelid = to_regclass('idx_call_sessions_started_call')")
+    assert "keyset_calls" in db.pending_migrations()
+    assert "keyset_calls" in db.migrate()
+    with db.engine.connect() as conn:
+        assert db._index_valid(conn, "idx_call_sessions_started_call") is True
@@ -0,0 +1,43 @@
+"""
+Beslislogica per beurt (plan_turn) en de partial/final-sleutel (match_key).
+"""
+import os
+
+import pytest
+
+pytest.importorskip("fastapi")
+os.environ.setdefault("DATABASE_URL", "postgresql+psycopg2://plan@127.0.0.1:1/plan")
+
+from src.app import stream_bridge as sb  # noqa: E402
+from src.workflows import call_flow as cf  # noqa: E402
+
+S = {"delay_pizzas_min": 10, "delay_schotels_min": 10}
+
+
+def test_plan_turn_walks_through_an_order():
+    st = sb.State()
+    st, reply = sb.plan_turn(st, "hallo", S)
+    assert reply == cf.ASK_ORDER and not st.items
+    st, reply = sb.plan_turn(st, "twee pizza margherita", S)
+    assert reply == cf.ASK_MODE
+    assert [(i.name, i.qty) for i in st.items] == [("margherita", 2)]
+    st, reply = sb.plan_turn(st, "bezorgen graag", S)
+    assert st.mode == "bezorgen" and reply.endswith("Klopt dat?") and "24.0 euro" in reply
+    _, reply = sb.plan_turn(st, "nee", S)
+    assert reply == cf.ASK_CHANGE
+    _, reply = sb.plan_turn(st, "ja klopt", S)
+    assert reply.startswith("Dank u wel")
+
+
+def test_plan_turn_has_no_side_effects():
+    st = sb.State()
+    st, _ = sb.plan_turn(st, "een pizza margherita", S)
+    nst, _ = sb.plan_turn(st, "een pizza margherita", S)
+    nst, _ = sb.plan_turn(nst, "afhalen", S)
+    assert (st.mode, st.items[0].qty) == (None, 1)
+    assert (nst.mode, nst.items[0].qty) == ("afhalen", 2)
+
+
+def test_match_key_ignores_case_and_whitespace_only():
+    assert sb.match_key("  Twee  Pizza\tmargherita ") == sb.match_key("twee pizza margherita")
+    assert sb.match_key("twee, pizza") != sb.match_key("twee pizza")
@@ -0,0 +1,43 @@
+"""
+Replay-tool (src/tools/replay.py) end-to-end door ws_twilio, zonder netwerk of DB.
+"""
+import argparse
+import asyncio
+import json
+import os
+
+import pytest
+
+pytest.importorskip("fastapi")
+# de app importeert een engine; er wordt niet verbonden
+os.environ.setdefault("DATABASE_URL", "postgresql+psycopg2://replay@127.0.0.1:1/replay")
+
+from src.app import stream_bridge as sb  # noqa: E402
+from src.app.call_recorder import write_ulaw_wav  # noqa: E402
+from src.tools import replay  # noqa: E402
+
+TRANSCRIPTS = [(8000, "ik wil graag bestellen"), (24000, "bezorgen graag")]
+
+
+def _write_recording(d):
+    write_ulaw_wav(d / "CAreplay1.in.wav", b"\xff" * 8000 * 4)  # 4s stilte
+    events = [{"event": "transcript", "in_byte": b, "text": t} for b, t in TRANSCRIPTS]
+    (d / "CAreplay1.json").write_text(json.dumps({"call_id": "CAreplay1", "events": events}))
+
+
+def _args(d):
+    return argparse.Namespace(recordings=[str(d)], speed=20.0, concurrency=1, asr_ms=300,
+                              ttfa_ms=400, settings=None, out=None, strict=False)
+
+
+@pytest.mark.parametrize("mode", ["g711", "pcm16"])
+def test_replay_returns_transcripts(tmp_path, monkeypatch, mode):
+    monkeypatch.setattr(sb, "AUDIO_MODE", mode)
+    _write_recording(tmp_path)
+    report = asyncio.run(replay.run(_args(tmp_path)))
+    assert report["errors"] == 0
+    (res,) = report["results"]
+    assert res["transcripts"] == [t for _, t in TRANSCRIPTS]
+    assert len(res["says"]) > len(TRANSCRIPTS)  # opening + een antwoord per beurt
+    # alleen beurten van de beller tellen (niet de begroeting)
+    assert res["turns"] and all(t["turn"] >= 1 and "turn_ms" in t for t in res["turns"])
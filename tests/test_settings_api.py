@@ -0,0 +1,51 @@
+"""
+Settings-API (src/app/dashboard/settings_api.py): auth en invoer, zonder DB.
+"""
+import os
+
+import pytest
+
+pytest.importorskip("fastapi")
+os.environ.setdefault("DATABASE_URL", "postgresql+psycopg2://settings@127.0.0.1:1/settings")
+
+from fastapi import FastAPI  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from starlette.requests import Request  # noqa: E402
+
+from src.app.dashboard import auth, settings_api  # noqa: E402
+
+AUTH = ("admin", "geheim")
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(auth, "ADMIN_USER", AUTH[0])
+    monkeypatch.setattr(auth, "ADMIN_PASS", AUTH[1])
+    app = FastAPI()
+    app.include_router(settings_api.router)
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("path", ["/dashboard/api/settings/history", "/dashboard/api/settings/at?t=2025-10-10"])
+def test_history_endpoints_need_admin(client, path):
+    assert client.get(path).status_code == 401
+
+
+@pytest.mark.parametrize("path", [
+    "/dashboard/api/settings/at?t=gisteren",
+    "/dashboard/api/settings/at?t=",
+    "/dashboard/api/settings/history?start=2025-13-01",
+    "/dashboard/api/settings/history?end=x",
+])
+def test_bad_timestamps_are_400(client, path):
+    assert client.get(path, auth=AUTH).status_code == 400
+
+
+def test_parse_ts_accepts_unencoded_plus():
+    t = settings_api._parse_ts("t", "2025-10-10T19:30:00 02:00")
+    assert t.utcoffset().total_seconds() == 7200
+
+
+def test_changed_by_ignores_forwarded_header():
+    req = Request({"type": "http", "headers": [(b"x-forwarded-for", b"6.6.6.6")], "client": ("10.0.0.5", 1234)})
+    assert settings_api.changed_by(req) == "dashboard@10.0.0.5"
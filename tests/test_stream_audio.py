@@ -0,0 +1,132 @@
+"""
+FrameAggregator, OutboundPacer en VadGate (src/app/stream_audio.py).
+"""
+import asyncio
+import base64
+import math
+
+from src.app.stream_audio import FrameAggregator, OutboundPacer, VadGate
+from src.infra.audio import ulaw_encode
+
+SILENCE = b"\xff" * 160
+
+
+def _tone(amp, freq=300):
+    pcm = b"".join(int(amp * math.sin(2 * math.pi * freq * i / 8000)).to_bytes(2, "little", signed=True)
+                   for i in range(160))
+    return ulaw_encode(pcm)
+
+
+# ── FrameAggregator
+def test_aggregator_flushes_on_size_and_close():
+    sent = []
+
+    async def send(chunk):
+        sent.append(chunk)
+
+    async def main():
+        agg = FrameAggregator(send, chunk_ms=60)
+        for i in range(4):
+            await agg.add(bytes([i]) * 160)
+        assert [len(c) for c in sent] == [480]  # 3 frames = 60ms
+        await agg.close()
+        return agg
+
+    agg = asyncio.run(main())
+    assert [len(c) for c in sent] == [480, 160]
+    assert sent[1] == b"\x03" * 160
+    assert (agg.frames_in, agg.chunks_out) == (4, 2)
+
+
+def test_aggregator_timer_flushes_partial_chunk():
+    sent = []
+
+    async def send(chunk):
+        sent.append(chunk)
+
+    async def main():
+        agg = FrameAggregator(send, chunk_ms=20)
+        agg.start()
+        agg._limit = 10_000  # alleen de timer mag flushen
+        await agg.add(SILENCE)
+        await asyncio.sleep(0.1)
+        await agg.close()
+
+    asyncio.run(main())
+    assert sent == [SILENCE]
+
+
+# ── OutboundPacer
+def _pacer(msgs):
+    async def send(m):
+        msgs.append(m)
+    p = OutboundPacer(send, lead_ms=1000)
+    p.stream_sid = "MZ1"
+    return p
+
+
+def test_pacer_frames_pads_and_marks():
+    msgs = []
+
+    async def main():
+        p = _pacer(msgs)
+        p.push(b"\x01" * 200)            # 1 frame + 40 bytes staart
+        assert p.busy
+        p.end_response("r1")             # staart aangevuld tot een frame
+        p.start()
+        await asyncio.sleep(0.05)
+        assert p.marks_pending == {"r1"} and p.busy  # Twilio speelt nog
+        p.on_mark("r1")
+        await p.close()
+        return p
+
+    p = asyncio.run(main())
+    media = [base64.b64decode(m["media"]["payload"]) for m in msgs if m["event"] == "media"]
+    assert media == [b"\x01" * 160, b"\x01" * 40 + b"\xff" * 120]
+    assert msgs[-1] == {"event": "mark", "streamSid": "MZ1", "mark": {"name": "r1"}}
+    assert not p.busy and p.frames_sent == 2
+
+
+def test_pacer_clear_drops_queue_and_marks():
+    msgs = []
+
+    async def main():
+        p = _pacer(msgs)
+        assert await p.clear() is False   # niets te wissen: geen clear naar Twilio
+        p.push(b"\x01" * 480)
+        p.end_response("r1")
+        p.marks_pending.add("r0")
+        assert await p.clear() is True
+        return p
+
+    p = asyncio.run(main())
+    assert msgs == [{"event": "clear", "streamSid": "MZ1"}]
+    assert not p.busy and not p.marks_pending and p.clears == 1
+
+
+def test_pacer_drops_oldest_frames_over_max():
+    p = OutboundPacer(None, max_ms=40)
+    p.push(b"\x01" * 160 + b"\x02" * 160 + b"\x03" * 160)
+    p.end_response("r1")
+    assert p.frames_dropped == 1
+    assert list(p._q) == [b"\x02" * 160, b"\x03" * 160, "r1"]
+
+
+# ── VadGate
+def test_vad_gate_preroll_and_hangover():
+    g = VadGate(hangover_ms=40, preroll_ms=40)
+    quiet = [g.feed(SILENCE) for _ in range(5)]
+    assert quiet == [[]] * 5
+    speech = _tone(8000)
+    assert g.feed(speech) == [SILENCE, SILENCE, speech]  # 40ms pre-roll mee
+    assert g.feed(SILENCE) == [SILENCE]                  # hangover 2 frames
+    assert g.feed(SILENCE) == [SILENCE]
+    assert g.feed(SILENCE) == []
+    assert g.stats()["passed"] == 5
+
+
+def test_vad_gate_features():
+    assert VadGate.features(SILENCE)[0] == 0
+    energy, zcr = VadGate.features(_tone(8000, freq=1000))
+    assert energy > 1e6 and 0.2 < zcr < 0.3
+    assert not VadGate().is_speech(_tone(50))